@@ -65,3 +65,7 @@ with app.app_context():
     
     # Create all database tables
     db.create_all()
+
+# Run the watchlist prefetch job periodically if PREFETCH_INTERVAL_HOURS is set
+from services.prefetch import start_prefetch_scheduler
+start_prefetch_scheduler()
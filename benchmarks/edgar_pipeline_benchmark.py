@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark of the EDGAR-to-insights pipeline
+
+Runs the 10-K lookup (submissions metadata), document download and text extraction,
+and local rule-based analysis against the EDGAR stand-in server, so results are
+repeatable and need no network access. Latency and error injection model sec.gov.
+
+By default a synthetic cassette is generated (submissions JSON plus an inline XBRL
+10-K, see html_text_benchmark.py). To benchmark real filings, record them once with
+network access and pass the cassette directory and CIK:
+
+    EDGAR_CASSETTE_MODE=record EDGAR_CASSETTE_DIR=data/edgar_cassette \\
+        python -c "from services.edgar_service import get_latest_10k, extract_10k_content; \\
+                   extract_10k_content(get_latest_10k('320193'))"
+    python benchmarks/edgar_pipeline_benchmark.py --cassette data/edgar_cassette --cik 320193
+
+Usage:
+    python benchmarks/edgar_pipeline_benchmark.py [--runs 5] [--latency-ms 80] [--error-rate 0.1]
+"""
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from html_text_benchmark import synthetic_filing  # noqa: E402
+from services import edgar_client, edgar_service  # noqa: E402
+from services.cache_service import disk_cache  # noqa: E402
+from services.demo_service import perform_local_analysis  # noqa: E402
+from services.edgar_cassette import CassetteStore  # noqa: E402
+from services.edgar_standin import start_standin  # noqa: E402
+
+SYNTHETIC_CIK = '9990002'
+
+
+def build_synthetic_cassette(directory, size_mb):
+    """Record submissions metadata and one synthetic 10-K for SYNTHETIC_CIK"""
+    accession = '0009990002-25-000001'
+    document = 'bench-20241231.htm'
+    submissions = {
+        'name': 'Benchmark Corp',
+        'filings': {'recent': {
+            'form': ['10-K'], 'accessionNumber': [accession], 'filingDate': ['2025-03-01'],
+            'reportDate': ['2024-12-31'], 'primaryDocument': [document],
+        }},
+    }
+    store = CassetteStore(directory)
+    store.save('GET', f"https://data.sec.gov/submissions/CIK{SYNTHETIC_CIK.zfill(10)}.json", 200,
+               json.dumps(submissions).encode('utf-8'), {'Content-Type': 'application/json', 'ETag': '"bench"'})
+    store.save('GET', edgar_service.build_archive_url(SYNTHETIC_CIK, accession, document), 200,
+               synthetic_filing(size_mb), {'Content-Type': 'text/html'})
+
+
+def run_pipeline(cik):
+    """Run the pipeline once, cold, and return the time of each stage in seconds"""
+    # Start from an empty HTTP cache and document memo, as for a company seen the first time
+    disk_cache.delete(f"http:https://data.sec.gov/submissions/CIK{cik.zfill(10)}.json")
+    edgar_service._document_urls.clear()
+
+    timings = {}
+    start = time.perf_counter()
+    url = edgar_service.get_latest_10k(cik)
+    timings['lookup'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    text = edgar_service.extract_10k_content(url)
+    timings['download + extract'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    perform_local_analysis(text)
+    timings['local analysis'] = time.perf_counter() - start
+
+    timings['total'] = sum(timings.values())
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the EDGAR pipeline against a local stand-in")
+    parser.add_argument("--runs", type=int, default=5, help="Pipeline runs (default: 5)")
+    parser.add_argument("--cassette", help="Recorded cassette directory (default: synthetic)")
+    parser.add_argument("--cik", help="CIK to look up (required with --cassette)")
+    parser.add_argument("--size-mb", type=float, default=8, help="Size of the synthetic 10-K (default: 8)")
+    parser.add_argument("--latency-ms", type=float, default=80, help="Stand-in latency per request (default: 80)")
+    parser.add_argument("--jitter-ms", type=float, default=20, help="Random extra latency (default: 20)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of 503 responses (default: 0)")
+    args = parser.parse_args()
+
+    temp_dir = None
+    if args.cassette:
+        if not args.cik:
+            parser.error("--cik is required with --cassette")
+        directory, cik = args.cassette, args.cik
+    else:
+        temp_dir = tempfile.mkdtemp(prefix='edgar-cassette-')
+        build_synthetic_cassette(temp_dir, args.size_mb)
+        directory, cik = temp_dir, SYNTHETIC_CIK
+
+    server, base_url = start_standin(
+        directory, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, error_rate=args.error_rate, seed=0
+    )
+    edgar_client.EDGAR_STANDIN_URL = base_url
+    results = []
+    failures = 0
+    try:
+        for _ in range(args.runs):
+            try:
+                results.append(run_pipeline(cik))
+            except Exception as e:
+                # Injected errors can outlast the client's retries; count them like a real outage
+                failures += 1
+                print(f"Run failed: {e}")
+    finally:
+        server.shutdown()
+        if temp_dir:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+    print(f"{'Stage':<22} {'Median (s)':>10} {'Max (s)':>10}")
+    for stage in (results[0] if results else ()):
+        values = [result[stage] for result in results]
+        print(f"{stage:<22} {statistics.median(values):>10.3f} {max(values):>10.3f}")
+    print(f"Runs: {len(results)} succeeded, {failures} failed")
+    print(f"Stand-in: {server.config.stats}")
+
+
+if __name__ == "__main__":
+    main()
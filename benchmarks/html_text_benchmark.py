@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+HTML-to-text benchmark for 10-K documents
+
+Compares the old BeautifulSoup extraction used by extract_10k_content (html.parser,
+get_text, then splitlines / split("  ") clean-up) with the lxml extractor in
+services.html_text. Pass recorded filings (the .htm primary documents saved from
+EDGAR) as arguments; without arguments a synthetic inline XBRL document is generated
+with the structure of a typical filing-agent 10-K: a large hidden <ix:header>, styled
+<div>/<span> paragraphs and financial tables of tagged facts.
+
+Usage:
+    python benchmarks/html_text_benchmark.py [--runs 3] [--size-mb 8] [filing.htm ...]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from bs4 import BeautifulSoup  # noqa: E402
+from services.html_text import html_to_text  # noqa: E402
+
+WORDS = (
+    "revenue operating income fiscal year company products services customers market risk "
+    "factors management discussion analysis results operations liquidity capital resources "
+    "net sales increased decreased compared primarily due to higher lower demand costs"
+).split()
+
+
+def old_extract(html):
+    """The BeautifulSoup path extract_10k_content used before the lxml extractor"""
+    soup = BeautifulSoup(html, 'html.parser')
+    for script in soup(["script", "style"]):
+        script.extract()
+    text = soup.get_text(separator='\n', strip=True)
+    lines = (line.strip() for line in text.splitlines())
+    chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
+    return '\n'.join(chunk for chunk in chunks if chunk)
+
+
+def synthetic_filing(size_mb, seed=0):
+    """Generate an inline XBRL 10-K of roughly size_mb megabytes"""
+    rng = random.Random(seed)
+    target = int(size_mb * 1024 * 1024)
+    parts = [
+        '<?xml version="1.0" encoding="utf-8"?>\n'
+        '<html xmlns="http://www.w3.org/1999/xhtml" xmlns:ix="http://www.xbrl.org/2013/inlineXBRL">'
+        '<head><title>10-K</title><style>.s{font-family:Times New Roman}</style></head><body>'
+        '<div style="display:none"><ix:header><ix:resources>'
+    ]
+    for i in range(2000):
+        parts.append(
+            f'<xbrli:context id="c-{i}"><xbrli:entity><xbrli:identifier scheme="http://www.sec.gov/CIK">'
+            f'0000320193</xbrli:identifier></xbrli:entity><xbrli:period><xbrli:startDate>2023-10-01'
+            f'</xbrli:startDate><xbrli:endDate>2024-09-28</xbrli:endDate></xbrli:period></xbrli:context>'
+        )
+    parts.append('</ix:resources></ix:header></div>')
+
+    size = sum(len(part) for part in parts)
+    item = 0
+    while size < target:
+        item += 1
+        block = [f'<div style="margin-top:12pt"><span class="s" style="font-weight:700">Item {item}.</span></div>']
+        for _ in range(20):
+            sentence = ' '.join(rng.choice(WORDS) for _ in range(60))
+            block.append(f'<div style="text-align:justify"><span class="s" style="color:#000;font-size:10pt">{sentence}.</span></div>')
+        block.append('<table style="border-collapse:collapse;width:100%">')
+        for row in range(15):
+            cells = ''.join(
+                f'<td style="padding:0 1pt"><span class="s"><ix:nonFraction name="us-gaap:Revenues" contextRef="c-{row}" '
+                f'unitRef="usd" decimals="-6" scale="6">{rng.randint(1000, 99999):,}</ix:nonFraction></span></td>'
+                for _ in range(4)
+            )
+            block.append(f'<tr><td style="padding:0 1pt"><span class="s">Line item {row}</span></td>{cells}</tr>')
+        block.append('</table>')
+        chunk = ''.join(block)
+        parts.append(chunk)
+        size += len(chunk)
+
+    parts.append('</body></html>')
+    return ''.join(parts).encode('utf-8')
+
+
+def time_call(func, arg, runs):
+    """Return the median wall time of func(arg) in seconds and the last result"""
+    times = []
+    result = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = func(arg)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark 10-K HTML-to-text extraction")
+    parser.add_argument("files", nargs="*", help="Recorded 10-K .htm files (default: synthetic document)")
+    parser.add_argument("--runs", type=int, default=3, help="Runs per extractor (default: 3)")
+    parser.add_argument("--size-mb", type=float, default=8, help="Size of the synthetic document (default: 8)")
+    args = parser.parse_args()
+
+    documents = []
+    for path in args.files:
+        with open(path, 'rb') as f:
+            documents.append((os.path.basename(path), f.read()))
+    if not documents:
+        documents.append((f"synthetic iXBRL ({args.size_mb:g} MB)", synthetic_filing(args.size_mb)))
+
+    print(f"{'Document':<32} {'Extractor':<14} {'Median (s)':>10} {'Chars':>10}")
+    for name, html in documents:
+        old_time, old_text = time_call(old_extract, html, args.runs)
+        new_time, new_text = time_call(html_to_text, html, args.runs)
+        print(f"{name:<32} {'BeautifulSoup':<14} {old_time:>10.3f} {len(old_text):>10}")
+        print(f"{name:<32} {'lxml':<14} {new_time:>10.3f} {len(new_text):>10}")
+        print(f"{'':<32} {'speed-up':<14} {old_time / new_time:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
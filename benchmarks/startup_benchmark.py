@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Cold-start import benchmark for InsightLens
+
+Measures how long a fresh interpreter takes to import the PDF parsing stack
+and to boot the full Flask app (what every gunicorn worker pays on start).
+The "before" rows reproduce the old behaviour by importing the LangChain
+loader and text splitter alongside pdf_parser, the way pdf_parser used to.
+
+Usage:
+    python benchmarks/startup_benchmark.py [--runs 5]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+LANGCHAIN_IMPORTS = (
+    "from langchain_community.document_loaders import PyPDFLoader; "
+    "from langchain_text_splitters import RecursiveCharacterTextSplitter; "
+)
+
+SCENARIOS = [
+    ("pdf_parser (before, with LangChain)", LANGCHAIN_IMPORTS + "import services.pdf_parser"),
+    ("pdf_parser (after)", "import services.pdf_parser"),
+    ("app boot (before, with LangChain)", LANGCHAIN_IMPORTS + "import app"),
+    ("app boot (after)", "import app"),
+]
+
+
+def time_import(statement, env):
+    """Run a statement in a fresh interpreter and return the wall time in seconds"""
+    start = time.perf_counter()
+    subprocess.run(
+        [sys.executable, "-c", statement],
+        cwd=REPO_ROOT,
+        env=env,
+        check=True,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark cold-start import time")
+    parser.add_argument("--runs", type=int, default=5, help="Runs per scenario (default: 5)")
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    # The app needs a database URL to import; an in-memory SQLite database keeps
+    # the benchmark self-contained.
+    env.setdefault("DATABASE_URL", "sqlite://")
+    env.setdefault("SESSION_SECRET", "benchmark")
+
+    # Warm the OS file cache and bytecode cache so every scenario starts equal
+    for _, statement in SCENARIOS:
+        time_import(statement, env)
+
+    print(f"{'Scenario':<40} {'median (s)':>12} {'min (s)':>10}")
+    for name, statement in SCENARIOS:
+        timings = [time_import(statement, env) for _ in range(args.runs)]
+        print(f"{name:<40} {statistics.median(timings):>12.3f} {min(timings):>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
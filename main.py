@@ -1,4 +1,8 @@
 from app import app
 
+# Run queued document processing in this process unless JOB_WORKERS=0 (see worker.py)
+from services.job_queue import start_job_workers
+start_job_workers()
+
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port=5000, debug=True)
@@ -18,7 +18,15 @@ class Document(db.Model):
     use_buffett_mode = db.Column(db.Boolean, default=False)  # For Warren Buffett analysis style
     use_biotech_mode = db.Column(db.Boolean, default=False)  # For scientific/biotech company analysis mode
     industry_type = db.Column(db.String(64), nullable=True)  # Store the industry for specialized analysis
+    filing_group = db.Column(db.String(36), nullable=True, index=True)  # Links the 10-Ks of one multi-year history fetch
+    accession_number = db.Column(db.String(32), nullable=True)  # SEC accession number of an EDGAR filing
+    filing_date = db.Column(db.Date, nullable=True)  # Date the EDGAR filing was filed
+    form_type = db.Column(db.String(16), nullable=True)  # EDGAR form type, e.g. '10-K' or '10-K/A'
+    base_document_id = db.Column(db.Integer, nullable=True)  # Earlier analysis whose unchanged insights were reused
+    prefetched = db.Column(db.Boolean, default=False)  # Analyzed ahead of time by the watchlist prefetch job
     insights = db.relationship('Insight', backref='document', lazy=True, cascade="all, delete-orphan")
+    financial_statements = db.relationship('FinancialStatement', backref='document', lazy=True, cascade="all, delete-orphan")
+    texts = db.relationship('DocumentText', backref='document', lazy=True, cascade="all, delete-orphan")
     
     def __repr__(self):
         return f'<Document {self.filename or self.url}>'
@@ -51,17 +59,167 @@ class Insight(db.Model):
         return result
 
 
+class FinancialStatement(db.Model):
+    """Structured rows of a financial statement table extracted from a document"""
+    id = db.Column(db.Integer, primary_key=True)
+    document_id = db.Column(db.Integer, db.ForeignKey('document.id'), nullable=False)
+    statement_type = db.Column(db.String(32), nullable=False)  # 'balance_sheet', 'income_statement', 'cash_flow'
+    title = db.Column(db.String(255), nullable=True)
+    page_number = db.Column(db.Integer, nullable=True)
+    units = db.Column(db.String(16), nullable=True)  # 'thousands', 'millions', 'billions'
+    periods = db.Column(db.Text, nullable=False)  # JSON list of period column headers
+    line_items = db.Column(db.Text, nullable=False)  # JSON list of row labels
+    values = db.Column(db.LargeBinary, nullable=False)  # Packed float64 array, row-major, NaN for empty cells
+    created_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<FinancialStatement {self.statement_type} for Document {self.document_id}>'
+    
+    @staticmethod
+    def from_table(document_id, table):
+        """Create a record from a statement dict returned by services.financial_tables"""
+        from services.financial_tables import pack_values
+        return FinancialStatement(
+            document_id=document_id,
+            statement_type=table['statement_type'],
+            title=(table.get('title') or '')[:255],
+            page_number=table.get('page'),
+            units=table.get('units'),
+            periods=json.dumps(table['periods']),
+            line_items=json.dumps(table['line_items']),
+            values=pack_values(table['values'])
+        )
+    
+    def to_table(self):
+        """Return the statement as a dict in the services.financial_tables format"""
+        from services.financial_tables import unpack_values
+        return {
+            'statement_type': self.statement_type,
+            'title': self.title,
+            'page': self.page_number,
+            'units': self.units,
+            'periods': json.loads(self.periods),
+            'line_items': json.loads(self.line_items),
+            'values': unpack_values(self.values)
+        }
+
+
+class CompanyFacts(db.Model):
+    """Key XBRL facts for a company, stored column-wise (metrics x fiscal period end dates)"""
+    id = db.Column(db.Integer, primary_key=True)
+    cik = db.Column(db.String(20), nullable=False, unique=True, index=True)  # Without leading zeros
+    entity_name = db.Column(db.String(255), nullable=True)
+    metrics = db.Column(db.Text, nullable=False)  # JSON list of metric names (rows)
+    periods = db.Column(db.Text, nullable=False)  # JSON list of fiscal period end dates (columns), oldest first
+    values = db.Column(db.LargeBinary, nullable=False)  # Packed float64 array, row-major, NaN where not reported
+    fetched_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<CompanyFacts CIK {self.cik} ({self.entity_name})>'
+    
+    def update_from_table(self, table):
+        """Store a FactTable from services.xbrl_facts"""
+        from services.financial_tables import pack_values
+        self.entity_name = (table.entity_name or '')[:255]
+        self.metrics = json.dumps(table.metrics)
+        self.periods = json.dumps(table.periods)
+        self.values = pack_values(table.values)
+        self.fetched_at = datetime.datetime.utcnow()
+    
+    def to_table(self):
+        """Return the stored facts as a services.xbrl_facts.FactTable"""
+        from services.financial_tables import unpack_values
+        from services.xbrl_facts import FactTable
+        return FactTable(self.cik, self.entity_name, json.loads(self.metrics), json.loads(self.periods),
+                         unpack_values(self.values))
+
+
 class Processing(db.Model):
     """Stores the status of document processing jobs"""
     id = db.Column(db.Integer, primary_key=True)
     document_id = db.Column(db.Integer, db.ForeignKey('document.id'), nullable=False)
-    status = db.Column(db.String(32), default='pending')  # pending, processing, completed, failed
+    status = db.Column(db.String(32), default='pending')  # pending, processing, completed, failed, cancelled
     error = db.Column(db.Text, nullable=True)
     started_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
     completed_at = db.Column(db.DateTime, nullable=True)
+    extraction_metrics = db.Column(db.Text, nullable=True)  # JSON summary of page extraction timings and errors
+    pages_done = db.Column(db.Integer, nullable=True)  # Pages extracted so far
+    pages_total = db.Column(db.Integer, nullable=True)  # Pages selected for extraction
     
     def __repr__(self):
         return f'<Processing {self.id} for Document {self.document_id} ({self.status})>'
+    
+    def get_extraction_metrics(self):
+        """Return the stored extraction metrics as a dict, or None if not recorded"""
+        if not self.extraction_metrics:
+            return None
+        try:
+            return json.loads(self.extraction_metrics)
+        except ValueError:
+            return None
+
+
+class DocumentText(db.Model):
+    """Extracted text of a document, compressed and keyed by its content hash (see services.text_store)"""
+    __table_args__ = (db.UniqueConstraint('document_id', 'content_hash', name='uq_document_text_document_hash'),)
+    id = db.Column(db.Integer, primary_key=True)
+    document_id = db.Column(db.Integer, db.ForeignKey('document.id'), nullable=False, index=True)
+    content_hash = db.Column(db.String(64), nullable=False)  # SHA-256 of the UTF-8 text
+    codec = db.Column(db.String(8), nullable=False)  # 'zstd' or 'zlib'
+    size = db.Column(db.Integer, nullable=False)  # Length of the text in characters
+    data = db.Column(db.LargeBinary, nullable=False)  # Compressed UTF-8 text
+    created_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<DocumentText {self.content_hash[:12]} for Document {self.document_id} ({self.size} chars)>'
+
+
+class PipelineStage(db.Model):
+    """Status and stored output of one processing stage of a document (see services.pipeline)"""
+    __table_args__ = (db.UniqueConstraint('document_id', 'stage', name='uq_pipeline_stage_document_stage'),)
+    id = db.Column(db.Integer, primary_key=True)
+    document_id = db.Column(db.Integer, db.ForeignKey('document.id'), nullable=False, index=True)
+    stage = db.Column(db.String(64), nullable=False)  # 'fetch', 'extract', 'index', 'analyze:<category>' or 'persist'
+    status = db.Column(db.String(32), default='pending')  # pending, running, completed, failed
+    output = db.Column(db.Text, nullable=True)  # Stage result: source, text hash, JSON or insight HTML
+    error = db.Column(db.Text, nullable=True)
+    attempts = db.Column(db.Integer, default=0)
+    started_at = db.Column(db.DateTime, nullable=True)
+    completed_at = db.Column(db.DateTime, nullable=True)
+    
+    def __repr__(self):
+        return f'<PipelineStage {self.stage} for Document {self.document_id} ({self.status})>'
+
+
+class Job(db.Model):
+    """Background job waiting for, or claimed by, a worker (see services.job_queue)"""
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(64), nullable=False)  # Handler name, e.g. 'process_document'
+    document_id = db.Column(db.Integer, db.ForeignKey('document.id'), nullable=True, index=True)
+    payload = db.Column(db.Text, nullable=True)  # JSON arguments for the handler
+    status = db.Column(db.String(32), default='queued', index=True)  # queued, running, completed, failed, cancelled
+    priority = db.Column(db.Integer, default=0)  # Higher runs first
+    attempts = db.Column(db.Integer, default=0)
+    max_attempts = db.Column(db.Integer, default=3)
+    run_after = db.Column(db.DateTime, default=datetime.datetime.utcnow, index=True)  # Not claimed before this time
+    lease_expires_at = db.Column(db.DateTime, nullable=True)  # Running jobs past their lease are claimed again
+    worker_id = db.Column(db.String(128), nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    def __repr__(self):
+        return f'<Job {self.id} {self.kind} ({self.status})>'
+
+    def get_payload(self):
+        """Return the job arguments as a dict"""
+        if not self.payload:
+            return {}
+        try:
+            return json.loads(self.payload)
+        except ValueError:
+            return {}
 
 
 class ApiUsage(db.Model):
@@ -35,6 +35,25 @@ try:
             print("Adding severity column to insight table...")
             conn.execute(text("ALTER TABLE insight ADD COLUMN IF NOT EXISTS severity VARCHAR(20)"))
             
+            # Add extraction metrics column to processing table
+            print("Adding extraction metrics column to processing table...")
+            conn.execute(text("ALTER TABLE processing ADD COLUMN IF NOT EXISTS extraction_metrics TEXT"))
+            
+            # Add extraction progress columns to processing table
+            print("Adding extraction progress columns to processing table...")
+            conn.execute(text("ALTER TABLE processing ADD COLUMN IF NOT EXISTS pages_done INTEGER"))
+            conn.execute(text("ALTER TABLE processing ADD COLUMN IF NOT EXISTS pages_total INTEGER"))
+            
+            # Add filing history columns to document table
+            print("Adding filing history columns to document table...")
+            conn.execute(text("ALTER TABLE document ADD COLUMN IF NOT EXISTS filing_group VARCHAR(36)"))
+            conn.execute(text("ALTER TABLE document ADD COLUMN IF NOT EXISTS accession_number VARCHAR(32)"))
+            conn.execute(text("ALTER TABLE document ADD COLUMN IF NOT EXISTS filing_date DATE"))
+            conn.execute(text("CREATE INDEX IF NOT EXISTS ix_document_filing_group ON document (filing_group)"))
+            conn.execute(text("ALTER TABLE document ADD COLUMN IF NOT EXISTS prefetched BOOLEAN DEFAULT false"))
+            conn.execute(text("ALTER TABLE document ADD COLUMN IF NOT EXISTS form_type VARCHAR(16)"))
+            conn.execute(text("ALTER TABLE document ADD COLUMN IF NOT EXISTS base_document_id INTEGER"))
+            
         except SQLAlchemyError as e:
             print(f"Error during schema update: {e}")
             trans.rollback()
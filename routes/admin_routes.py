@@ -3,6 +3,9 @@ import datetime
 from functools import wraps
 from flask import Blueprint, jsonify, render_template, request, redirect, url_for, flash, session
 from models import db, ApiUsage
+from services.extraction_metrics import get_recent_runs
+from services.edgar_client import get_rate_limit_stats
+from services.http_cache import get_http_cache_stats
 
 admin_bp = Blueprint('admin', __name__)
 
@@ -108,4 +111,24 @@ def api_usage():
                           usage_by_api=usage_by_api,
                           usage_status=usage_status,
                           monthly_budget=monthly_budget,
-                          recent_requests=recent_requests)
\ No newline at end of file
+                          recent_requests=recent_requests)
+
+@admin_bp.route('/admin/extraction-metrics')
+@admin_required
+def extraction_metrics():
+    """Return page extraction metrics for recent documents, slowest first"""
+    runs = get_recent_runs()
+    runs.sort(key=lambda run: run['latency_ms']['max'], reverse=True)
+    return jsonify({'runs': runs})
+
+@admin_bp.route('/admin/edgar-rate-limit')
+@admin_required
+def edgar_rate_limit():
+    """Return SEC EDGAR rate limiter wait times for this worker"""
+    return jsonify(get_rate_limit_stats())
+
+@admin_bp.route('/admin/http-cache')
+@admin_required
+def http_cache_stats():
+    """Return EDGAR metadata cache hit and revalidation counts for this worker"""
+    return jsonify(get_http_cache_stats())
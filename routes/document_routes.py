@@ -1,11 +1,11 @@
 import os
-import threading
 from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app, abort
 from werkzeug.utils import secure_filename
 
 from app import db
 from models import Document, Processing
-from services.document_processor import save_uploaded_file, process_document
+from services.document_processor import save_uploaded_file
+from services.job_queue import enqueue, PRIORITY_INTERACTIVE
 
 bp = Blueprint('document_routes', __name__)
 
@@ -144,16 +144,8 @@ def upload_document():
         db.session.add(processing)
         db.session.commit()
         
-        # Start processing in a background thread with app context
-        from app import app
-        
-        def process_with_app_context(doc_id):
-            with app.app_context():
-                process_document(doc_id)
-                
-        thread = threading.Thread(target=process_with_app_context, args=(document.id,))
-        thread.daemon = True
-        thread.start()
+        # Queue the document for the job workers
+        enqueue('process_document', document.id, priority=PRIORITY_INTERACTIVE)
         
         # Add friendly message for demo mode
         if use_demo_mode:
@@ -1,15 +1,47 @@
 from flask import Blueprint, render_template, request, redirect, url_for, jsonify, current_app
+import uuid
 import logging
-import threading
-import requests
+import datetime
 from models import Document, Processing
 from app import db
-from services.edgar_service import search_company, get_latest_10k, extract_10k_content
-from services.document_processor import process_document
+from services.edgar_service import search_company, get_latest_10k_filing, extract_10k_content, get_submissions, get_10k_history
+from services.edgar_client import edgar_get
+from services.job_queue import enqueue, PRIORITY_INTERACTIVE, PRIORITY_HISTORY
+from services.prefetch import find_prefetched_document
 
 bp = Blueprint('edgar', __name__, url_prefix='/edgar')
 logger = logging.getLogger(__name__)
 
+# Fiscal years fetched for a 10-K history by default, and at most
+DEFAULT_HISTORY_YEARS = 5
+MAX_HISTORY_YEARS = 10
+
+# Processing statuses after which a filing of a history will not change any more
+HISTORY_FINAL_STATUSES = ('completed', 'failed', 'cancelled')
+
+
+def get_processing_options(args):
+    """
+    Read the analysis options of an EDGAR request from its parameters
+    
+    Args:
+        args (dict): Query parameters, or the body of a JSON request
+    
+    Returns:
+        dict: Document keyword arguments (demo, local, Buffett and biotech modes, industry)
+    """
+    def flag(*names):
+        # 'true' in query strings, true in JSON bodies
+        return any(str(args.get(name)).lower() == 'true' for name in names)
+    
+    return {
+        'use_demo_mode': flag('demo_mode', 'demo'),
+        'use_local_processing': flag('local_processing'),
+        'use_buffett_mode': flag('use_buffett_mode', 'buffett_mode'),
+        'use_biotech_mode': flag('use_biotech_mode', 'biotech_mode'),
+        'industry_type': args.get('industry_type', '') or '',
+    }
+
 
 @bp.route('/search', methods=['GET', 'POST'])
 def search():
@@ -50,8 +82,9 @@ def process_10k(cik):
         if company_name and 'SIC:' in company_name:
             company_name = company_name.split('SIC:')[0].strip()
         
-        # Get the latest 10-K URL
-        filing_url = get_latest_10k(cik)
+        # Get the latest 10-K and its URL
+        filing = get_latest_10k_filing(cik)
+        filing_url = filing['url'] if filing else None
         if not filing_url:
             return render_template('edgar_search.html', error='Could not find 10-K filing for this company. The SEC may have changed their filing format.')
         
@@ -70,12 +103,15 @@ def process_10k(cik):
         if not company_name and cik in magnificent_7:
             company_name = magnificent_7[cik]
             
-        # Check if we should use demo mode (from URL parameter)
-        use_demo_mode = request.args.get('demo_mode') == 'true' or request.args.get('demo') == 'true'
-        use_local_processing = request.args.get('local_processing') == 'true'
-        use_buffett_mode = request.args.get('use_buffett_mode') == 'true' or request.args.get('buffett_mode') == 'true'
-        use_biotech_mode = request.args.get('use_biotech_mode') == 'true' or request.args.get('biotech_mode') == 'true'
-        industry_type = request.args.get('industry_type', '')
+        # Check if we should use demo mode and other analysis options (from URL parameters)
+        options = get_processing_options(request.args)
+        
+        # A watchlist company's latest filing may already have been analyzed by the prefetch job
+        if not any(options.values()):
+            prefetched = find_prefetched_document(filing_url)
+            if prefetched:
+                logger.info(f"Using prefetched analysis of {filing_url} (Document ID: {prefetched.id})")
+                return redirect(url_for('insight_routes.show_insights', document_id=prefetched.id))
         
         # If company_name is not provided, try to get it from the SEC API
         if not company_name:
@@ -83,9 +119,17 @@ def process_10k(cik):
             if cik in magnificent_7:
                 company_name = magnificent_7[cik]
             else:
+                # The submissions metadata was just fetched by get_latest_10k_filing, so this is a cache hit
+                try:
+                    company_name = get_submissions(cik).get('name')
+                except Exception as e:
+                    logger.warning(f"Failed to get company name from SEC API: {str(e)}")
+            
+            # If we still don't have a company name, try the title of the filing itself
+            if not company_name:
                 # Try to extract company name from filing URL or response
                 try:
-                    response = requests.get(filing_url, headers={'User-Agent': 'InsightLens Research Tool (contactus@example.com)'})
+                    response = edgar_get(filing_url)
                     if response.status_code == 200:
                         from bs4 import BeautifulSoup
                         soup = BeautifulSoup(response.text, 'html.parser')
@@ -105,21 +149,6 @@ def process_10k(cik):
                                 company_name = title_text
                 except Exception as e:
                     logger.warning(f"Failed to extract company name from filing URL: {str(e)}")
-            
-            # If we still don't have a company name, try getting it from the SEC API
-            if not company_name:
-                try:
-                    # Format CIK with leading zeros for API request
-                    cik_padded = cik.zfill(10)
-                    headers = {'User-Agent': 'InsightLens Research Tool (contactus@example.com)'}
-                    api_url = f"https://data.sec.gov/submissions/CIK{cik_padded}.json"
-                    response = requests.get(api_url, headers=headers)
-                    if response.status_code == 200:
-                        data = response.json()
-                        if 'name' in data:
-                            company_name = data['name']
-                except Exception as e:
-                    logger.warning(f"Failed to get company name from SEC API: {str(e)}")
         
         # If we still don't have a company name, use a placeholder with the CIK
         if not company_name:
@@ -136,11 +165,11 @@ def process_10k(cik):
             title=f"10-K Filing: {company_name}",
             company_name=company_name,
             cik=cik,
-            use_demo_mode=use_demo_mode,
-            use_local_processing=use_local_processing,
-            use_buffett_mode=use_buffett_mode,
-            use_biotech_mode=use_biotech_mode,
-            industry_type=industry_type
+            # Recorded so the analysis can be the base of an incremental update (see filing_watcher)
+            accession_number=filing['accession_number'],
+            filing_date=datetime.date.fromisoformat(filing['filing_date']) if filing['filing_date'] else None,
+            form_type=filing['form_type'],
+            **options
         )
         db.session.add(document)
         db.session.commit()
@@ -150,23 +179,10 @@ def process_10k(cik):
         db.session.add(processing)
         db.session.commit()
         
-        # Start processing in a background thread with app context
-        from app import app
-        
-        def process_with_app_context(doc_id):
-            with app.app_context():
-                success = process_document(doc_id)
-                
-                # If processing fails, log additional details
-                if not success:
-                    proc = Processing.query.filter_by(document_id=doc_id).first()
-                    logger.error(f"Processing failed for document {doc_id}, error: {proc.error if proc else 'Unknown error'}")
-                
-        thread = threading.Thread(target=process_with_app_context, args=(document.id,))
-        thread.daemon = True
-        thread.start()
-        
-        logger.info(f"Started processing 10-K for {company_name or cik} (Document ID: {document.id})")
+        # Queue the document for the job workers
+        enqueue('process_document', document.id, priority=PRIORITY_INTERACTIVE)
+        
+        logger.info(f"Queued processing 10-K for {company_name or cik} (Document ID: {document.id})")
         return redirect(url_for('insight_routes.show_insights', document_id=document.id))
         
     except Exception as e:
@@ -179,4 +195,149 @@ def process_10k(cik):
         elif "Connection" in error_message or "Timeout" in error_message:
             error_message = "Connection to the SEC database timed out. This could be due to high traffic. Please try again later."
         
-        return render_template('edgar_search.html', error=f"Error processing 10-K: {error_message}")
\ No newline at end of file
+        return render_template('edgar_search.html', error=f"Error processing 10-K: {error_message}")
+
+
+def start_10k_history(cik, years, company_name=None, options=None):
+    """
+    Create linked documents for the last N 10-K filings and queue them for processing
+    
+    Args:
+        cik (str): Company CIK
+        years (int): Number of fiscal years
+        company_name (str, optional): Company name; read from the submissions metadata if missing
+        options (dict, optional): Analysis options (see get_processing_options)
+        
+    Returns:
+        tuple: (filing group ID, list of created documents), most recent filing first
+    """
+    filings = get_10k_history(cik, years)
+    if not filings:
+        raise ValueError(f"Could not find 10-K filing for CIK: {cik}")
+    
+    if not company_name:
+        try:
+            company_name = get_submissions(cik).get('name')
+        except Exception as e:
+            logger.warning(f"Failed to get company name from SEC API: {str(e)}")
+        company_name = company_name or f"Company CIK: {cik}"
+    
+    filing_group = str(uuid.uuid4())
+    documents = []
+    for filing in filings:
+        fiscal_year = (filing['report_date'] or filing['filing_date'])[:4]
+        document = Document(
+            url=filing['url'],
+            content_type='edgar',
+            title=f"10-K Filing: {company_name} (FY{fiscal_year})",
+            company_name=company_name,
+            cik=cik,
+            filing_group=filing_group,
+            accession_number=filing['accession_number'],
+            filing_date=datetime.date.fromisoformat(filing['filing_date']),
+            form_type=filing['form_type'],
+            **(options or {})
+        )
+        db.session.add(document)
+        documents.append(document)
+    db.session.flush()
+    for document in documents:
+        db.session.add(Processing(document_id=document.id))
+    db.session.commit()
+    
+    # The job workers process the filings side by side, after any interactive requests
+    for document in documents:
+        enqueue('process_document', document.id, priority=PRIORITY_HISTORY)
+    
+    logger.info(f"Queued processing {len(documents)} 10-K filings for CIK {cik} (group {filing_group})")
+    return filing_group, documents
+
+
+def get_history_status(filing_group):
+    """Return the documents of a filing group with their processing status, most recent first"""
+    documents = Document.query.filter_by(filing_group=filing_group).order_by(Document.filing_date.desc()).all()
+    statuses = []
+    for document in documents:
+        processing = Processing.query.filter_by(document_id=document.id).first()
+        statuses.append({
+            'id': document.id,
+            'title': document.title,
+            'accession_number': document.accession_number,
+            'filing_date': document.filing_date.isoformat() if document.filing_date else None,
+            'status': processing.status if processing else 'pending',
+            'error': processing.error if processing else None,
+            'processed': document.processed,
+        })
+    return statuses
+
+
+def _history_years(value):
+    """Clamp the requested number of years to 2..MAX_HISTORY_YEARS"""
+    return max(2, min(value or DEFAULT_HISTORY_YEARS, MAX_HISTORY_YEARS))
+
+
+@bp.route('/history/<cik>', methods=['GET'])
+def process_10k_history(cik):
+    """
+    Fetch and process the 10-K filings of the last N years for a company
+    """
+    try:
+        years = _history_years(request.args.get('years', DEFAULT_HISTORY_YEARS, type=int))
+        company_name = request.args.get('company_name', '') or request.args.get('name', '')
+        filing_group, _ = start_10k_history(cik, years, company_name, get_processing_options(request.args))
+        return redirect(url_for('edgar.history_status', filing_group=filing_group))
+    except Exception as e:
+        logger.error(f"Error processing 10-K history for CIK {cik}: {str(e)}")
+        return render_template('edgar_search.html', error=f"Error processing 10-K history: {str(e)}")
+
+
+@bp.route('/history/group/<filing_group>', methods=['GET'])
+def history_status(filing_group):
+    """
+    Show the progress of a 10-K history and offer the comparison once it is processed
+    """
+    statuses = get_history_status(filing_group)
+    if not statuses:
+        return render_template('edgar_search.html', error='Filing history not found')
+    finished = all(status['status'] in HISTORY_FINAL_STATUSES for status in statuses)
+    return render_template('edgar_history.html', filing_group=filing_group, filings=statuses, finished=finished)
+
+
+@bp.route('/api/history/<cik>', methods=['POST'])
+def api_process_10k_history(cik):
+    """
+    API endpoint to fetch and process the 10-K filings of the last N years
+    
+    Accepts JSON {"years": N, "company_name": "..."}; returns the filing group and
+    the created document IDs.
+    """
+    data = request.get_json(silent=True) or {}
+    try:
+        years = _history_years(int(data.get('years', DEFAULT_HISTORY_YEARS)))
+        filing_group, documents = start_10k_history(
+            cik, years, data.get('company_name'), get_processing_options(data)
+        )
+    except Exception as e:
+        logger.error(f"API error processing 10-K history for CIK {cik}: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+    
+    return jsonify({
+        'filing_group': filing_group,
+        'document_ids': [document.id for document in documents],
+        'status_url': url_for('edgar.api_history_status', filing_group=filing_group),
+    }), 202
+
+
+@bp.route('/api/history/group/<filing_group>', methods=['GET'])
+def api_history_status(filing_group):
+    """
+    API endpoint for the processing status of a 10-K history
+    """
+    statuses = get_history_status(filing_group)
+    if not statuses:
+        return jsonify({'error': 'Filing history not found'}), 404
+    return jsonify({
+        'filing_group': filing_group,
+        'filings': statuses,
+        'finished': all(status['status'] in HISTORY_FINAL_STATUSES for status in statuses),
+    })
@@ -7,7 +7,8 @@ import os
 from app import db
 from models import Document, Insight
 from services.pdf_export import create_pdf_export
-from services.document_processor import get_document_content
+from services.document_processor import get_document_content, get_financial_context
+from services.pipeline import record_insights
 from services.ai_service import generate_insights
 
 # Create the blueprint
@@ -75,13 +76,14 @@ def regenerate_insight(document_id, category):
     
     if not content:
         flash('Could not retrieve document content.', 'error')
-        return redirect(url_for('insight.show_insights', document_id=document_id))
+        return redirect(url_for('insight_routes.show_insights', document_id=document_id))
     
     try:
         # Generate new insights for the specific category
         new_insights = generate_insights(
             content, 
-            filter_categories=[category]
+            filter_categories=[category],
+            financial_context=get_financial_context(document)
         )
         
         if category in new_insights:
@@ -98,6 +100,7 @@ def regenerate_insight(document_id, category):
             )
             db.session.add(new_insight)
             db.session.commit()
+            record_insights(document.id, {category: new_insights[category]}, overwrite=True)
             
             flash(f'Successfully regenerated {category} insights.', 'success')
         else:
@@ -106,4 +109,4 @@ def regenerate_insight(document_id, category):
     except Exception as e:
         flash(f'Error regenerating insights: {str(e)}', 'error')
     
-    return redirect(url_for('insight.show_insights', document_id=document_id))
\ No newline at end of file
+    return redirect(url_for('insight_routes.show_insights', document_id=document_id))
\ No newline at end of file
@@ -1,5 +1,8 @@
 from flask import Blueprint, render_template, jsonify, request, current_app, abort, redirect, url_for
 from models import Document, Insight, Processing, db
+from services.extraction_metrics import get_latest_run_for_document
+from services.job_queue import cancel_document_jobs
+from services.pipeline import get_stages
 import datetime
 
 bp = Blueprint('insight_routes', __name__)
@@ -30,13 +33,41 @@ def check_processing_status(document_id):
     result = {
         'status': processing.status,
         'started_at': processing.started_at.isoformat() if processing.started_at else None,
-        'completed_at': processing.completed_at.isoformat() if processing.completed_at else None
+        'completed_at': processing.completed_at.isoformat() if processing.completed_at else None,
+        'pages_done': processing.pages_done,
+        'pages_total': processing.pages_total,
+        'stages': [{'stage': stage.stage, 'status': stage.status} for stage in get_stages(document_id)]
     }
     
     if processing.error:
         result['error'] = processing.error
     
     return jsonify(result)
+
+@bp.route('/api/processing/<int:document_id>/metrics')
+def processing_metrics(document_id):
+    """
+    API endpoint with page extraction metrics for a document
+    
+    Returns the live metrics while extraction is running in this process,
+    otherwise the summary stored on the processing record.
+    """
+    live_metrics = get_latest_run_for_document(document_id)
+    if live_metrics and live_metrics['status'] == 'running':
+        return jsonify(live_metrics)
+    
+    processing = Processing.query.filter_by(document_id=document_id).first()
+    stored_metrics = processing.get_extraction_metrics() if processing else None
+    
+    if stored_metrics:
+        return jsonify(stored_metrics)
+    if live_metrics:
+        return jsonify(live_metrics)
+    
+    return jsonify({
+        'status': 'unknown',
+        'message': 'No extraction metrics recorded for this document'
+    }), 404
     
 @bp.route('/api/processing/<int:document_id>/cancel', methods=['POST'])
 def cancel_processing(document_id):
@@ -69,6 +100,9 @@ def cancel_processing(document_id):
     
     db.session.commit()
     
+    # Drop its queued job and stop a running one at its next check
+    cancel_document_jobs(document_id)
+    
     return jsonify({
         'status': 'success',
         'message': 'Processing cancelled successfully'
@@ -92,5 +126,6 @@ def cancel_processing_redirect(document_id):
         document.processed = True
         
         db.session.commit()
+        cancel_document_jobs(document_id)
     
     return redirect(url_for('document_routes.index'))
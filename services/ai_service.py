@@ -1,8 +1,10 @@
 import os
 import json
 import logging
+import threading
 import requests
 from services.new_prompt_templates import NEW_PROMPT_TEMPLATES
+from services.cancellation import CancellationToken, ProcessingCancelled
 
 # Optional import of OpenAI
 OPENAI_AVAILABLE = False
@@ -18,6 +20,13 @@ logger = logging.getLogger(__name__)
 # AI Model Configuration - OpenAI only
 AI_MODEL_TYPE = "openai"  # Only OpenAI is supported now
 
+# Start of the placeholder content returned for a category when its AI call fails
+ERROR_INSIGHT_PREFIXES = ('<p>Unable to generate', '<p>API quota exceeded', '<p>API usage limit reached', '<p>OpenAI')
+
+def is_error_insight(content):
+    """Check whether insight content is a placeholder for a failed AI call"""
+    return not content or content.startswith(ERROR_INSIGHT_PREFIXES)
+
 # Initialize OpenAI client functions
 def get_openai_client(validate=True):
     """
@@ -172,18 +181,36 @@ DOCUMENT CONTENT:
 # Combine base templates with new ones and industry templates
 PROMPT_TEMPLATES = {**BASE_PROMPT_TEMPLATES, **NEW_PROMPT_TEMPLATES, **INDUSTRY_TEMPLATES}
 
-def generate_insights(content, additional_prompt_templates=None, filter_categories=None, exclude_categories=None):
+# Categories whose prompts receive structured financial data ahead of the document content
+FINANCIAL_CONTEXT_CATEGORIES = ['financial', 'margin_of_safety', 'buffett_analysis', 'financial_institutions']
+
+def with_financial_context(category, content, financial_context):
     """
-    Generate structured insights from document content using the configured AI model
-    Returns a dictionary mapping insight categories to their content
+    Put structured financial data ahead of the document content for financial categories
+    
+    The tables take the place of the end of the (already budgeted) document text, so
+    the prompt is no longer than it would be without them. At least a quarter of the
+    text is kept however large the tables are.
     
     Args:
-        content (str): The document content to analyze
-        additional_prompt_templates (dict, optional): A dictionary mapping additional prompt template 
-            names to boolean values indicating whether to include them in the analysis
-        filter_categories (list, optional): A list of category names to include (if specified, only these 
-            categories will be analyzed)
-        exclude_categories (list, optional): A list of category names to exclude from analysis
+        category (str): The insight category being generated
+        content (str): The (optimized) document content
+        financial_context (str, optional): Compact financial tables or fact sheet for the document
+        
+    Returns:
+        str: Content to fill into the prompt template
+    """
+    if not financial_context or category not in FINANCIAL_CONTEXT_CATEGORIES:
+        return content
+    text = content[:max(len(content) - len(financial_context), len(content) // 4)]
+    return f"STRUCTURED FINANCIAL DATA (tables, columns are periods):\n{financial_context}\n\nDOCUMENT TEXT:\n{text}"
+
+def resolve_categories(filter_categories=None, additional_prompt_templates=None, exclude_categories=None):
+    """
+    Work out the insight categories to analyze, in order (see generate_insights for the arguments)
+    
+    Returns:
+        list: Category names
     """
     # Default categories to analyze
     if filter_categories:
@@ -206,16 +233,50 @@ def generate_insights(content, additional_prompt_templates=None, filter_categori
         categories_to_analyze = [category for category in categories_to_analyze if category not in exclude_categories]
         logger.info(f"After exclusions, analyzing categories: {categories_to_analyze}")
     
+    return categories_to_analyze
+
+def cache_prompt(categories, financial_context=None):
+    """
+    Prompt part of the AI response cache key
+    
+    The financial context belongs here rather than after the content: only the start
+    of the content is hashed for the key (see cache_service.generate_content_hash),
+    so tables appended to a long document would never reach it.
+    """
+    combined_prompt = "".join(PROMPT_TEMPLATES[category] for category in categories if category in PROMPT_TEMPLATES)
+    if financial_context:
+        combined_prompt += f"\nSTRUCTURED FINANCIAL DATA:\n{financial_context}"
+    return combined_prompt
+
+def generate_insights(content, additional_prompt_templates=None, filter_categories=None, exclude_categories=None, financial_context=None,
+                      cancel_token=None, on_insight=None):
+    """
+    Generate structured insights from document content using the configured AI model
+    Returns a dictionary mapping insight categories to their content
+    
+    Args:
+        content (str): The document content to analyze
+        additional_prompt_templates (dict, optional): A dictionary mapping additional prompt template 
+            names to boolean values indicating whether to include them in the analysis
+        filter_categories (list, optional): A list of category names to include (if specified, only these 
+            categories will be analyzed)
+        exclude_categories (list, optional): A list of category names to exclude from analysis
+        financial_context (str, optional): Compact financial statement tables, passed to the
+            financial categories ahead of the document content
+        cancel_token (CancellationToken, optional): Checked before each category; raises
+            ProcessingCancelled once it is cancelled
+        on_insight (callable, optional): Called as on_insight(category, content) as soon as
+            each category is generated, so finished categories survive a later failure
+    """
+    categories_to_analyze = resolve_categories(filter_categories, additional_prompt_templates, exclude_categories)
+    
     # Check for cached results first
     try:
         # Import here to avoid circular imports
         from services.cache_service import get_cached_ai_response, save_ai_response
         
-        # Get combined prompt for cache key
-        combined_prompt = "".join(PROMPT_TEMPLATES[category] for category in categories_to_analyze if category in PROMPT_TEMPLATES)
-        
         # Look for cached responses
-        cached_insights = get_cached_ai_response(content, combined_prompt, AI_MODEL_TYPE)
+        cached_insights = get_cached_ai_response(content, cache_prompt(categories_to_analyze, financial_context), AI_MODEL_TYPE)
         if cached_insights:
             logger.info("Using cached insights")
             # Filter the cached insights to only include the requested categories
@@ -230,7 +291,7 @@ def generate_insights(content, additional_prompt_templates=None, filter_categori
     # No cached results, generate new insights using OpenAI
     try:
         if OPENAI_AVAILABLE:
-            insights = generate_insights_with_openai(content, categories_to_analyze)
+            insights = generate_insights_with_openai(content, categories_to_analyze, financial_context, cancel_token, on_insight)
         else:
             logger.error("OpenAI is not available - please ensure OpenAI library is installed")
             return {
@@ -241,14 +302,14 @@ def generate_insights(content, additional_prompt_templates=None, filter_categori
         # Cache the results
         try:
             from services.cache_service import save_ai_response
-            # Get combined prompt for cache key - include all requested categories
-            combined_prompt = "".join(PROMPT_TEMPLATES[category] for category in categories_to_analyze if category in PROMPT_TEMPLATES)
-            save_ai_response(content, combined_prompt, AI_MODEL_TYPE, insights)
+            save_ai_response(content, cache_prompt(categories_to_analyze, financial_context), AI_MODEL_TYPE, insights)
         except Exception as cache_save_error:
             logger.warning(f"Error saving to cache: {str(cache_save_error)}")
             
         return insights
         
+    except ProcessingCancelled:
+        raise
     except Exception as e:
         logger.error(f"All AI models failed to generate insights: {str(e)}")
         error_message = str(e)
@@ -266,13 +327,14 @@ def generate_insights(content, additional_prompt_templates=None, filter_categori
             for category in categories_to_analyze
         }
 
-def optimize_content_for_analysis(content, token_budget=8000):
+def optimize_content_for_analysis(content, token_budget=8000, cancel_token=None):
     """
     Optimize document content for analysis by fitting it within a token budget
     
     Args:
         content (str): The original document content
         token_budget (int): Maximum number of tokens to use for the content
+        cancel_token (CancellationToken, optional): Stops the summary request of a very large document
     
     Returns:
         str: Optimized content that fits within the token budget
@@ -313,7 +375,7 @@ def optimize_content_for_analysis(content, token_budget=8000):
     if estimated_tokens > token_budget * 2:
         # Create a summary of key points from a portion of the document
         sample_size = min(len(content), token_budget * 4)  # Sample to stay within token limits
-        return create_content_summary(content[:sample_size], token_budget)
+        return create_content_summary(content[:sample_size], token_budget, cancel_token)
     
     # Strategy 2: Extract important sections
     # Take beginning, middle, and end portions
@@ -355,13 +417,14 @@ def optimize_content_for_analysis(content, token_budget=8000):
     
     return optimized_content
 
-def create_content_summary(content, token_budget=3000):
+def create_content_summary(content, token_budget=3000, cancel_token=None):
     """
     Create a summary of the content to fit within token budget
     
     Args:
         content (str): The content to summarize
         token_budget (int): Maximum number of tokens for the result
+        cancel_token (CancellationToken, optional): Stops the summary request (see create_chat_completion)
     
     Returns:
         str: A summarized version of the content
@@ -396,7 +459,10 @@ def create_content_summary(content, token_budget=3000):
         if not client:
             raise Exception("OpenAI API key not configured or invalid")
             
-        summary_response = client.chat.completions.create(
+        summary = create_chat_completion(
+            client,
+            cancel_token or CancellationToken(),
+            "the content summary",
             model="gpt-4o",
             messages=[
                 {"role": "system", "content": "You are a business analyst who extracts key facts from documents."},
@@ -406,9 +472,6 @@ def create_content_summary(content, token_budget=3000):
             max_tokens=1000
         )
         
-        # Extract summary
-        summary = summary_response.choices[0].message.content
-        
         # Track API usage
         from models import ApiUsage, db
         api_usage = ApiUsage(
@@ -425,6 +488,8 @@ def create_content_summary(content, token_budget=3000):
         
         return f"DOCUMENT SUMMARY:\n{summary}"
     
+    except ProcessingCancelled:
+        raise
     except Exception as e:
         logger.error(f"Error generating summary: {str(e)}")
         # Fall back to manual extraction
@@ -484,14 +549,73 @@ def extract_key_sections(content, token_budget=3000):
     
     return extracted_content
 
-def generate_insights_with_openai(content, categories_to_analyze=None):
+def create_chat_completion(client, cancel_token, stage=None, **kwargs):
+    """
+    Run a streamed chat completion that stops as soon as the token is cancelled
+    
+    Closing the client does not interrupt a request in flight, so the request runs in
+    a worker thread and is streamed. The caller returns as soon as the token is
+    cancelled; the worker closes the stream at the next chunk, which ends the
+    generation on OpenAI's side, so a cancelled request is not generated to the end.
+    
+    Args:
+        client (OpenAI): Client to send the request with
+        cancel_token (CancellationToken): Token of the processing the request belongs to
+        stage (str, optional): Description used in the ProcessingCancelled message
+        **kwargs: Arguments of client.chat.completions.create
+        
+    Returns:
+        str: The generated message content
+        
+    Raises:
+        ProcessingCancelled: If the token is cancelled before the completion finished
+    """
+    result = {}
+    done = threading.Event()
+    
+    def run():
+        try:
+            parts = []
+            stream = client.chat.completions.create(stream=True, **kwargs)
+            with stream:
+                for chunk in stream:
+                    if cancel_token.cancelled:
+                        logger.info("Closing the stream of a cancelled completion")
+                        return
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        parts.append(chunk.choices[0].delta.content)
+            result['content'] = ''.join(parts)
+        except Exception as e:
+            result['error'] = e
+        finally:
+            done.set()
+    
+    threading.Thread(target=run, name='openai-completion', daemon=True).start()
+    with cancel_token.abort_on_cancel(done.set):
+        done.wait()
+    
+    cancel_token.raise_if_cancelled(stage)
+    if 'error' in result:
+        raise result['error']
+    return result['content']
+
+
+def generate_insights_with_openai(content, categories_to_analyze=None, financial_context=None, cancel_token=None,
+                                  on_insight=None):
     """
     Generate insights using OpenAI's API
     
     Args:
         content (str): The document content to analyze
         categories_to_analyze (list, optional): List of categories to analyze
+        financial_context (str, optional): Compact financial statement tables for financial categories
+        cancel_token (CancellationToken, optional): Checked between categories; a request in
+            flight is abandoned and its stream closed when the token is cancelled
+            (see create_chat_completion)
+        on_insight (callable, optional): Called as on_insight(category, content) after each
+            category is generated successfully
     """
+    cancel_token = cancel_token or CancellationToken()
     # Default categories if none specified
     if categories_to_analyze is None:
         categories_to_analyze = ['business_summary', 'moat', 'financial', 'management']
@@ -523,11 +647,13 @@ def generate_insights_with_openai(content, categories_to_analyze=None):
         }
     
     # Optimize the content to reduce token usage
-    optimized_content = optimize_content_for_analysis(content)
+    optimized_content = optimize_content_for_analysis(content, cancel_token=cancel_token)
     
     try:
         # Process only the requested insight categories
         for category in categories_to_analyze:
+            cancel_token.raise_if_cancelled(f"the {category} insight")
+            
             # Skip if the category doesn't have a template
             if category not in PROMPT_TEMPLATES:
                 logger.warning(f"No template found for category: {category}")
@@ -536,7 +662,9 @@ def generate_insights_with_openai(content, categories_to_analyze=None):
             prompt_template = PROMPT_TEMPLATES[category]
             try:
                 # Fill the prompt template with optimized content
-                prompt = prompt_template.format(content=optimized_content)
+                prompt = prompt_template.format(
+                    content=with_financial_context(category, optimized_content, financial_context)
+                )
                 
                 # Make OpenAI API call
                 # the newest OpenAI model is "gpt-4o" which was released May 13, 2024.
@@ -554,7 +682,11 @@ def generate_insights_with_openai(content, categories_to_analyze=None):
                 
                 for retry in range(max_retries + 1):
                     try:
-                        response = client.chat.completions.create(
+                        # Streamed, so the request stops if processing is cancelled meanwhile
+                        insight_content = create_chat_completion(
+                            client,
+                            cancel_token,
+                            f"the {category} insight",
                             model="gpt-4o",
                             messages=[
                                 {"role": "system", "content": "You are an AI assistant that helps analyze company documents using value investing principles. Your answers should be concise and factual."},
@@ -563,9 +695,6 @@ def generate_insights_with_openai(content, categories_to_analyze=None):
                             temperature=0.3,  # Lower temperature for more focused responses
                             max_tokens=800    # Shorter responses
                         )
-                        
-                        # Extract the insight content from response
-                        insight_content = response.choices[0].message.content
                         insights[category] = insight_content
                         
                         # If we get here, the request was successful, break out of retry loop
@@ -574,6 +703,7 @@ def generate_insights_with_openai(content, categories_to_analyze=None):
                         break
                         
                     except Exception as retry_error:
+                        cancel_token.raise_if_cancelled(f"the {category} insight")
                         error_str = str(retry_error).lower()
                         
                         # Check if this is a retryable error
@@ -585,8 +715,8 @@ def generate_insights_with_openai(content, categories_to_analyze=None):
                             logger.warning(f"Retryable error on attempt {retry+1}/{max_retries+1}: {str(retry_error)}")
                             
                             # Exponential backoff
-                            import time
-                            time.sleep(backoff_time)
+                            cancel_token.wait(backoff_time)
+                            cancel_token.raise_if_cancelled(f"the {category} insight")
                             backoff_time *= 2  # Double the backoff time for next retry
                             
                             continue
@@ -628,7 +758,11 @@ def generate_insights_with_openai(content, categories_to_analyze=None):
                     logger.error(f"Error recording API usage: {str(usage_error)}")
                 
                 logger.info(f"Successfully generated {category} insight with OpenAI")
+                if on_insight:
+                    on_insight(category, insight_content)
                 
+            except ProcessingCancelled:
+                raise
             except Exception as e:
                 logger.error(f"Error generating {category} insight with OpenAI: {str(e)}")
                 # Record failed API usage
@@ -652,10 +786,14 @@ def generate_insights_with_openai(content, categories_to_analyze=None):
                 # Provide a fallback message for failed insights
                 insights[category] = f"<p>Unable to generate {category} insight. Error: {str(e)}</p>"
     
+    except ProcessingCancelled:
+        raise
     except Exception as e:
         logger.error(f"Error in content preprocessing: {str(e)}")
         # Fallback to a simpler approach if summarization fails
         for category in categories_to_analyze:
+            cancel_token.raise_if_cancelled(f"the {category} insight")
+            
             # Skip if the category doesn't have a template
             if category not in PROMPT_TEMPLATES:
                 logger.warning(f"No template found for category: {category}")
@@ -664,7 +802,9 @@ def generate_insights_with_openai(content, categories_to_analyze=None):
             prompt_template = PROMPT_TEMPLATES[category]
             try:
                 # Use a much smaller content sample for fallback
-                prompt = prompt_template.format(content=content[:5000])
+                prompt = prompt_template.format(
+                    content=with_financial_context(category, content[:5000], financial_context)
+                )
                 
                 # the newest OpenAI model is "gpt-4o" which was released May 13, 2024.
                 # do not change this unless explicitly requested by the user
@@ -675,7 +815,10 @@ def generate_insights_with_openai(content, categories_to_analyze=None):
                 # Use a simplified retry mechanism for the fallback path
                 max_retries = 1
                 try:
-                    response = client.chat.completions.create(
+                    insights[category] = create_chat_completion(
+                        client,
+                        cancel_token,
+                        f"the {category} insight",
                         model="gpt-4o",
                         messages=[
                             {"role": "system", "content": "You are an AI assistant that helps analyze company documents using value investing principles."},
@@ -684,14 +827,18 @@ def generate_insights_with_openai(content, categories_to_analyze=None):
                         temperature=0.3,
                         max_tokens=800
                     )
-                    
-                    insights[category] = response.choices[0].message.content
                     logger.info(f"Generated {category} insight with fallback method")
+                    if on_insight:
+                        on_insight(category, insights[category])
                 
+                except ProcessingCancelled:
+                    raise
                 except Exception as e:
                     logger.error(f"OpenAI fallback failed: {str(e)}")
                     insights[category] = f"<p>Unable to generate {category} insight. Error: {str(e)}</p>"
                 
+            except ProcessingCancelled:
+                raise
             except Exception as e2:
                 logger.error(f"Error in fallback generation for {category}: {str(e2)}")
                 insights[category] = f"<p>Unable to generate {category} insight. Error: {str(e2)}</p>"
@@ -0,0 +1,141 @@
+"""
+Cooperative cancellation of document processing
+
+Cancelling a document only sets its processing status to 'cancelled'. The code that
+processes it holds a CancellationToken, checks it between pipeline stages and between
+insight categories, and stops with ProcessingCancelled once it is set. While a token
+is started, a watcher thread polls the processing status, so a cancellation made by
+another process (the web app while a worker runs the job) is seen within
+CANCEL_POLL_SECONDS. Callbacks registered with abort_on_cancel run as soon as the
+token is cancelled, e.g. to stop waiting for a streamed OpenAI request in flight.
+"""
+
+import os
+import logging
+import threading
+import contextlib
+
+logger = logging.getLogger(__name__)
+
+# Seconds between checks of the processing status for a cancellation
+CANCEL_POLL_SECONDS = float(os.environ.get('CANCEL_POLL_SECONDS', 2))
+
+# Started tokens in this process by document ID, so a local cancel is seen at once
+_active_tokens = {}
+_active_lock = threading.Lock()
+
+
+class ProcessingCancelled(Exception):
+    """Raised by code that stops because its document's processing was cancelled"""
+
+
+class CancellationToken:
+    """
+    Cancellation flag for the processing of one document
+
+    A token without a document ID is only cancelled by calling cancel(), which makes
+    it a safe default for callers that do not support cancellation.
+    """
+
+    def __init__(self, document_id=None, poll_seconds=None):
+        self.document_id = document_id
+        self.poll_seconds = CANCEL_POLL_SECONDS if poll_seconds is None else poll_seconds
+        self._event = threading.Event()
+        self._stopped = threading.Event()
+        self._callbacks = []
+        self._lock = threading.Lock()
+        self._watcher = None
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def cancel(self):
+        """Set the token and run the registered abort callbacks"""
+        with self._lock:
+            if self._event.is_set():
+                return
+            self._event.set()
+            callbacks = list(self._callbacks)
+        logger.info(f"Cancelling processing of document {self.document_id}")
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logger.warning(f"Abort callback for document {self.document_id} failed: {str(e)}")
+
+    def raise_if_cancelled(self, stage=None):
+        """Raise ProcessingCancelled if the token is set"""
+        if self._event.is_set():
+            where = f" before {stage}" if stage else ""
+            raise ProcessingCancelled(f"Processing of document {self.document_id} was cancelled{where}")
+
+    def wait(self, seconds):
+        """Sleep for up to seconds; returns True early if the token is cancelled"""
+        return self._event.wait(seconds)
+
+    @contextlib.contextmanager
+    def abort_on_cancel(self, callback):
+        """Run callback if the token is cancelled while the block runs (or already is)"""
+        with self._lock:
+            self._callbacks.append(callback)
+            already_cancelled = self._event.is_set()
+        if already_cancelled:
+            callback()
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._callbacks.remove(callback)
+
+    def start(self):
+        """Watch the document's processing status until stop() is called"""
+        if self.document_id is None or self._watcher is not None:
+            return self
+        with _active_lock:
+            _active_tokens.setdefault(self.document_id, set()).add(self)
+        self._watcher = threading.Thread(target=self._watch, name=f"cancel-watch-{self.document_id}", daemon=True)
+        self._watcher.start()
+        return self
+
+    def stop(self):
+        """Stop watching; the token keeps its state"""
+        self._stopped.set()
+        with _active_lock:
+            tokens = _active_tokens.get(self.document_id)
+            if tokens is not None:
+                tokens.discard(self)
+                if not tokens:
+                    del _active_tokens[self.document_id]
+
+    def _watch(self):
+        from app import app, db
+        from models import Processing
+
+        while not self._stopped.wait(self.poll_seconds) and not self._event.is_set():
+            with app.app_context():
+                try:
+                    status = (db.session.query(Processing.status)
+                              .filter_by(document_id=self.document_id)
+                              .scalar())
+                except Exception as e:
+                    logger.warning(f"Could not check document {self.document_id} for cancellation: {str(e)}")
+                    status = None
+                finally:
+                    db.session.remove()
+            if status == 'cancelled':
+                self.cancel()
+
+
+def cancel_local(document_id):
+    """
+    Cancel the started tokens of a document in this process right away
+
+    Returns:
+        int: Number of tokens cancelled
+    """
+    with _active_lock:
+        tokens = list(_active_tokens.get(document_id, ()))
+    for token in tokens:
+        token.cancel()
+    return len(tokens)
@@ -0,0 +1,290 @@
+"""
+Local company index for SEC EDGAR search
+
+Built from the SEC bulk company/ticker file (company_tickers.json), so company search
+needs no request to EDGAR. Names and tickers are kept in sorted arrays and searched
+with bisect for prefix matches; every word of a company name is indexed as well, so
+"platforms" finds "Meta Platforms, Inc.".
+
+Refresh the local file with:
+    python -m services.company_index
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import bisect
+import difflib
+import logging
+import tempfile
+import threading
+
+logger = logging.getLogger(__name__)
+
+COMPANY_TICKERS_URL = 'https://www.sec.gov/files/company_tickers.json'
+
+# Local copy of the SEC company/ticker file
+COMPANY_INDEX_PATH = os.environ.get(
+    'COMPANY_INDEX_PATH',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'company_tickers.json')
+)
+
+# The local file is refreshed in the background once it is older than this
+COMPANY_INDEX_MAX_AGE_DAYS = float(os.environ.get('COMPANY_INDEX_MAX_AGE_DAYS', 7))
+
+# Common suffixes ignored when matching names
+NAME_STOPWORDS = {'inc', 'corp', 'corporation', 'co', 'company', 'ltd', 'plc', 'llc', 'lp', 'holdings', 'the'}
+
+_TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+# After a failed load or download, wait this long before trying again
+RETRY_AFTER_SECONDS = 300
+
+_index = None
+_index_lock = threading.Lock()
+_refresh_thread = None
+_last_failure = 0.0
+
+
+def normalize(text):
+    """Lowercase a name or query and reduce it to space-separated alphanumeric words"""
+    return ' '.join(_TOKEN_RE.findall((text or '').lower().replace('&', ' and ')))
+
+
+def _prefix_range(sorted_keys, prefix):
+    """Return the (start, end) slice of sorted_keys that start with prefix"""
+    start = bisect.bisect_left(sorted_keys, prefix)
+    end = bisect.bisect_left(sorted_keys, prefix + '\uffff', start)
+    return start, end
+
+
+class CompanyIndex:
+    """
+    In-memory company index over sorted arrays
+
+    Args:
+        companies (list): Dicts with 'cik', 'ticker' and 'name'
+    """
+
+    def __init__(self, companies):
+        self.companies = []
+        seen = set()
+        for company in companies:
+            key = (company['cik'], company['ticker'])
+            if key not in seen:
+                seen.add(key)
+                self.companies.append(company)
+
+        names = sorted((normalize(company['name']), i) for i, company in enumerate(self.companies))
+        self._name_keys = [key for key, _ in names]
+        self._name_ids = [i for _, i in names]
+
+        tickers = sorted((company['ticker'].lower(), i) for i, company in enumerate(self.companies) if company['ticker'])
+        self._ticker_keys = [key for key, _ in tickers]
+        self._ticker_ids = [i for _, i in tickers]
+
+        words = sorted(
+            (word, i)
+            for i, company in enumerate(self.companies)
+            for word in set(normalize(company['name']).split())
+        )
+        self._word_keys = [key for key, _ in words]
+        self._word_ids = [i for _, i in words]
+        self._vocabulary = sorted(set(self._word_keys))
+
+    def __len__(self):
+        return len(self.companies)
+
+    def search(self, query, limit=20):
+        """
+        Search by ticker, name prefix or word prefixes
+
+        Results are ranked: exact ticker, exact name, ticker prefix, name prefix, then
+        names containing a word starting with every query word. If nothing matches, query
+        words are corrected against the name vocabulary for a close (fuzzy) match.
+
+        Args:
+            query (str): Company name or ticker, possibly partial
+            limit (int): Maximum number of results
+
+        Returns:
+            list: Matching companies as dicts with 'cik', 'ticker' and 'name'
+        """
+        normalized = normalize(query)
+        if not normalized:
+            return []
+
+        results = self._search_normalized(normalized, limit)
+        if results:
+            return results
+
+        # Fuzzy fallback: correct each query word to its closest indexed word
+        corrected = []
+        for word in normalized.split():
+            matches = difflib.get_close_matches(word, self._vocabulary, n=1, cutoff=0.75)
+            corrected.append(matches[0] if matches else word)
+        corrected = ' '.join(corrected)
+        if corrected != normalized:
+            return self._search_normalized(corrected, limit)
+        return []
+
+    def _search_normalized(self, normalized, limit):
+        ranked = {}
+
+        def add(company_id, rank):
+            if company_id not in ranked or rank < ranked[company_id]:
+                ranked[company_id] = rank
+
+        ticker = normalized.replace(' ', '')
+        start, end = _prefix_range(self._ticker_keys, ticker)
+        for pos in range(start, min(end, start + limit * 5)):
+            add(self._ticker_ids[pos], 0 if self._ticker_keys[pos] == ticker else 2)
+
+        start, end = _prefix_range(self._name_keys, normalized)
+        for pos in range(start, min(end, start + limit * 5)):
+            add(self._name_ids[pos], 1 if self._name_keys[pos] == normalized else 3)
+
+        # Every significant query word must prefix-match a word of the name
+        words = [word for word in normalized.split() if word not in NAME_STOPWORDS] or normalized.split()
+        candidates = None
+        for word in sorted(words, key=len, reverse=True):
+            start, end = _prefix_range(self._word_keys, word)
+            ids = set(self._word_ids[start:end])
+            candidates = ids if candidates is None else candidates & ids
+            if not candidates:
+                break
+        for company_id in candidates or ():
+            add(company_id, 4)
+
+        ordered = sorted(ranked, key=lambda i: (ranked[i], len(self.companies[i]['name']), self.companies[i]['name']))
+
+        # Companies with several share classes appear once, under their best-ranked ticker
+        results = []
+        seen_ciks = set()
+        for company_id in ordered:
+            company = self.companies[company_id]
+            if company['cik'] not in seen_ciks:
+                seen_ciks.add(company['cik'])
+                results.append(dict(company))
+                if len(results) == limit:
+                    break
+        return results
+
+
+def parse_company_tickers(data):
+    """
+    Convert the SEC company_tickers.json payload into company dicts
+
+    Args:
+        data (dict): Parsed JSON, keyed by row number with cik_str, ticker and title
+
+    Returns:
+        list: Dicts with 'cik' (no leading zeros), 'ticker' and 'name'
+    """
+    rows = data.values() if isinstance(data, dict) else data
+    return [
+        {'cik': str(row['cik_str']).lstrip('0'), 'ticker': row.get('ticker') or '', 'name': row.get('title') or ''}
+        for row in rows
+        if row.get('cik_str')
+    ]
+
+
+def load_company_index(path=COMPANY_INDEX_PATH):
+    """Load the index from a local company_tickers.json file"""
+    with open(path, 'r') as f:
+        data = json.load(f)
+    index = CompanyIndex(parse_company_tickers(data))
+    logger.info(f"Loaded company index with {len(index)} entries from {path}")
+    return index
+
+
+def refresh_company_index(path=COMPANY_INDEX_PATH):
+    """
+    Download the SEC company/ticker file and replace the local copy atomically
+
+    Returns:
+        CompanyIndex: The index built from the new file
+    """
+    from services.edgar_client import edgar_get
+
+    response = edgar_get(COMPANY_TICKERS_URL)
+    response.raise_for_status()
+    data = response.json()
+    index = CompanyIndex(parse_company_tickers(data))
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+    logger.info(f"Refreshed company index with {len(index)} entries")
+    return index
+
+
+def _refresh_in_background(path):
+    global _index
+    try:
+        index = refresh_company_index(path)
+        with _index_lock:
+            _index = index
+    except Exception as e:
+        logger.warning(f"Background refresh of the company index failed: {str(e)}")
+
+
+def get_company_index():
+    """
+    Return the shared company index, or None if it is not available
+
+    The local file is loaded on first use and downloaded if it does not exist yet.
+    A stale file is still used while a fresh copy is downloaded in the background.
+    """
+    global _index, _refresh_thread, _last_failure
+    if _index is not None:
+        return _index
+
+    with _index_lock:
+        if _index is None and time.time() - _last_failure > RETRY_AFTER_SECONDS:
+            try:
+                if os.path.exists(COMPANY_INDEX_PATH):
+                    _index = load_company_index(COMPANY_INDEX_PATH)
+                    age_days = (time.time() - os.path.getmtime(COMPANY_INDEX_PATH)) / 86400
+                    if age_days > COMPANY_INDEX_MAX_AGE_DAYS and _refresh_thread is None:
+                        _refresh_thread = threading.Thread(
+                            target=_refresh_in_background, args=(COMPANY_INDEX_PATH,), daemon=True
+                        )
+                        _refresh_thread.start()
+                else:
+                    _index = refresh_company_index(COMPANY_INDEX_PATH)
+            except Exception as e:
+                logger.warning(f"Company index unavailable: {str(e)}")
+                _last_failure = time.time()
+                return None
+    return _index
+
+
+def search_company_index(query, limit=20):
+    """
+    Search the local company index
+
+    Returns:
+        list or None: Matching companies, or None if the index is unavailable
+    """
+    index = get_company_index()
+    if index is None:
+        return None
+    return index.search(query, limit=limit)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    target = sys.argv[1] if len(sys.argv) > 1 else COMPANY_INDEX_PATH
+    refreshed = refresh_company_index(target)
+    print(f"Wrote {len(refreshed)} companies to {target}")
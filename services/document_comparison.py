@@ -10,6 +10,7 @@ import logging
 import time
 from datetime import datetime
 from models import Document, Insight, db
+from services.xbrl_facts import get_company_facts, format_fact_sheet, compare_fact_tables
 
 # Set up logging
 logger = logging.getLogger(__name__)
@@ -34,8 +35,15 @@ def compare_documents(doc_ids):
         logger.error(f"Not all document IDs were found: requested {len(doc_ids)}, found {len(documents)}")
         return {"error": "One or more selected documents were not found"}
     
+    # Reported XBRL facts for EDGAR filings, one table per company
+    fact_tables = {}
+    for doc in documents:
+        if doc.cik and doc.cik not in fact_tables:
+            fact_tables[doc.cik] = get_company_facts(doc.cik)
+    
     # Extract contents and metadata for each document
     doc_data = []
+    described_ciks = set()
     for doc in documents:
         # Get the existing insights for this document
         insights = Insight.query.filter_by(document_id=doc.id).all()
@@ -50,12 +58,20 @@ def compare_documents(doc_ids):
         for insight in insights:
             insights_by_category[insight.category] = insight.content
         
+        # Include the company's fact sheet once, with its first document
+        fact_sheet = None
+        if fact_tables.get(doc.cik) and doc.cik not in described_ciks:
+            fact_sheet = format_fact_sheet(fact_tables[doc.cik])
+            described_ciks.add(doc.cik)
+        
         # Add to document data collection
         doc_data.append({
             "id": doc.id,
             "title": doc.title or doc.filename or f"Document {doc.id}",
-            "date": doc.created_at,
-            "insights": insights_by_category
+            # EDGAR filings are ordered by when they were filed, not when they were fetched
+            "date": datetime.combine(doc.filing_date, datetime.min.time()) if doc.filing_date else doc.created_at,
+            "insights": insights_by_category,
+            "fact_sheet": fact_sheet
         })
     
     # Sort documents by date
@@ -64,6 +80,14 @@ def compare_documents(doc_ids):
     # Perform comparison using specialized AI templates
     comparison_results = generate_comparison_insights(doc_data)
     
+    # Key metrics are compared locally, so they are available even without AI analysis
+    key_metrics = compare_fact_tables(list(fact_tables.values()))
+    if key_metrics:
+        if "error" in comparison_results:
+            logger.warning(f"AI comparison unavailable, returning key metrics only: {comparison_results['error']}")
+            comparison_results = {}
+        comparison_results["key_metrics"] = key_metrics
+    
     return comparison_results
 
 def generate_comparison_insights(doc_data):
@@ -181,6 +205,10 @@ def format_documents_for_comparison(doc_data):
         formatted_text += "FINANCIAL METRICS:\n"
         formatted_text += doc["insights"].get("financial", "Not available") + "\n\n"
         
+        if doc.get("fact_sheet"):
+            formatted_text += "REPORTED XBRL FACTS:\n"
+            formatted_text += doc["fact_sheet"] + "\n\n"
+        
         formatted_text += "MANAGEMENT:\n"
         formatted_text += doc["insights"].get("management", "Not available") + "\n\n"
         
@@ -1,4 +1,5 @@
 import os
+import json
 import logging
 import time
 from datetime import datetime
@@ -6,14 +7,21 @@ from werkzeug.utils import secure_filename
 from flask import current_app
 
 from app import db, app
-from models import Document, Insight, Processing, ApiUsage
+from models import Document, Insight, Processing, ApiUsage, FinancialStatement
 from services.pdf_parser import extract_pdf_content
-from services.ai_service import generate_insights, PROMPT_TEMPLATES
+from services.extraction_metrics import ExtractionMetrics
+from services.financial_tables import extract_financial_statements, format_statements_for_prompt
+from services.xbrl_facts import get_fact_sheet
+from services.ai_service import generate_insights, resolve_categories, PROMPT_TEMPLATES
+from services.cancellation import CancellationToken, ProcessingCancelled
+from services.pipeline import (STAGE_FETCH, STAGE_EXTRACT, STAGE_INDEX, STAGE_PERSIST, run_stage, record_stage,
+                               reset_stage, completed_output, completed_insights, insight_recorder, record_insights)
+from services.text_store import save_document_text, load_document_text
 # Import the demo service
 from services.demo_service import generate_demo_insights, perform_local_analysis
 # Import the edgar service if it exists
 try:
-    from services.edgar_service import extract_10k_content
+    from services.edgar_service import get_filing_text
     EDGAR_SERVICE_AVAILABLE = True
 except ImportError:
     EDGAR_SERVICE_AVAILABLE = False
@@ -27,6 +35,7 @@ except ImportError:
 
 logger = logging.getLogger(__name__)
 
+
 def process_document(document_id):
     """Process a document and generate insights"""
     # Get document from database
@@ -40,10 +49,16 @@ def process_document(document_id):
     if not processing:
         processing = Processing(document_id=document.id)
         db.session.add(processing)
+    elif processing.status == 'cancelled':
+        logger.info(f"Processing of document {document_id} was cancelled before it started")
+        return False
     
     processing.status = 'processing'
     db.session.commit()
     
+    # Checked between stages and insight categories; set when the user cancels processing
+    cancel_token = CancellationToken(document.id).start()
+    
     try:
         # Start processing timer
         start_time = time.time()
@@ -92,44 +107,20 @@ def process_document(document_id):
                 insights[category] = f"<div class='alert alert-info'>DEMO MODE: This is sample data for demonstration purposes.</div>{insights[category]}"
                 
         else:
-            # Regular processing mode - extract content based on document type
+            # Regular processing mode. Each stage stores its output, so a retry resumes
+            # after the last completed stage instead of downloading and parsing again
             extraction_start_time = time.time()
-            
-            if document.content_type == 'pdf':
-                upload_folder = current_app.config['UPLOAD_FOLDER']
-                file_path = os.path.join(upload_folder, document.filename)
-                if not os.path.exists(file_path):
-                    raise FileNotFoundError(f"PDF file not found: {file_path}")
-                
-                content = extract_pdf_content(file_path)
-            elif document.content_type == 'edgar' and EDGAR_SERVICE_AVAILABLE:
-                # If we have a CIK, use that to get the 10-K directly
-                if document.cik:
-                    from services.edgar_service import get_latest_10k
-                    filing_url = get_latest_10k(document.cik)
-                    if not filing_url:
-                        raise ValueError(f"Could not find 10-K filing for CIK: {document.cik}")
-                    content = extract_10k_content(filing_url)
-                else:
-                    # Otherwise use the URL we were given
-                    content = extract_10k_content(document.url)
-            else:
-                raise ValueError(f"Unsupported content type: {document.content_type}")
+            source = run_stage(document.id, STAGE_FETCH, lambda: fetch_document_source(document))
+            cancel_token.raise_if_cancelled('extraction')
+            content = run_extract_stage(document, source, processing, cancel_token)
+            cancel_token.raise_if_cancelled('indexing')
+            financial_context = run_stage(document.id, STAGE_INDEX,
+                                          lambda: index_document(document, source, content), as_json=True)
             
             extraction_time = time.time() - extraction_start_time
             logger.info(f"Content extraction completed in {extraction_time:.2f} seconds")
-            
-            if not content:
-                raise ValueError("Could not extract any content from the document. The document may be empty or in an unsupported format.")
-                
-            if len(content.strip()) < 500:
-                logger.warning(f"Document {document_id} has very little content: {len(content.strip())} characters")
-                
-                # For 10-K filings, provide a more specific error message
-                if document.content_type == 'edgar':
-                    raise ValueError("Could not extract sufficient content from the SEC filing. This could be due to the filing using a newer format that our system cannot process. Please try a different company or upload a PDF version of the 10-K if available.")
-            
             logger.info(f"Extracted content length: {len(content)} characters")
+            cancel_token.raise_if_cancelled('analysis')
             
             # Generate insights using either AI or local processing
             if document.use_local_processing:
@@ -201,229 +192,50 @@ def process_document(document_id):
                             additional_prompts['tech_analysis'] = True
                             logger.info(f"Adding technology analysis for {industry} company")
                 
+                # Categories finished by an earlier attempt are reused; only the rest are generated
+                categories = resolve_categories(categories_to_include, additional_prompts, categories_to_exclude)
+                insights = completed_insights(document.id, categories)
+                remaining = [category for category in categories if category not in insights]
+                if insights:
+                    logger.info(f"Reusing {len(insights)} insights of an earlier attempt for document {document_id}, "
+                                f"generating {remaining}")
+                
                 # Generate insights with the specialized templates, using the filter categories mechanism
-                insights = generate_insights(
-                    content, 
-                    additional_prompt_templates=additional_prompts,
-                    filter_categories=categories_to_include,
-                    exclude_categories=categories_to_exclude
-                )
+                generated = {}
+                if remaining:
+                    generated = generate_insights(
+                        content,
+                        filter_categories=remaining,
+                        financial_context=financial_context,
+                        cancel_token=cancel_token,
+                        on_insight=insight_recorder(document.id)
+                    )
+                insights.update(generated)
+                
+                # A cached response may lack categories requested now; ask for those once more,
+                # through the same cancellable and checkpointed path
+                missing = [category for category in remaining if category not in insights]
+                if missing:
+                    logger.info(f"Generating missing categories {missing} for document {document_id}")
+                    extra = generate_insights(
+                        content,
+                        filter_categories=missing,
+                        financial_context=financial_context,
+                        cancel_token=cancel_token,
+                        on_insight=insight_recorder(document.id)
+                    )
+                    generated.update(extra)
+                    insights.update(extra)
                 
                 ai_time = time.time() - ai_start_time
                 logger.info(f"AI insights generated in {ai_time:.2f} seconds")
                 
-                # Note: Now that we're using filtered categories in the generate_insights function,
-                # we don't need the separate code for specialized analysis anymore, since it's all handled
-                # by the additional_prompt_templates parameter and the filter_categories mechanism.
-                # The code below is kept for backward compatibility and will be deprecated in future versions.
-                
-                # Check if we need to manually add analysis for any categories that might have been missed
-                # This can happen if the model doesn't support all the requested categories
-                
-                # Check if Buffett analysis is missing but requested
-                if document.use_buffett_mode and 'buffett_analysis' not in insights:
-                    logger.info(f"Adding missing Buffett-style analysis for document {document_id}")
-                    from services.ai_service import PROMPT_TEMPLATES
-                    buffett_prompt = PROMPT_TEMPLATES['buffett_analysis'].format(content=content)
-                    
-                    if os.environ.get("HUGGINGFACE_API_KEY"):
-                        from services.open_source_ai import analyze_with_prompt
-                        buffett_insight = analyze_with_prompt(content, buffett_prompt)
-                    else:
-                        from services.ai_service import get_openai_client
-                        client = get_openai_client()
-                        response = client.chat.completions.create(
-                            model="gpt-4o",
-                            messages=[
-                                {"role": "system", "content": "You are Warren Buffett analyzing a potential investment."},
-                                {"role": "user", "content": buffett_prompt}
-                            ],
-                            temperature=0.3
-                        )
-                        buffett_insight = response.choices[0].message.content
-                    
-                    insights['buffett_analysis'] = buffett_insight
-                
-                # Check if red flags analysis is missing but requested
-                if 'red_flags' not in insights:
-                    logger.info(f"Adding missing red flags analysis for document {document_id}")
-                    from services.ai_service import PROMPT_TEMPLATES
-                    red_flags_prompt = PROMPT_TEMPLATES['red_flags'].format(content=content)
-                    
-                    if os.environ.get("HUGGINGFACE_API_KEY"):
-                        from services.open_source_ai import analyze_with_prompt
-                        red_flags_insight = analyze_with_prompt(content, red_flags_prompt)
-                    else:
-                        from services.ai_service import get_openai_client
-                        client = get_openai_client()
-                        response = client.chat.completions.create(
-                            model="gpt-4o",
-                            messages=[
-                                {"role": "system", "content": "You are a forensic financial analyst specializing in detecting red flags."},
-                                {"role": "user", "content": red_flags_prompt}
-                            ],
-                            temperature=0.3
-                        )
-                        red_flags_insight = response.choices[0].message.content
-                    
-                    insights['red_flags'] = red_flags_insight
-                
-                # Check if moat analysis is missing (Phase 2.1 feature)
-                if 'moat_analysis' not in insights:
-                    logger.info(f"Adding missing enhanced moat analysis for document {document_id}")
-                    from services.new_prompt_templates import NEW_PROMPT_TEMPLATES
-                    moat_prompt = NEW_PROMPT_TEMPLATES['moat_analysis'].format(content=content)
-                    
-                    # First try with Hugging Face if available
-                    if os.environ.get("HUGGINGFACE_API_KEY"):
-                        try:
-                            from services.open_source_ai import analyze_with_prompt
-                            moat_insight = analyze_with_prompt(content, moat_prompt)
-                            if "<p>Error calling AI service" in moat_insight or "402 Client Error" in moat_insight:
-                                # Hugging Face failed, fall back to OpenAI if available
-                                raise Exception("Hugging Face API failed, falling back to OpenAI")
-                        except Exception as e:
-                            logger.warning(f"Hugging Face API error: {str(e)}, falling back to OpenAI")
-                            # Fall back to OpenAI
-                            if os.environ.get("OPENAI_API_KEY"):
-                                from services.ai_service import get_openai_client
-                                client = get_openai_client()
-                                response = client.chat.completions.create(
-                                    model="gpt-4o",
-                                    messages=[
-                                        {"role": "system", "content": "You are Warren Buffett analyzing a company's competitive advantages."},
-                                        {"role": "user", "content": moat_prompt}
-                                    ],
-                                    temperature=0.3
-                                )
-                                moat_insight = response.choices[0].message.content
-                            else:
-                                moat_insight = "<p>Unable to generate analysis. Both Hugging Face and OpenAI services are unavailable.</p>"
-                    else:
-                        # Use OpenAI directly if no Hugging Face API key
-                        from services.ai_service import get_openai_client
-                        client = get_openai_client()
-                        if client:
-                            response = client.chat.completions.create(
-                                model="gpt-4o",
-                                messages=[
-                                    {"role": "system", "content": "You are Warren Buffett analyzing a company's competitive advantages."},
-                                    {"role": "user", "content": moat_prompt}
-                                ],
-                                temperature=0.3
-                            )
-                            moat_insight = response.choices[0].message.content
-                        else:
-                            moat_insight = "<p>Unable to generate analysis. No AI service is available.</p>"
-                    
-                    insights['moat_analysis'] = moat_insight
-                
-                # Check if margin of safety analysis is missing (Phase 2.1 feature)
-                if 'margin_of_safety' not in insights:
-                    logger.info(f"Adding missing margin of safety analysis for document {document_id}")
-                    from services.new_prompt_templates import NEW_PROMPT_TEMPLATES
-                    margin_prompt = NEW_PROMPT_TEMPLATES['margin_of_safety'].format(content=content)
-                    
-                    # First try with Hugging Face if available
-                    if os.environ.get("HUGGINGFACE_API_KEY"):
-                        try:
-                            from services.open_source_ai import analyze_with_prompt
-                            margin_insight = analyze_with_prompt(content, margin_prompt)
-                            if "<p>Error calling AI service" in margin_insight or "402 Client Error" in margin_insight:
-                                # Hugging Face failed, fall back to OpenAI if available
-                                raise Exception("Hugging Face API failed, falling back to OpenAI")
-                        except Exception as e:
-                            logger.warning(f"Hugging Face API error: {str(e)}, falling back to OpenAI")
-                            # Fall back to OpenAI
-                            if os.environ.get("OPENAI_API_KEY"):
-                                from services.ai_service import get_openai_client
-                                client = get_openai_client()
-                                response = client.chat.completions.create(
-                                    model="gpt-4o",
-                                    messages=[
-                                        {"role": "system", "content": "You are a value investor evaluating the margin of safety for a potential investment."},
-                                        {"role": "user", "content": margin_prompt}
-                                    ],
-                                    temperature=0.3
-                                )
-                                margin_insight = response.choices[0].message.content
-                            else:
-                                margin_insight = "<p>Unable to generate analysis. Both Hugging Face and OpenAI services are unavailable.</p>"
-                    else:
-                        # Use OpenAI directly if no Hugging Face API key
-                        from services.ai_service import get_openai_client
-                        client = get_openai_client()
-                        if client:
-                            response = client.chat.completions.create(
-                                model="gpt-4o",
-                                messages=[
-                                    {"role": "system", "content": "You are a value investor evaluating the margin of safety for a potential investment."},
-                                    {"role": "user", "content": margin_prompt}
-                                ],
-                                temperature=0.3
-                            )
-                            margin_insight = response.choices[0].message.content
-                        else:
-                            margin_insight = "<p>Unable to generate analysis. No AI service is available.</p>"
-                    
-                    insights['margin_of_safety'] = margin_insight
-                
-                # Check if biotech analysis is missing but requested
-                if document.use_biotech_mode and 'biotech_analysis' not in insights:
-                    logger.info(f"Adding missing biotech-specific analysis for document {document_id}")
-                    from services.new_prompt_templates import NEW_PROMPT_TEMPLATES
-                    biotech_prompt = NEW_PROMPT_TEMPLATES['biotech_analysis'].format(content=content)
-                    
-                    if os.environ.get("HUGGINGFACE_API_KEY"):
-                        from services.open_source_ai import analyze_with_prompt
-                        biotech_insight = analyze_with_prompt(content, biotech_prompt)
-                    else:
-                        from services.ai_service import get_openai_client
-                        client = get_openai_client()
-                        response = client.chat.completions.create(
-                            model="gpt-4o",
-                            messages=[
-                                {"role": "system", "content": "You are a specialized analyst evaluating a biotech/pharmaceutical company."},
-                                {"role": "user", "content": biotech_prompt}
-                            ],
-                            temperature=0.3
-                        )
-                        biotech_insight = response.choices[0].message.content
-                    
-                    insights['biotech_analysis'] = biotech_insight
+                # Store the categories generated from a cache hit (no on_insight call) and the ones that failed
+                record_insights(document.id, insights)
                 
                 # Monitor token usage - this would normally be provided by the API response
-                # Since we don't have direct access to token counts, we'll estimate based on content length
-                try:
-                    # Determine which API was used based on environment variables
-                    api_name = "huggingface" if os.environ.get("HUGGINGFACE_API_KEY") else "openai"
-                    
-                    # Rough estimate: 1 token ≈ 4 characters
-                    estimated_prompt_tokens = len(content) // 4
-                    estimated_completion_tokens = sum(len(insight) for insight in insights.values()) // 4
-                    
-                    # Calculate estimated cost based on API used
-                    if api_name == "openai":
-                        estimated_cost = ApiUsage.calculate_openai_cost(
-                            estimated_prompt_tokens, 
-                            estimated_completion_tokens
-                        )
-                    else:
-                        # Hugging Face pricing is variable, use a conservative estimate
-                        estimated_cost = (estimated_prompt_tokens * 0.00001) + (estimated_completion_tokens * 0.00002)
-                    
-                    # Record API usage
-                    api_usage = ApiUsage(
-                        api_name=api_name,
-                        document_id=document.id,
-                        prompt_tokens=estimated_prompt_tokens,
-                        completion_tokens=estimated_completion_tokens,
-                        estimated_cost_usd=estimated_cost
-                    )
-                    db.session.add(api_usage)
-                    logger.info(f"Recorded API usage: {estimated_prompt_tokens} prompt tokens, {estimated_completion_tokens} completion tokens, ${estimated_cost:.4f} est. cost")
-                except Exception as usage_error:
-                    logger.error(f"Error recording API usage: {str(usage_error)}")
+                if generated:
+                    record_api_usage(document, content, generated)
             
             # Clean up cache if available
             if CACHE_SERVICE_AVAILABLE:
@@ -441,6 +253,7 @@ def process_document(document_id):
                     logger.warning(f"Error managing cache: {str(cache_error)}")
         
         # Save insights to database
+        cancel_token.raise_if_cancelled('saving insights')
         for category, insight_content in insights.items():
             # Check if insight for this category already exists
             existing_insight = Insight.query.filter_by(
@@ -458,17 +271,27 @@ def process_document(document_id):
                 )
                 db.session.add(new_insight)
         
-        # Update document and processing status
+        # Update document and processing status, unless processing was cancelled meanwhile
+        completed = (Processing.query
+                     .filter(Processing.id == processing.id, Processing.status != 'cancelled')
+                     .update({'status': 'completed', 'completed_at': datetime.utcnow()}, synchronize_session=False))
+        if not completed:
+            raise ProcessingCancelled(f"Processing of document {document_id} was cancelled before saving insights")
         document.processed = True
-        processing.status = 'completed'
-        processing.completed_at = datetime.utcnow()
         db.session.commit()
+        record_stage(document.id, STAGE_PERSIST, 'completed')
         
         # Calculate and log total processing time
         total_time = time.time() - start_time
         logger.info(f"Successfully processed document {document_id} in {total_time:.2f} seconds")
         return True
     
+    except ProcessingCancelled as e:
+        # The cancel request already set the status; drop whatever this run produced
+        logger.info(str(e))
+        db.session.rollback()
+        return False
+    
     except Exception as e:
         # Handle any errors during processing
         logger.exception(f"Error processing document {document_id}: {str(e)}")
@@ -477,6 +300,241 @@ def process_document(document_id):
         processing.completed_at = datetime.utcnow()
         db.session.commit()
         return False
+    
+    finally:
+        cancel_token.stop()
+
+def fetch_document_source(document):
+    """
+    Pipeline fetch stage: locate the source of a document
+    
+    For an EDGAR document without a filing URL the latest 10-K is resolved once and
+    stored on the document, so later retries and regenerations read the same filing.
+    
+    Returns:
+        str: Path of the uploaded PDF, or the filing URL
+    """
+    if document.content_type == 'pdf':
+        file_path = os.path.join(current_app.config['UPLOAD_FOLDER'], document.filename)
+        if not os.path.exists(file_path):
+            raise FileNotFoundError(f"PDF file not found: {file_path}")
+        return file_path
+    
+    if document.content_type == 'edgar' and EDGAR_SERVICE_AVAILABLE:
+        if not document.url:
+            from services.edgar_service import get_latest_10k
+            filing_url = get_latest_10k(document.cik)
+            if not filing_url:
+                raise ValueError(f"Could not find 10-K filing for CIK: {document.cik}")
+            document.url = filing_url
+            db.session.commit()
+        return document.url
+    
+    raise ValueError(f"Unsupported content type: {document.content_type}")
+
+
+def extract_document_text(document, source, processing, cancel_token=None):
+    """
+    Pipeline extract stage: extract the text of a document
+    
+    Args:
+        document (Document): Document being processed
+        source (str): Output of the fetch stage
+        processing (Processing): Record for extraction progress and metrics
+        cancel_token (CancellationToken, optional): Stops PDF extraction between windows of pages
+        
+    Returns:
+        str: Extracted text
+    """
+    if document.content_type == 'pdf':
+        extraction_metrics = ExtractionMetrics(document_id=document.id, source=document.filename)
+        try:
+            content = extract_pdf_content(
+                source,
+                metrics=extraction_metrics,
+                progress_callback=make_progress_callback(processing, cancel_token=cancel_token)
+            )
+        finally:
+            processing.extraction_metrics = json.dumps(extraction_metrics.summary())
+            db.session.commit()
+    else:
+        content = get_filing_text(source)
+    
+    if not content:
+        raise ValueError("Could not extract any content from the document. The document may be empty or in an unsupported format.")
+        
+    if len(content.strip()) < 500:
+        logger.warning(f"Document {document.id} has very little content: {len(content.strip())} characters")
+        
+        # For 10-K filings, provide a more specific error message
+        if document.content_type == 'edgar':
+            raise ValueError("Could not extract sufficient content from the SEC filing. This could be due to the filing using a newer format that our system cannot process. Please try a different company or upload a PDF version of the 10-K if available.")
+    
+    return content
+
+
+def run_extract_stage(document, source, processing, cancel_token=None):
+    """
+    Run the extract stage and read its text from the text store
+    
+    The stage stores the text with save_document_text and records its content hash.
+    If the stored text has gone missing, the stage is reset and the text extracted again.
+    
+    Returns:
+        str: Extracted text
+    """
+    def extract():
+        return save_document_text(document.id, extract_document_text(document, source, processing, cancel_token))
+    
+    content = load_document_text(document.id, run_stage(document.id, STAGE_EXTRACT, extract))
+    if content is None:
+        logger.warning(f"Stored text of document {document.id} is missing, extracting it again")
+        reset_stage(document.id, STAGE_EXTRACT)
+        content = load_document_text(document.id, run_stage(document.id, STAGE_EXTRACT, extract))
+    return content
+
+
+def index_document(document, source, content):
+    """
+    Pipeline index stage: build the financial context for the financial prompts
+    
+    Returns:
+        str: Compact financial tables, or None if there are none
+    """
+    if document.content_type == 'pdf':
+        return store_financial_statements(document, source, content)
+    return get_financial_context(document)
+
+
+def record_api_usage(document, content, insights):
+    """
+    Record the estimated API usage and cost of generating insights for a document
+    
+    Token counts are not available from every provider, so they are estimated from
+    the prompt and response lengths (about 4 characters per token).
+    
+    Args:
+        document (Document): The analyzed document
+        content (str): Document content sent to the model
+        insights (dict): Generated insights by category
+    """
+    try:
+        # Determine which API was used based on environment variables
+        api_name = "huggingface" if os.environ.get("HUGGINGFACE_API_KEY") else "openai"
+        
+        # Rough estimate: 1 token ≈ 4 characters
+        estimated_prompt_tokens = len(content) // 4
+        estimated_completion_tokens = sum(len(insight) for insight in insights.values()) // 4
+        
+        # Calculate estimated cost based on API used
+        if api_name == "openai":
+            estimated_cost = ApiUsage.calculate_openai_cost(
+                estimated_prompt_tokens, 
+                estimated_completion_tokens
+            )
+        else:
+            # Hugging Face pricing is variable, use a conservative estimate
+            estimated_cost = (estimated_prompt_tokens * 0.00001) + (estimated_completion_tokens * 0.00002)
+        
+        # Record API usage
+        api_usage = ApiUsage(
+            api_name=api_name,
+            document_id=document.id,
+            prompt_tokens=estimated_prompt_tokens,
+            completion_tokens=estimated_completion_tokens,
+            estimated_cost_usd=estimated_cost
+        )
+        db.session.add(api_usage)
+        logger.info(f"Recorded API usage: {estimated_prompt_tokens} prompt tokens, {estimated_completion_tokens} completion tokens, ${estimated_cost:.4f} est. cost")
+    except Exception as usage_error:
+        logger.error(f"Error recording API usage: {str(usage_error)}")
+
+def make_progress_callback(processing, min_interval=1.0, cancel_token=None):
+    """
+    Build a progress callback that records pages done out of pages total on the processing record
+    
+    Commits are throttled to one per min_interval seconds, except for the first and last update.
+    
+    Args:
+        processing (Processing): The processing record to update
+        min_interval (float): Minimum seconds between commits
+        cancel_token (CancellationToken, optional): Stops extraction with ProcessingCancelled
+            at the next window of pages once cancelled
+        
+    Returns:
+        callable: Callback taking (pages_done, pages_total)
+    """
+    last_commit = [0.0]
+    
+    def update_progress(pages_done, pages_total):
+        if cancel_token:
+            cancel_token.raise_if_cancelled('the next pages')
+        processing.pages_done = pages_done
+        processing.pages_total = pages_total
+        now = time.time()
+        if pages_done in (0, pages_total) or now - last_commit[0] >= min_interval:
+            try:
+                db.session.commit()
+                last_commit[0] = now
+            except Exception as e:
+                logger.warning(f"Could not record extraction progress: {str(e)}")
+                db.session.rollback()
+    
+    return update_progress
+
+
+def store_financial_statements(document, file_path, content):
+    """
+    Extract financial statement tables from a PDF and store them on the document
+    
+    Args:
+        document (Document): Document being processed
+        file_path (str): Path to the PDF file
+        content (str): Text already extracted from the PDF
+        
+    Returns:
+        str: Compact tables for the financial prompts, or None if none were found
+    """
+    try:
+        tables_start_time = time.time()
+        tables = extract_financial_statements(file_path, content)
+        
+        FinancialStatement.query.filter_by(document_id=document.id).delete()
+        for table in tables:
+            db.session.add(FinancialStatement.from_table(document.id, table))
+        db.session.commit()
+        
+        logger.info(f"Stored {len(tables)} financial statement tables in {time.time() - tables_start_time:.2f} seconds")
+        return format_statements_for_prompt(tables) or None
+    except Exception as e:
+        # Structured tables are an enhancement, never fail processing because of them
+        logger.warning(f"Financial statement extraction failed for document {document.id}: {str(e)}")
+        db.session.rollback()
+        return None
+
+def get_financial_context(document):
+    """
+    Build the compact financial data block for a document
+    
+    Uses the statement tables extracted from the document, or for EDGAR filings the
+    XBRL fact sheet of the company.
+    
+    Args:
+        document (Document): Document object from the database
+        
+    Returns:
+        str: Compact tables for the financial prompts, or None if none are available
+    """
+    statements = FinancialStatement.query.filter_by(document_id=document.id).order_by(FinancialStatement.page_number).all()
+    if statements:
+        return format_statements_for_prompt([statement.to_table() for statement in statements]) or None
+    
+    if document.content_type == 'edgar' and document.cik:
+        try:
+            return get_fact_sheet(document.cik)
+        except Exception as e:
+            logger.warning(f"Could not build XBRL fact sheet for CIK {document.cik}: {str(e)}")
+    return None
 
 def save_uploaded_file(file):
     """Save an uploaded file to the uploads directory"""
@@ -496,6 +554,11 @@ def get_document_content(document):
     """
     Retrieve document content based on its type
     
+    Uses the text stored when the document was processed, so a regenerated insight
+    reads the same text as the original analysis. Documents processed before the text
+    store existed are extracted again once, from their original file or filing, and
+    the text is stored for the next regeneration.
+    
     Args:
         document (Document): Document object from the database
         
@@ -503,6 +566,10 @@ def get_document_content(document):
         str: Document content, or None if content could not be retrieved
     """
     try:
+        stored = load_document_text(document.id)
+        if stored is not None:
+            return stored
+        
         if document.content_type == 'pdf':
             upload_folder = current_app.config['UPLOAD_FOLDER']
             file_path = os.path.join(upload_folder, document.filename)
@@ -510,24 +577,24 @@ def get_document_content(document):
                 logger.error(f"PDF file not found: {file_path}")
                 return None
             
-            return extract_pdf_content(file_path)
+            content = extract_pdf_content(file_path)
             
         elif document.content_type == 'edgar' and EDGAR_SERVICE_AVAILABLE:
-            # If we have a CIK, use that to get the 10-K directly
-            if document.cik:
-                from services.edgar_service import get_latest_10k
-                filing_url = get_latest_10k(document.cik)
-                if not filing_url:
-                    logger.error(f"Could not find 10-K filing for CIK: {document.cik}")
-                    return None
-                return extract_10k_content(filing_url)
-            else:
-                # Otherwise use the URL we were given
-                return extract_10k_content(document.url)
+            # The filing that was analyzed; never look up the latest 10-K here, which
+            # could be a newer filing than the insights were generated from
+            filing_url = document.url or completed_output(document.id, STAGE_FETCH)
+            if not filing_url:
+                logger.error(f"No filing recorded for document {document.id} (CIK: {document.cik})")
+                return None
+            content = get_filing_text(filing_url)
                 
         else:
             logger.error(f"Unsupported content type: {document.content_type}")
             return None
+        
+        if content:
+            save_document_text(document.id, content)
+        return content
             
     except Exception as e:
         logger.error(f"Error retrieving document content: {str(e)}")
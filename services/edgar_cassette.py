@@ -0,0 +1,147 @@
+"""
+Record/replay store for SEC EDGAR responses
+
+A cassette directory holds one recorded response per request: a JSON file with the
+URL, status and headers, and a body file with the raw bytes. With
+EDGAR_CASSETTE_MODE=record every EDGAR response is saved as it is fetched; with
+EDGAR_CASSETTE_MODE=replay responses are served from the cassette and nothing goes
+to sec.gov, so the EDGAR paths can be tested and benchmarked without network access.
+The same directory is served over HTTP by the stand-in server in
+services.edgar_standin.
+"""
+
+import os
+import json
+import hashlib
+import logging
+import tempfile
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+# 'off' (default), 'record' or 'replay'
+EDGAR_CASSETTE_MODE = os.environ.get('EDGAR_CASSETTE_MODE', 'off').lower()
+
+EDGAR_CASSETTE_DIR = os.environ.get(
+    'EDGAR_CASSETTE_DIR',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'edgar_cassette')
+)
+
+# Response headers worth keeping; transfer encodings are undone by requests before recording
+RECORDED_HEADERS = ('Content-Type', 'ETag', 'Last-Modified', 'Cache-Control', 'Expires')
+
+
+class CassetteMiss(requests.ConnectionError):
+    """No recorded response for a request in replay mode (handled like a network failure)"""
+
+
+def normalize_url(url):
+    """Lowercase the host, drop the fragment and sort the query, so equivalent URLs share a recording"""
+    parts = urlsplit(url)
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path or '/', query, ''))
+
+
+class CassetteStore:
+    """
+    Directory of recorded responses
+
+    Args:
+        directory (str): Cassette directory, created on first recording
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def _paths(self, method, url):
+        key = hashlib.sha1(f"{method.upper()} {normalize_url(url)}".encode('utf-8')).hexdigest()
+        base = os.path.join(self.directory, key)
+        return base + '.json', base + '.body'
+
+    def has(self, method, url):
+        """Return True if a response is recorded for the request"""
+        return os.path.exists(self._paths(method, url)[0])
+
+    def save(self, method, url, status_code, body, headers=None):
+        """
+        Record a response
+
+        Args:
+            method (str): HTTP method
+            url (str): Requested URL
+            status_code (int): Response status
+            body (bytes): Decoded response body
+            headers (dict, optional): Response headers; only RECORDED_HEADERS are kept
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        meta_path, body_path = self._paths(method, url)
+        headers = headers or {}
+        meta = {
+            'method': method.upper(),
+            'url': normalize_url(url),
+            'status': status_code,
+            'headers': {name: headers[name] for name in RECORDED_HEADERS if headers.get(name)},
+        }
+
+        # Body first, so a reader never sees metadata without its body
+        for path, data in ((body_path, body or b''), (meta_path, json.dumps(meta, indent=2).encode('utf-8'))):
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+
+    def record(self, method, url, response):
+        """Record a requests.Response"""
+        self.save(method, url, response.status_code, response.content, response.headers)
+
+    def load(self, method, url):
+        """
+        Load a recorded response
+
+        Returns:
+            tuple: (meta dict, body bytes), or None if nothing is recorded
+        """
+        meta_path, body_path = self._paths(method, url)
+        try:
+            with open(meta_path, 'r') as f:
+                meta = json.load(f)
+            with open(body_path, 'rb') as f:
+                body = f.read()
+        except FileNotFoundError:
+            return None
+        return meta, body
+
+    def replay(self, method, url):
+        """
+        Build a requests.Response from a recording
+
+        Raises:
+            CassetteMiss: If nothing is recorded for the request
+        """
+        recorded = self.load(method, url)
+        if recorded is None:
+            raise CassetteMiss(f"No recorded response for {method.upper()} {url} in {self.directory}")
+        meta, body = recorded
+
+        response = requests.Response()
+        response.status_code = meta['status']
+        response.headers.update(meta.get('headers', {}))
+        response._content = b'' if method.upper() == 'HEAD' else body
+        # The body is already read, so iter_content() and close() work as for a streamed response
+        response._content_consumed = True
+        response.url = url
+        response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+        return response
+
+
+_store = None
+
+
+def get_cassette_store():
+    """Return the store for EDGAR_CASSETTE_DIR"""
+    global _store
+    if _store is None or _store.directory != EDGAR_CASSETTE_DIR:
+        _store = CassetteStore(EDGAR_CASSETTE_DIR)
+    return _store
@@ -0,0 +1,218 @@
+"""
+Shared HTTP client for SEC EDGAR
+
+All requests to sec.gov and data.sec.gov go through a single pooled requests.Session,
+so connections are kept alive between the several calls a 10-K lookup makes, responses
+are gzip/deflate compressed, and every request carries the User-Agent the SEC requires.
+
+Requests also pass through a token-bucket limiter shared by all workers on the host,
+so bursts from parallel uploads and fallback lookups stay within the SEC fair-access
+limit of 10 requests per second.
+
+For offline tests and benchmarks, responses can be recorded to and replayed from a
+cassette directory (EDGAR_CASSETTE_MODE, see services.edgar_cassette), or requests can
+be sent to a local stand-in server instead of sec.gov (EDGAR_STANDIN_URL, see
+services.edgar_standin).
+"""
+
+import os
+import time
+import logging
+import threading
+from urllib.parse import urlparse, urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from services import edgar_cassette
+from services.rate_limiter import TokenBucket, default_state_path
+
+logger = logging.getLogger(__name__)
+
+# The SEC requires automated tools to identify themselves with a name and contact address
+SEC_USER_AGENT = os.environ.get('SEC_USER_AGENT', 'InsightLens Research Tool (contactus@example.com)')
+
+# Default (connect, read) timeouts in seconds for EDGAR requests
+EDGAR_CONNECT_TIMEOUT = float(os.environ.get('EDGAR_CONNECT_TIMEOUT', 5))
+EDGAR_READ_TIMEOUT = float(os.environ.get('EDGAR_READ_TIMEOUT', 30))
+
+# Maximum number of keep-alive connections kept per host
+EDGAR_POOL_SIZE = int(os.environ.get('EDGAR_POOL_SIZE', 10))
+
+# SEC fair-access limit is 10 requests per second; the bucket allows at most
+# rate + burst requests in any one second window
+EDGAR_RATE_LIMIT = float(os.environ.get('EDGAR_RATE_LIMIT', 8))
+EDGAR_RATE_BURST = float(os.environ.get('EDGAR_RATE_BURST', 2))
+EDGAR_RATE_STATE_FILE = os.environ.get('EDGAR_RATE_STATE_FILE', default_state_path('edgar'))
+
+# Retries of a GET or HEAD after a connection error or 5xx response; each retry takes a
+# rate limiter token, with a backoff of EDGAR_RETRY_BACKOFF seconds doubled per attempt
+EDGAR_RETRIES = int(os.environ.get('EDGAR_RETRIES', 2))
+EDGAR_RETRY_BACKOFF = float(os.environ.get('EDGAR_RETRY_BACKOFF', 0.5))
+
+RETRY_STATUSES = (500, 502, 503, 504)
+RETRY_METHODS = ('GET', 'HEAD')
+
+EDGAR_HOSTS = ('sec.gov', 'www.sec.gov', 'data.sec.gov', 'efts.sec.gov')
+
+# Base URL of a local EDGAR stand-in server; when set, EDGAR requests go there instead of sec.gov
+EDGAR_STANDIN_URL = os.environ.get('EDGAR_STANDIN_URL', '')
+
+_session = None
+_session_lock = threading.Lock()
+
+rate_limiter = TokenBucket('edgar', EDGAR_RATE_LIMIT, EDGAR_RATE_BURST, state_path=EDGAR_RATE_STATE_FILE)
+
+
+def is_edgar_url(url):
+    """Return True if the URL points at an SEC EDGAR host"""
+    host = (urlparse(url).hostname or '').lower()
+    return host in EDGAR_HOSTS or host.endswith('.sec.gov')
+
+
+def standin_url(url, base_url=None):
+    """
+    Map an EDGAR URL onto the stand-in server
+
+    The original host becomes the first path segment, so
+    https://data.sec.gov/submissions/CIK1.json is requested as
+    {base_url}/data.sec.gov/submissions/CIK1.json.
+    """
+    parts = urlsplit(url)
+    mapped = f"{(base_url or EDGAR_STANDIN_URL).rstrip('/')}/{parts.netloc}{parts.path}"
+    return f"{mapped}?{parts.query}" if parts.query else mapped
+
+
+def get_session():
+    """
+    Return the shared EDGAR session, creating it on first use
+
+    Returns:
+        requests.Session: Session with a pooled adapter and the SEC User-Agent and
+            compression headers set (retries are made by edgar_request)
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = _build_session()
+    return _session
+
+
+def _build_session():
+    """Build a requests.Session configured for EDGAR"""
+    session = requests.Session()
+    session.headers.update({
+        'User-Agent': SEC_USER_AGENT,
+        'Accept-Encoding': 'gzip, deflate',
+    })
+
+    # No adapter retries: they would bypass the rate limiter (see edgar_request)
+    adapter = HTTPAdapter(pool_connections=len(EDGAR_HOSTS), pool_maxsize=EDGAR_POOL_SIZE, max_retries=0)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def edgar_request(method, url, timeout=None, **kwargs):
+    """
+    Send a request to SEC EDGAR through the shared session
+
+    Waits for a token from the shared rate limiter first, so callers queue
+    instead of exceeding the SEC request rate. GET and HEAD requests are retried up
+    to EDGAR_RETRIES times after a connection error or 5xx response, taking a token
+    for every attempt. In cassette replay mode the recorded response is returned
+    without any network request.
+
+    Args:
+        method (str): HTTP method
+        url (str): EDGAR URL
+        timeout (float or tuple, optional): Overrides the default (connect, read) timeouts
+        **kwargs: Passed through to requests (params, headers, stream, ...)
+
+    Returns:
+        requests.Response: The response (status is not checked)
+    """
+    mode = edgar_cassette.EDGAR_CASSETTE_MODE
+    if mode == 'replay':
+        return edgar_cassette.get_cassette_store().replay(method, url)
+
+    if timeout is None:
+        timeout = (EDGAR_CONNECT_TIMEOUT, EDGAR_READ_TIMEOUT)
+    target = standin_url(url) if EDGAR_STANDIN_URL else url
+    retries = EDGAR_RETRIES if method.upper() in RETRY_METHODS else 0
+    for attempt in range(retries + 1):
+        rate_limiter.acquire()
+        try:
+            response = get_session().request(method, target, timeout=timeout, **kwargs)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            if attempt == retries:
+                raise
+            logger.warning(f"EDGAR request for {url} failed ({str(e)}), retrying")
+            time.sleep(_retry_delay(attempt))
+            continue
+        if response.status_code not in RETRY_STATUSES or attempt == retries:
+            break
+        logger.warning(f"EDGAR returned {response.status_code} for {url}, retrying")
+        delay = _retry_delay(attempt, response.headers.get('Retry-After'))
+        response.close()
+        time.sleep(delay)
+
+    # 304s have no body worth replaying
+    if mode == 'record' and response.status_code != 304:
+        if kwargs.get('stream'):
+            _record_when_read(method, url, response)
+        else:
+            _record(method, url, response.status_code, response.content, response.headers)
+    return response
+
+
+def _record(method, url, status_code, body, headers):
+    try:
+        edgar_cassette.get_cassette_store().save(method, url, status_code, body, headers)
+    except Exception as e:
+        logger.warning(f"Could not record EDGAR response for {url}: {str(e)}")
+
+
+def _record_when_read(method, url, response):
+    """
+    Record a streamed response once the caller has read its whole body
+
+    The body is collected as iter_content (which response.content also uses) yields
+    it. A body the caller stops reading early, e.g. a download over its size limit,
+    is not recorded.
+    """
+    iter_content = response.iter_content
+
+    def recording_iter_content(chunk_size=1, decode_unicode=False):
+        chunks = []
+        for chunk in iter_content(chunk_size=chunk_size, decode_unicode=decode_unicode):
+            chunks.append(chunk)
+            yield chunk
+        if not decode_unicode:
+            _record(method, url, response.status_code, b''.join(chunks), response.headers)
+
+    response.iter_content = recording_iter_content
+
+
+def _retry_delay(attempt, retry_after=None):
+    """Seconds to wait before retrying, honoring a Retry-After in seconds (at most 30)"""
+    delay = EDGAR_RETRY_BACKOFF * (2 ** attempt)
+    if retry_after and retry_after.isdigit():
+        delay = max(delay, min(int(retry_after), 30))
+    return delay
+
+
+def edgar_get(url, **kwargs):
+    """GET an EDGAR URL through the shared session"""
+    return edgar_request('GET', url, **kwargs)
+
+
+def edgar_head(url, **kwargs):
+    """HEAD an EDGAR URL through the shared session"""
+    return edgar_request('HEAD', url, **kwargs)
+
+
+def get_rate_limit_stats():
+    """Return wait-time statistics of the EDGAR rate limiter for this worker"""
+    return rate_limiter.stats()
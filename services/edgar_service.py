@@ -1,15 +1,35 @@
-import requests
 import logging
 import re
+import threading
 from bs4 import BeautifulSoup
+from services.edgar_client import edgar_get
+from services.html_text import html_to_text
+from services.filing_sections import build_section_index
+from services.full_submission import submission_to_text
+from services.cache_service import disk_cache
+from services.company_index import search_company_index
+from services.http_cache import cached_get_json
+from cachetools import LRUCache
 
 logger = logging.getLogger(__name__)
 
+# Resolved document URLs by accession number; filings never change once accepted
+_document_urls = LRUCache(maxsize=1024)
+_document_url_lock = threading.Lock()
+
 def search_company(company_name):
     """
     Search for a company in the SEC EDGAR database
     Returns a list of companies matching the search term
+    
+    The local company index is searched first; the EDGAR company browse page is
+    only scraped if the index is unavailable or has no match.
     """
+    indexed_companies = search_company_index(company_name)
+    if indexed_companies:
+        logger.info(f"Found {len(indexed_companies)} companies for '{company_name}' in the local index")
+        return indexed_companies
+    
     base_url = "https://www.sec.gov/cgi-bin/browse-edgar"
     
     params = {
@@ -20,15 +40,11 @@ def search_company(company_name):
         'count': '20'  # Request more results to increase chances of finding matches
     }
     
-    headers = {
-        'User-Agent': 'InsightLens Research Tool (contactus@example.com)'
-    }
-    
     try:
         logger.info(f"Searching SEC EDGAR for company: {company_name}")
         logger.info(f"Request URL: {base_url} with params: {params}")
         
-        response = requests.get(base_url, params=params, headers=headers)
+        response = edgar_get(base_url, params=params)
         
         # Log the response status
         logger.info(f"SEC EDGAR search response status: {response.status_code}")
@@ -180,55 +196,49 @@ def search_company(company_name):
         return []
 
 
+def get_submissions(cik):
+    """
+    Get the submissions metadata (company details and recent filings) for a CIK
+    
+    Served through the HTTP cache and revalidated with data.sec.gov, so the JSON is
+    only downloaded and parsed again when it has changed. Treat the result as read-only.
+    """
+    # Format CIK with leading zeros
+    cik_padded = str(cik).zfill(10)
+    return cached_get_json(f"https://data.sec.gov/submissions/CIK{cik_padded}.json")
+
+
 def get_latest_10k(cik):
     """
     Get the latest 10-K filing for a company by CIK
     Returns the URL to the HTML version of the 10-K
     """
-    # Format CIK with leading zeros
-    cik_padded = cik.zfill(10)
-    
-    # First, get the list of all filings
-    base_url = f"https://data.sec.gov/submissions/CIK{cik_padded}.json"
-    
-    headers = {
-        'User-Agent': 'InsightLens Research Tool (contactus@example.com)'
-    }
+    filing = get_latest_10k_filing(cik)
+    return filing['url'] if filing else None
+
+
+def get_latest_10k_filing(cik):
+    """
+    Get the latest 10-K (or 10-K/A) filing for a company by CIK
     
+    Returns:
+        dict: The filing (see list_filings) with its document 'url', or None if none was found.
+            When only the browse-edgar fallback finds the filing, its form type,
+            accession number and dates are None.
+    """
     try:
+        # First, get the list of all filings
         logger.info(f"Fetching submission data for CIK: {cik}")
-        response = requests.get(base_url, headers=headers)
-        response.raise_for_status()
-        
-        data = response.json()
+        data = get_submissions(cik)
         recent_filings = data.get('filings', {}).get('recent', {})
         
         if not recent_filings:
             logger.warning(f"No recent filings found for CIK: {cik}")
             # Try alternative approach using the old search interface
-            return get_latest_10k_alternative(cik)
-        
-        # Find the most recent 10-K
-        form_types = recent_filings.get('form', [])
-        accession_numbers = recent_filings.get('accessionNumber', [])
-        filing_dates = recent_filings.get('filingDate', [])
-        
-        # Log what we found
-        logger.info(f"Found {len(form_types)} recent filings for CIK: {cik}")
-        
-        # Create a list of filings with their dates for better selection
-        filings = []
-        for i, form_type in enumerate(form_types):
-            if i < len(accession_numbers) and i < len(filing_dates):
-                if form_type in ['10-K', '10-K/A']:  # Include amended 10-Ks as well
-                    filings.append({
-                        'form_type': form_type,
-                        'accession_number': accession_numbers[i],
-                        'filing_date': filing_dates[i]
-                    })
-        
-        # Sort by filing date, most recent first
-        filings.sort(key=lambda x: x['filing_date'], reverse=True)
+            return _alternative_filing(cik)
+        
+        logger.info(f"Found {len(recent_filings.get('form', []))} recent filings for CIK: {cik}")
+        filings = list_10k_filings(recent_filings, include_amendments=True)
         
         # Log what 10-K filings we found
         logger.info(f"Found {len(filings)} 10-K/10-K/A filings for CIK: {cik}")
@@ -238,93 +248,233 @@ def get_latest_10k(cik):
         # Process each 10-K, starting with the most recent
         for filing in filings:
             try:
-                accession_number = filing['accession_number'].replace('-', '')
-                
-                # Build the URL to the HTML version of the 10-K
-                index_url = f"https://www.sec.gov/Archives/edgar/data/{cik}/{accession_number}/{filing['accession_number']}-index.htm"
-                logger.info(f"Checking index page: {index_url}")
-                
-                # Get the filing index page
-                response = requests.get(index_url, headers=headers)
-                response.raise_for_status()
-                
-                soup = BeautifulSoup(response.text, 'html.parser')
-                
-                # Try to find the document table that contains the actual filings
-                filing_tables = soup.find_all('table')
-                
-                document_found = False
-                for table in filing_tables:
-                    # Look for links in the table
-                    links = table.find_all('a')
-                    
-                    # First priority: Find the link with "10-K" or specific formats in the text
-                    for link in links:
-                        link_text = link.text.strip().upper()
-                        if (('10-K' in link_text and 'XBRL' not in link_text) or 
-                            (('10K' in link_text or '10-K' in link_text) and not any(x in link_text for x in ['XBRL', 'ZIP', 'GRAPHIC']))):
-                            document_url = link.get('href')
-                            if document_url:
-                                # Convert relative URL to absolute URL
-                                if document_url.startswith('/'):
-                                    document_url = f"https://www.sec.gov{document_url}"
-                                elif not document_url.startswith('http'):
-                                    document_url = f"https://www.sec.gov/Archives/edgar/data/{cik}/{accession_number}/{document_url}"
-                                
-                                logger.info(f"Found 10-K document link: {document_url}")
-                                return document_url
-                    
-                    # Second priority: Find any HTM file that might be the 10-K, excluding specific patterns
-                    if not document_found:
-                        for link in links:
-                            href = link.get('href', '')
-                            
-                            # Skip certain file types or patterns
-                            if (href and 
-                                href.lower().endswith('.htm') and 
-                                not any(x in href.lower() for x in ['index', 'xbrl', 'xml', 'def', 'lab', 'pre']) and
-                                not any(x in link.text.lower() for x in ['graphic', 'image', 'jpg', 'png'])):
-                                # Convert relative URL to absolute URL
-                                if href.startswith('/'):
-                                    document_url = f"https://www.sec.gov{href}"
-                                elif not href.startswith('http'):
-                                    document_url = f"https://www.sec.gov/Archives/edgar/data/{cik}/{accession_number}/{href}"
-                                else:
-                                    document_url = href
-                                
-                                logger.info(f"Found potential 10-K HTM document: {document_url}")
-                                document_found = True
-                                return document_url
-                
-                # If we get here and haven't found a direct document link, try modern SEC viewer format
-                viewer_url = f"https://www.sec.gov/ix?doc=/Archives/edgar/data/{cik}/{accession_number}/{filing['accession_number']}.htm"
-                logger.info(f"Trying modern SEC viewer format: {viewer_url}")
-                
-                try:
-                    # Check if the modern viewer URL works
-                    viewer_response = requests.get(viewer_url, headers=headers)
-                    if viewer_response.status_code == 200:
-                        logger.info(f"Modern SEC viewer format works: {viewer_url}")
-                        return viewer_url
-                except Exception as viewer_err:
-                    logger.warning(f"Failed to access modern SEC viewer: {str(viewer_err)}")
-                
-                # If no specific document found, use the index page as a last resort
-                logger.info(f"No specific document found, returning index page: {index_url}")
-                return index_url
-                
+                return dict(filing, url=resolve_filing_document(cik, filing))
             except Exception as filing_err:
                 logger.warning(f"Error processing filing {filing['accession_number']}: {str(filing_err)}")
                 continue
         
         # Try alternative approach if the modern API didn't work
         logger.warning("Modern API approach failed, trying alternative method")
-        return get_latest_10k_alternative(cik)
+        return _alternative_filing(cik)
         
     except Exception as e:
         logger.error(f"Error getting 10-K for CIK {cik}: {str(e)}")
         # Try alternative approach as a fallback
-        return get_latest_10k_alternative(cik)
+        return _alternative_filing(cik)
+
+
+def _alternative_filing(cik):
+    """Latest 10-K from get_latest_10k_alternative, which only yields its URL"""
+    url = get_latest_10k_alternative(cik)
+    if not url:
+        return None
+    return {'form_type': None, 'accession_number': None, 'filing_date': None, 'report_date': None,
+            'primary_document': None, 'url': url}
+
+
+def list_filings(recent_filings, forms):
+    """
+    List the filings of the given form types in the 'recent' block of a submissions document
+    
+    Args:
+        recent_filings (dict): Column arrays from submissions['filings']['recent']
+        forms (tuple): Form types to include, e.g. ('10-K', '10-K/A')
+        
+    Returns:
+        list: Filings as dicts with 'form_type', 'accession_number', 'filing_date',
+            'report_date' and 'primary_document', most recent first
+    """
+    form_types = recent_filings.get('form', [])
+    accession_numbers = recent_filings.get('accessionNumber', [])
+    filing_dates = recent_filings.get('filingDate', [])
+    report_dates = recent_filings.get('reportDate', [])
+    primary_documents = recent_filings.get('primaryDocument', [])
+    
+    filings = []
+    for i, form_type in enumerate(form_types):
+        if form_type in forms and i < len(accession_numbers) and i < len(filing_dates):
+            filings.append({
+                'form_type': form_type,
+                'accession_number': accession_numbers[i],
+                'filing_date': filing_dates[i],
+                'report_date': report_dates[i] if i < len(report_dates) else None,
+                'primary_document': primary_documents[i] if i < len(primary_documents) else None
+            })
+    
+    # Sort by filing date, most recent first
+    filings.sort(key=lambda x: x['filing_date'], reverse=True)
+    return filings
+
+
+def list_10k_filings(recent_filings, include_amendments=False):
+    """List the 10-K filings (and optionally 10-K/A amendments) of a submissions 'recent' block"""
+    return list_filings(recent_filings, ('10-K', '10-K/A') if include_amendments else ('10-K',))
+
+
+def get_10k_history(cik, years):
+    """
+    Get the 10-K filings of the last N fiscal years for a company
+    
+    Resolved from the submissions metadata only, so no filing index pages are read.
+    Amendments are left out, so each fiscal year is covered by its original annual report.
+    Older submission pages are only read when the recent block holds too few 10-Ks
+    (it covers the last 1,000 filings, which for active filers is a few years).
+    
+    Args:
+        cik (str): Company CIK
+        years (int): Number of fiscal years
+        
+    Returns:
+        list: Filings (see list_10k_filings) with their document 'url', most recent first
+    """
+    data = get_submissions(cik)
+    filings = list_10k_filings(data.get('filings', {}).get('recent', {}))
+    
+    for page in data.get('filings', {}).get('files', []):
+        if len(filings) >= years:
+            break
+        try:
+            older = cached_get_json(f"https://data.sec.gov/submissions/{page['name']}")
+            filings.extend(list_10k_filings(older))
+        except Exception as e:
+            logger.warning(f"Could not read submissions page {page.get('name')} for CIK {cik}: {str(e)}")
+            break
+    
+    history = []
+    seen_periods = set()
+    for filing in filings:
+        period = filing['report_date'] or filing['filing_date']
+        if period in seen_periods:
+            continue
+        seen_periods.add(period)
+        try:
+            history.append(dict(filing, url=resolve_filing_document(cik, filing)))
+        except Exception as e:
+            logger.warning(f"Could not resolve 10-K {filing['accession_number']} for CIK {cik}: {str(e)}")
+            continue
+        if len(history) == years:
+            break
+    
+    logger.info(f"Resolved {len(history)} of {years} requested 10-K filings for CIK {cik}")
+    return history
+
+
+def resolve_filing_document(cik, filing):
+    """
+    Resolve the URL of the main document of a 10-K filing
+    
+    The submissions metadata names the primary document, so its archive URL is built
+    directly. The filing index page is only read when that is missing. Resolved URLs
+    are memoized per accession number.
+    
+    Args:
+        cik (str): Company CIK
+        filing (dict): Filing with 'accession_number' and optionally 'primary_document'
+        
+    Returns:
+        str: URL of the filing document (or of its index page as a last resort)
+    """
+    accession = filing['accession_number']
+    with _document_url_lock:
+        document_url = _document_urls.get(accession)
+    if document_url:
+        return document_url
+    
+    if filing.get('primary_document'):
+        document_url = build_archive_url(cik, accession, filing['primary_document'])
+        logger.info(f"Resolved primary document from submissions metadata: {document_url}")
+    else:
+        document_url = find_document_in_filing_index(cik, filing)
+    
+    with _document_url_lock:
+        _document_urls[accession] = document_url
+    return document_url
+
+
+def build_archive_url(cik, accession_number, file_name):
+    """Build the EDGAR archive URL of a file in a filing"""
+    return f"https://www.sec.gov/Archives/edgar/data/{str(cik).lstrip('0')}/{accession_number.replace('-', '')}/{file_name}"
+
+
+def find_document_in_filing_index(cik, filing):
+    """
+    Find the 10-K document by reading the filing index page
+    Used when the submissions metadata has no primary document
+    """
+    accession_number = filing['accession_number'].replace('-', '')
+    
+    # Build the URL to the HTML version of the 10-K
+    index_url = f"https://www.sec.gov/Archives/edgar/data/{cik}/{accession_number}/{filing['accession_number']}-index.htm"
+    logger.info(f"Checking index page: {index_url}")
+    
+    # Get the filing index page
+    response = edgar_get(index_url)
+    response.raise_for_status()
+    
+    soup = BeautifulSoup(response.text, 'html.parser')
+    
+    # Try to find the document table that contains the actual filings
+    filing_tables = soup.find_all('table')
+    
+    document_found = False
+    for table in filing_tables:
+        # Look for links in the table
+        links = table.find_all('a')
+        
+        # First priority: Find the link with "10-K" or specific formats in the text
+        for link in links:
+            link_text = link.text.strip().upper()
+            if (('10-K' in link_text and 'XBRL' not in link_text) or 
+                (('10K' in link_text or '10-K' in link_text) and not any(x in link_text for x in ['XBRL', 'ZIP', 'GRAPHIC']))):
+                document_url = link.get('href')
+                if document_url:
+                    # Convert relative URL to absolute URL
+                    if document_url.startswith('/'):
+                        document_url = f"https://www.sec.gov{document_url}"
+                    elif not document_url.startswith('http'):
+                        document_url = f"https://www.sec.gov/Archives/edgar/data/{cik}/{accession_number}/{document_url}"
+                    
+                    logger.info(f"Found 10-K document link: {document_url}")
+                    return document_url
+        
+        # Second priority: Find any HTM file that might be the 10-K, excluding specific patterns
+        if not document_found:
+            for link in links:
+                href = link.get('href', '')
+                
+                # Skip certain file types or patterns
+                if (href and 
+                    href.lower().endswith('.htm') and 
+                    not any(x in href.lower() for x in ['index', 'xbrl', 'xml', 'def', 'lab', 'pre']) and
+                    not any(x in link.text.lower() for x in ['graphic', 'image', 'jpg', 'png'])):
+                    # Convert relative URL to absolute URL
+                    if href.startswith('/'):
+                        document_url = f"https://www.sec.gov{href}"
+                    elif not href.startswith('http'):
+                        document_url = f"https://www.sec.gov/Archives/edgar/data/{cik}/{accession_number}/{href}"
+                    else:
+                        document_url = href
+                    
+                    logger.info(f"Found potential 10-K HTM document: {document_url}")
+                    document_found = True
+                    return document_url
+    
+    # If we get here and haven't found a direct document link, try modern SEC viewer format
+    viewer_url = f"https://www.sec.gov/ix?doc=/Archives/edgar/data/{cik}/{accession_number}/{filing['accession_number']}.htm"
+    logger.info(f"Trying modern SEC viewer format: {viewer_url}")
+    
+    try:
+        # Check if the modern viewer URL works
+        viewer_response = edgar_get(viewer_url)
+        if viewer_response.status_code == 200:
+            logger.info(f"Modern SEC viewer format works: {viewer_url}")
+            return viewer_url
+    except Exception as viewer_err:
+        logger.warning(f"Failed to access modern SEC viewer: {str(viewer_err)}")
+    
+    # If no specific document found, use the index page as a last resort
+    logger.info(f"No specific document found, returning index page: {index_url}")
+    return index_url
 
 
 def get_latest_10k_alternative(cik):
@@ -342,13 +492,9 @@ def get_latest_10k_alternative(cik):
         'count': '5'  # Get the 5 most recent 10-Ks
     }
     
-    headers = {
-        'User-Agent': 'InsightLens Research Tool (contactus@example.com)'
-    }
-    
     try:
         logger.info(f"Using alternative method to fetch 10-K for CIK: {cik}")
-        response = requests.get(base_url, params=params, headers=headers)
+        response = edgar_get(base_url, params=params)
         response.raise_for_status()
         
         soup = BeautifulSoup(response.text, 'html.parser')
@@ -368,7 +514,7 @@ def get_latest_10k_alternative(cik):
             logger.info(f"Processing index page: {index_url}")
             
             # Get the document index page
-            response = requests.get(index_url, headers=headers)
+            response = edgar_get(index_url)
             response.raise_for_status()
             
             soup = BeautifulSoup(response.text, 'html.parser')
@@ -411,41 +557,64 @@ def get_latest_10k_alternative(cik):
         return None
 
 
+def get_filing_text(url):
+    """
+    Get the extracted text of a filing document, extracting it on first use
+    
+    Accepted filings never change, so the text is kept in the disk cache by URL and
+    later analyses of the same filing (including ones prefetched in the background)
+    skip the download and extraction.
+    
+    Args:
+        url (str): Filing document URL
+        
+    Returns:
+        str: The filing text
+    """
+    key = f"filing_text:{url}"
+    text = disk_cache.get(key)
+    if text is not None:
+        logger.info(f"Using cached text of filing {url}")
+        return text
+    
+    text = extract_10k_content(url)
+    disk_cache.set(key, text)
+    return text
+
+
+def get_filing_sections(url, form='10-K'):
+    """
+    Get the section index of a filing document (see services.filing_sections)
+    
+    Returns:
+        list: Sections with 'item', 'title', 'start' and 'end' offsets into get_filing_text(url)
+    """
+    key = f"filing_sections:{url}"
+    sections = disk_cache.get(key)
+    if sections is None:
+        sections = build_section_index(get_filing_text(url), form)
+        disk_cache.set(key, sections)
+    return sections
+
+
 def extract_10k_content(url):
     """
     Extract content from a 10-K filing
     Returns the text content of the 10-K
     """
-    headers = {
-        'User-Agent': 'InsightLens Research Tool (contactus@example.com)'
-    }
-    
     try:
         # First approach: Try direct extraction
-        response = requests.get(url, headers=headers)
+        response = edgar_get(url)
         response.raise_for_status()
-        
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        # Check if we have an iXBRL document
+
+        text = html_to_text(response.content)
+        if text and len(text) > 500:
+            return text
+
+        # The iXBRL viewer page carries little text of its own; fetch the filing itself
         if 'ix?doc=' in url:
-            logger.info(f"Detected iXBRL document, using specialized extraction for: {url}")
-            
-            # Try to get the main content element
-            main_content = soup.find('div', {'class': 'filing-content'})
-            if main_content:
-                # Extract text from the main content element
-                text = main_content.get_text(separator='\n', strip=True)
-                if text and len(text) > 500:
-                    return text
-                    
-            # If main content element not found or insufficient text, try the document body
-            body = soup.find('body')
-            if body:
-                text = body.get_text(separator='\n', strip=True)
-                if text and len(text) > 500:
-                    return text
-            
+            logger.info(f"Detected iXBRL viewer page, retrieving the filing document for: {url}")
+
             # Second approach: Try to get the raw text version of the filing
             try:
                 # Extract document details from URL
@@ -458,71 +627,39 @@ def extract_10k_content(url):
                             # Modern SEC URLs include the filename
                             accession_parts = parts[1].split('-')
                             accession = f"{accession_parts[0]}-{accession_parts[1]}-{accession_parts[2]}"
-                            
+
                             # Try to request the text version
                             txt_url = f"https://www.sec.gov/Archives/edgar/data/{cik}/{parts[1]}/{accession}.txt"
                             logger.info(f"Attempting to retrieve text version: {txt_url}")
-                            
-                            txt_response = requests.get(txt_url, headers=headers)
+
+                            txt_response = edgar_get(txt_url)
                             txt_response.raise_for_status()
-                            
-                            if len(txt_response.text) > 1000:  # Ensure we got meaningful content
+
+                            # The full submission: keep the 10-K itself, not its exhibits and graphics
+                            txt_text = submission_to_text(txt_response.text)
+                            if len(txt_text) > 1000:  # Ensure we got meaningful content
                                 logger.info("Successfully retrieved text version of 10-K")
-                                return txt_response.text
+                                return txt_text
             except Exception as txt_err:
                 logger.warning(f"Failed to get text version: {str(txt_err)}")
-                
-            # Third approach: Try alternative URL construction for modern SEC URLs
+
+            # Third approach: Sometimes we can access the HTM version directly
             try:
-                # Sometimes we can access the HTM version directly
-                if '/ix?doc=' in url:
-                    htm_url = url.replace('/ix?doc=', '/')
-                    logger.info(f"Attempting to retrieve HTM version: {htm_url}")
-                    
-                    htm_response = requests.get(htm_url, headers=headers)
-                    htm_response.raise_for_status()
-                    
-                    htm_soup = BeautifulSoup(htm_response.text, 'html.parser')
-                    htm_text = htm_soup.get_text(separator='\n', strip=True)
-                    
-                    if htm_text and len(htm_text) > 500:
-                        logger.info("Successfully retrieved HTM version of 10-K")
-                        return htm_text
+                htm_url = url.replace('/ix?doc=', '/')
+                logger.info(f"Attempting to retrieve HTM version: {htm_url}")
+
+                htm_response = edgar_get(htm_url)
+                htm_response.raise_for_status()
+
+                htm_text = html_to_text(htm_response.content)
+                if htm_text and len(htm_text) > 500:
+                    logger.info("Successfully retrieved HTM version of 10-K")
+                    return htm_text
             except Exception as htm_err:
                 logger.warning(f"Failed to get HTM version: {str(htm_err)}")
-        
-        # Remove script and style elements
-        for script in soup(["script", "style"]):
-            script.extract()
-        
-        # Get text
-        text = soup.get_text(separator='\n', strip=True)
-        
-        # Clean up text
-        lines = (line.strip() for line in text.splitlines())
-        chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-        text = '\n'.join(chunk for chunk in chunks if chunk)
-        
-        # Check if we have enough content
-        if text and len(text) > 500:
-            return text
-        else:
-            # Fallback to a more aggressive extraction approach
-            logger.warning("Initial extraction produced insufficient content, trying fallback method")
-            # Get all text nodes from the document
-            text_nodes = []
-            for node in soup.find_all(text=True):
-                if node.parent.name not in ['script', 'style', 'meta', 'link']:
-                    text_nodes.append(node.strip())
-            
-            # Filter out empty lines and join
-            filtered_text = '\n'.join(node for node in text_nodes if node)
-            
-            if filtered_text and len(filtered_text) > 500:
-                return filtered_text
-            else:
-                raise ValueError("Could not extract sufficient content from the 10-K filing")
-        
+
+        raise ValueError("Could not extract sufficient content from the 10-K filing")
+
     except Exception as e:
         logger.error(f"Error extracting content from 10-K at {url}: {str(e)}")
         raise ValueError(f"Failed to extract content from 10-K: {str(e)}")
\ No newline at end of file
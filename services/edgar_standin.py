@@ -0,0 +1,170 @@
+"""
+Local stand-in for SEC EDGAR
+
+Serves recorded responses from a cassette directory (see services.edgar_cassette)
+over HTTP, with configurable latency and error injection, so the EDGAR pipeline can
+be exercised and benchmarked without network access. Point the app at it with
+EDGAR_STANDIN_URL; the original host is the first path segment of each request:
+
+    python -m services.edgar_standin --port 8765 --latency-ms 80 --error-rate 0.05
+    EDGAR_STANDIN_URL=http://127.0.0.1:8765 python app.py
+
+Unrecorded URLs return 404. Conditional requests matching a recorded ETag return 304.
+"""
+
+import os
+import time
+import random
+import logging
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from services.edgar_cassette import CassetteStore, EDGAR_CASSETTE_DIR
+
+logger = logging.getLogger(__name__)
+
+
+class StandinConfig:
+    """
+    Behaviour of a stand-in server
+
+    Args:
+        store (CassetteStore): Recorded responses to serve
+        latency_ms (float): Delay added to every response
+        jitter_ms (float): Random extra delay, uniformly distributed up to this value
+        error_rate (float): Fraction of requests answered with error_status instead
+        error_status (int): Status code of injected errors
+        seed (int, optional): Seed for the error and jitter random generator
+    """
+
+    def __init__(self, store, latency_ms=0, jitter_ms=0, error_rate=0.0, error_status=503, seed=None):
+        self.store = store
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.stats = {'served': 0, 'not_modified': 0, 'missing': 0, 'injected_errors': 0}
+
+    def delay(self):
+        with self._lock:
+            jitter = self._random.uniform(0, self.jitter_ms) if self.jitter_ms else 0
+        return (self.latency_ms + jitter) / 1000.0
+
+    def inject_error(self):
+        with self._lock:
+            return self.error_rate > 0 and self._random.random() < self.error_rate
+
+    def count(self, stat):
+        with self._lock:
+            self.stats[stat] += 1
+
+
+class StandinHandler(BaseHTTPRequestHandler):
+    """Answers GET and HEAD requests from the server's cassette store"""
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self._respond(include_body=True)
+
+    def do_HEAD(self):
+        self._respond(include_body=False)
+
+    def _respond(self, include_body):
+        config = self.server.config
+        delay = config.delay()
+        if delay:
+            time.sleep(delay)
+
+        if config.inject_error():
+            config.count('injected_errors')
+            self._send(config.error_status, b'Injected error\n', {'Content-Type': 'text/plain'}, include_body)
+            return
+
+        # /www.sec.gov/Archives/... -> https://www.sec.gov/Archives/...
+        host, _, path = self.path.lstrip('/').partition('/')
+        recorded = config.store.load(self.command, f"https://{host}/{path}")
+        if recorded is None and self.command == 'HEAD':
+            recorded = config.store.load('GET', f"https://{host}/{path}")
+        if recorded is None:
+            config.count('missing')
+            self._send(404, b'Not recorded\n', {'Content-Type': 'text/plain'}, include_body)
+            return
+
+        meta, body = recorded
+        headers = meta.get('headers', {})
+        etag = headers.get('ETag')
+        if etag and self.headers.get('If-None-Match') == etag:
+            config.count('not_modified')
+            self._send(304, b'', {'ETag': etag}, include_body=False)
+            return
+
+        config.count('served')
+        self._send(meta['status'], body, headers, include_body)
+
+    def _send(self, status, body, headers, include_body):
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body) if status != 304 else 0))
+        self.end_headers()
+        if include_body and status != 304:
+            self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+
+def start_standin(directory=EDGAR_CASSETTE_DIR, host='127.0.0.1', port=0, **options):
+    """
+    Start a stand-in server in a background thread
+
+    Args:
+        directory (str): Cassette directory to serve
+        host (str): Interface to bind
+        port (int): Port to bind (0 picks a free port)
+        **options: Passed to StandinConfig (latency_ms, jitter_ms, error_rate, ...)
+
+    Returns:
+        tuple: (server, base URL); stop it with server.shutdown()
+    """
+    server = ThreadingHTTPServer((host, port), StandinHandler)
+    server.daemon_threads = True
+    server.config = StandinConfig(CassetteStore(directory), **options)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    base_url = f"http://{host}:{server.server_address[1]}"
+    logger.info(f"EDGAR stand-in serving {directory} at {base_url}")
+    return server, base_url
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Serve recorded EDGAR responses locally")
+    parser.add_argument('--dir', default=EDGAR_CASSETTE_DIR, help="Cassette directory")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=int(os.environ.get('EDGAR_STANDIN_PORT', 8765)))
+    parser.add_argument('--latency-ms', type=float, default=0, help="Delay added to every response")
+    parser.add_argument('--jitter-ms', type=float, default=0, help="Random extra delay up to this value")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Fraction of requests that fail")
+    parser.add_argument('--error-status', type=int, default=503, help="Status code of injected failures")
+    parser.add_argument('--seed', type=int, default=None, help="Random seed for jitter and errors")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    server = ThreadingHTTPServer((args.host, args.port), StandinHandler)
+    server.config = StandinConfig(
+        CassetteStore(args.dir),
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        seed=args.seed,
+    )
+    print(f"Serving {args.dir} at http://{args.host}:{args.port} (set EDGAR_STANDIN_URL to this address)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
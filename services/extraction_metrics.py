@@ -0,0 +1,155 @@
+"""
+Extraction metrics for InsightLens
+
+Collects per-document, per-page timings and errors while PDF pages are extracted,
+so slow or failing documents can be identified from the metrics endpoints and
+from the stored processing record.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+# Upper bounds (in milliseconds) of the page latency histogram buckets
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+# Number of recent extraction runs kept in memory for the metrics endpoint
+MAX_RECENT_RUNS = 50
+
+# Maximum number of individual errors kept per document
+MAX_ERRORS_PER_RUN = 20
+
+_recent_runs = OrderedDict()
+_recent_runs_lock = threading.Lock()
+_run_counter = 0
+
+
+class ExtractionMetrics:
+    """Per-document extraction statistics, safe to update from worker threads"""
+
+    def __init__(self, document_id=None, source=None):
+        self.document_id = document_id
+        self.source = source
+        self.mode = None
+        self.total_pages = 0
+        self.started_at = time.time()
+        self.finished_at = None
+        self.run_id = None
+        self.stop_reason = None  # Set when extraction stops early on a budget
+        self._page_times = {}
+        self._page_chars = {}
+        self._errors = []
+        self._error_count = 0
+        self._lock = threading.Lock()
+
+    def record_page(self, page_num, seconds, chars=0):
+        """Record the extraction time (in seconds) and text size of a page"""
+        with self._lock:
+            self._page_times[page_num] = seconds
+            self._page_chars[page_num] = chars
+
+    def record_error(self, page_num, error):
+        """Record an extractor error for a page"""
+        with self._lock:
+            self._error_count += 1
+            if len(self._errors) < MAX_ERRORS_PER_RUN:
+                self._errors.append({'page': page_num + 1, 'error': str(error)})
+
+    def finish(self):
+        """Mark the extraction as finished"""
+        self.finished_at = time.time()
+
+    def summary(self, slowest=5):
+        """
+        Build a JSON-serialisable summary of the extraction
+
+        Args:
+            slowest (int): Number of slowest pages to include
+
+        Returns:
+            dict: Latency histogram, percentiles, throughput, slowest pages and errors
+        """
+        with self._lock:
+            page_times = dict(self._page_times)
+            page_chars = dict(self._page_chars)
+            errors = list(self._errors)
+            error_count = self._error_count
+
+        end_time = self.finished_at or time.time()
+        elapsed = max(end_time - self.started_at, 0.0)
+        latencies_ms = sorted(seconds * 1000 for seconds in page_times.values())
+
+        histogram = []
+        for bound in LATENCY_BUCKETS_MS:
+            histogram.append({'le_ms': bound, 'count': sum(1 for ms in latencies_ms if ms <= bound)})
+        histogram.append({'le_ms': 'inf', 'count': len(latencies_ms)})
+
+        slowest_pages = sorted(page_times.items(), key=lambda item: item[1], reverse=True)[:slowest]
+
+        return {
+            'run_id': self.run_id,
+            'document_id': self.document_id,
+            'source': self.source,
+            'mode': self.mode,
+            'status': 'completed' if self.finished_at else 'running',
+            'stop_reason': self.stop_reason,
+            'total_pages': self.total_pages,
+            'pages_extracted': len(page_times),
+            'characters': sum(page_chars.values()),
+            'elapsed_seconds': round(elapsed, 3),
+            'pages_per_second': round(len(page_times) / elapsed, 2) if elapsed > 0 else 0.0,
+            'latency_ms': {
+                'mean': round(sum(latencies_ms) / len(latencies_ms), 2) if latencies_ms else 0.0,
+                'p50': round(_percentile(latencies_ms, 50), 2),
+                'p95': round(_percentile(latencies_ms, 95), 2),
+                'max': round(latencies_ms[-1], 2) if latencies_ms else 0.0,
+            },
+            'histogram': histogram,
+            'slowest_pages': [
+                {'page': page_num + 1, 'ms': round(seconds * 1000, 2), 'chars': page_chars.get(page_num, 0)}
+                for page_num, seconds in slowest_pages
+            ],
+            'error_count': error_count,
+            'errors': errors,
+        }
+
+
+def _percentile(sorted_values, percentile):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(int(round(percentile / 100.0 * len(sorted_values))) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+def register_run(metrics):
+    """
+    Register an extraction run so it is visible to the metrics endpoint while it runs
+
+    Only the most recent MAX_RECENT_RUNS runs are kept.
+    """
+    global _run_counter
+    with _recent_runs_lock:
+        _run_counter += 1
+        metrics.run_id = _run_counter
+        _recent_runs[metrics.run_id] = metrics
+        while len(_recent_runs) > MAX_RECENT_RUNS:
+            _recent_runs.popitem(last=False)
+    return metrics
+
+
+def get_recent_runs():
+    """Return summaries of recent extraction runs, newest first"""
+    with _recent_runs_lock:
+        runs = list(_recent_runs.values())
+    return [metrics.summary() for metrics in reversed(runs)]
+
+
+def get_latest_run_for_document(document_id):
+    """Return the summary of the most recent run for a document, or None"""
+    with _recent_runs_lock:
+        runs = list(_recent_runs.values())
+    for metrics in reversed(runs):
+        if metrics.document_id == document_id:
+            return metrics.summary()
+    return None
@@ -0,0 +1,204 @@
+"""
+Section index for 10-K and 10-Q text
+
+Finds the "Item N." headings of a filing's extracted text (one block per line, as
+produced by services.html_text) and records where each section starts and ends, so
+individual sections such as Risk Factors or MD&A can be read without scanning the
+whole document. Headings in the table of contents are told apart from the real ones
+by the length of text that follows them.
+"""
+
+import re
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Standard 10-K item titles, used when a heading carries no title of its own
+ITEM_TITLES_10K = {
+    '1': 'Business',
+    '1A': 'Risk Factors',
+    '1B': 'Unresolved Staff Comments',
+    '1C': 'Cybersecurity',
+    '2': 'Properties',
+    '3': 'Legal Proceedings',
+    '4': 'Mine Safety Disclosures',
+    '5': 'Market for Registrant’s Common Equity',
+    '6': 'Reserved',
+    '7': 'Management’s Discussion and Analysis',
+    '7A': 'Quantitative and Qualitative Disclosures About Market Risk',
+    '8': 'Financial Statements and Supplementary Data',
+    '9': 'Changes in and Disagreements with Accountants',
+    '9A': 'Controls and Procedures',
+    '9B': 'Other Information',
+    '9C': 'Disclosure Regarding Foreign Jurisdictions that Prevent Inspections',
+    '10': 'Directors, Executive Officers and Corporate Governance',
+    '11': 'Executive Compensation',
+    '12': 'Security Ownership of Certain Beneficial Owners and Management',
+    '13': 'Certain Relationships and Related Transactions',
+    '14': 'Principal Accountant Fees and Services',
+    '15': 'Exhibits and Financial Statement Schedules',
+    '16': 'Form 10-K Summary',
+}
+
+_PART_RE = re.compile(r'^\s*part\s+(iv|i{1,3})\b', re.I | re.M)
+_ITEM_RE = re.compile(r'^\s*item\s*(\d{1,2}[a-c]?)\s*[.:—–-]?\s*(.{0,120})$', re.I | re.M)
+
+
+def build_section_index(text, form='10-K'):
+    """
+    Build the section index of a filing's text
+
+    Args:
+        text (str): Extracted filing text, one block per line
+        form (str): Form type; items are numbered per part in a 10-Q but across the
+            whole document in a 10-K
+
+    Returns:
+        list: Sections in document order, as dicts with 'part' (e.g. 'I', or None),
+            'item' (e.g. '1A'), 'title', 'start' and 'end' character offsets
+    """
+    if not text:
+        return []
+
+    parts = [(match.start(), match.group(1).upper()) for match in _PART_RE.finditer(text)]
+    headings = []
+    for match in _ITEM_RE.finditer(text):
+        part = None
+        for position, name in parts:
+            if position > match.start():
+                break
+            part = name
+        title = match.group(2).strip().rstrip('.').strip()
+        # Page numbers of table-of-contents lines are not titles
+        if title.isdigit():
+            title = ''
+        headings.append({'part': part, 'item': match.group(1).upper(), 'title': title, 'start': match.start()})
+
+    # Each heading's span runs to the next heading; for repeated items the longest span
+    # is the section itself, the others are table-of-contents or cross-reference lines
+    for i, heading in enumerate(headings):
+        heading['end'] = headings[i + 1]['start'] if i + 1 < len(headings) else len(text)
+
+    per_part = form.upper().startswith('10-Q')
+    best = {}
+    for heading in headings:
+        key = (heading['part'], heading['item']) if per_part else heading['item']
+        if key not in best or heading['end'] - heading['start'] > best[key]['end'] - best[key]['start']:
+            best[key] = heading
+
+    sections = sorted(best.values(), key=lambda heading: heading['start'])
+    for i, section in enumerate(sections):
+        section['end'] = sections[i + 1]['start'] if i + 1 < len(sections) else len(text)
+        if not section['title'] and not per_part:
+            section['title'] = ITEM_TITLES_10K.get(section['item'], '')
+    return sections
+
+
+def get_section_text(text, sections, item, part=None):
+    """
+    Return the text of one section
+
+    Args:
+        text (str): Filing text the index was built from
+        sections (list): Result of build_section_index
+        item (str): Item number, e.g. '7' or '1A'
+        part (str, optional): Part number for 10-Q filings, where items repeat per part
+
+    Returns:
+        str or None: The section text, or None if the item was not found
+    """
+    item = item.upper()
+    for section in sections:
+        if section['item'] == item and (part is None or section['part'] == part.upper()):
+            return text[section['start']:section['end']]
+    return None
+
+
+# Sections kept first when a filing has to be shortened, most useful first
+# (10-Q sections as 'part-item')
+SECTION_PRIORITY_10K = ['7', '1A', '1', '8', '7A', '9A', '3']
+SECTION_PRIORITY_10Q = ['I-2', 'I-1', 'II-1A', 'I-3', 'I-4', 'II-1']
+
+# Characters of cover page and front matter kept before the first section
+PREAMBLE_CHARS = 2000
+
+TRUNCATION_MARKER = "\n[...CONTENT TRUNCATED FOR PERFORMANCE...]\n"
+
+
+def _cut_at_line(text, limit):
+    """Cut text to at most limit characters, at a line break where possible"""
+    if len(text) <= limit:
+        return text
+    cut = text.rfind('\n', 0, limit)
+    return text[:cut if cut > limit // 2 else limit]
+
+
+def _share_budget(sizes, budget):
+    """Split a budget so small parts are kept whole and large parts share the rest equally"""
+    allocation = {}
+    remaining = budget
+    pending = sorted(sizes.items(), key=lambda item: item[1])
+    for i, (key, size) in enumerate(pending):
+        allocation[key] = min(size, remaining // (len(pending) - i))
+        remaining -= allocation[key]
+    return allocation
+
+
+def select_content(text, max_chars, form='10-K', sections=None):
+    """
+    Shorten a filing to about max_chars, keeping its most useful sections
+
+    The key sections (MD&A, risk factors, business, financial statements, ...) are
+    kept whole when they fit, otherwise they share the budget evenly; other sections
+    only get what is left. Text without recognizable sections keeps its beginning,
+    middle and end.
+
+    Args:
+        text (str): Extracted filing or page text
+        max_chars (int): Character budget
+        form (str): Form type, see build_section_index
+        sections (list, optional): Section index of text, if already built
+
+    Returns:
+        str: The text, shortened with truncation markers if it was over budget
+    """
+    if len(text) <= max_chars:
+        return text
+
+    per_part = form.upper().startswith('10-Q')
+    if sections is None:
+        sections = build_section_index(text, form)
+    if not sections:
+        # No structure to go by: beginning, middle and end, cut at line breaks
+        head = _cut_at_line(text, int(max_chars * 0.4))
+        middle_start = int(len(text) * 0.4)
+        middle = _cut_at_line(text[middle_start:], int(max_chars * 0.3))
+        tail = text[-int(max_chars * 0.3):]
+        tail = tail[tail.find('\n') + 1:] if '\n' in tail else tail
+        return head + TRUNCATION_MARKER + middle + TRUNCATION_MARKER + tail
+
+    def key(section):
+        return f"{section['part']}-{section['item']}" if per_part else section['item']
+
+    by_key = {key(section): section for section in sections}
+    sizes = {k: section['end'] - section['start'] for k, section in by_key.items()}
+    priority = [k for k in (SECTION_PRIORITY_10Q if per_part else SECTION_PRIORITY_10K) if k in by_key]
+
+    preamble = _cut_at_line(text[:sections[0]['start']], PREAMBLE_CHARS)
+    budget = max(max_chars - len(preamble), 0)
+    allocation = _share_budget({k: sizes[k] for k in priority}, budget)
+    remaining = budget - sum(allocation.values())
+    if remaining > 0:
+        allocation.update(_share_budget({k: size for k, size in sizes.items() if k not in allocation}, remaining))
+
+    pieces = [preamble]
+    for section in sections:
+        allotted = allocation.get(key(section), 0)
+        if allotted <= 0:
+            continue
+        section_text = text[section['start']:section['end']]
+        kept = _cut_at_line(section_text, allotted)
+        pieces.append(kept.rstrip('\n') + (TRUNCATION_MARKER if len(kept) < len(section_text) else '\n'))
+    logger.info(f"Selected {sum(len(piece) for piece in pieces)} of {len(text)} characters "
+                f"from {len([k for k in allocation if allocation[k] > 0])} of {len(sections)} sections")
+    return ''.join(pieces).strip('\n')
@@ -0,0 +1,275 @@
+"""
+Filing-change detection and incremental re-analysis
+
+When a watched company files a new 10-K, 10-K/A or 10-Q, the new document is compared
+with the previously analyzed filing of the same kind section by section. Only the
+insight categories whose source sections changed materially are generated again; the
+others are copied from the earlier analysis. A 10-K/A usually contains just the
+amended items, so sections it leaves out count as unchanged and the regenerated
+categories see the original filing with the amended sections spliced in.
+"""
+
+import os
+import re
+import zlib
+import logging
+import datetime
+
+from app import db
+from models import Document, Insight, Processing
+from services.ai_service import generate_insights
+from services.edgar_service import get_filing_text, get_filing_sections
+from services.document_processor import get_financial_context, record_api_usage
+
+logger = logging.getLogger(__name__)
+
+# Fraction of a section's text that must differ before dependent insights are regenerated
+SECTION_CHANGE_THRESHOLD = float(os.environ.get('SECTION_CHANGE_THRESHOLD', 0.1))
+
+# 10-K items each insight category is drawn from
+CATEGORY_SECTIONS_10K = {
+    'business_summary': ['1'],
+    'moat': ['1', '1A', '7'],
+    'moat_analysis': ['1', '1A', '7'],
+    'financial': ['7', '7A', '8'],
+    'management': ['7', '9A', '10', '11'],
+    'red_flags': ['1A', '3', '7', '9A'],
+    'margin_of_safety': ['7', '8'],
+    'buffett_analysis': ['1', '7', '8'],
+    'biotech_analysis': ['1', '1A', '7'],
+}
+
+# 10-Q sections, as 'part-item'
+CATEGORY_SECTIONS_10Q = {
+    'business_summary': ['I-2'],
+    'moat': ['I-2', 'II-1A'],
+    'moat_analysis': ['I-2', 'II-1A'],
+    'financial': ['I-1', 'I-2', 'I-3'],
+    'management': ['I-2', 'I-4'],
+    'red_flags': ['I-4', 'II-1', 'II-1A'],
+    'margin_of_safety': ['I-1', 'I-2'],
+    'buffett_analysis': ['I-1', 'I-2'],
+    'biotech_analysis': ['I-2', 'II-1A'],
+}
+
+_WORD_RE = re.compile(r'[a-z0-9]+')
+
+
+def is_quarterly(form_type):
+    return (form_type or '').upper().startswith('10-Q')
+
+
+def form_family(form_type):
+    """Forms whose filings can be compared with each other: 10-K with 10-K/A, 10-Q with 10-Q/A"""
+    return ('10-Q', '10-Q/A') if is_quarterly(form_type) else ('10-K', '10-K/A')
+
+
+def section_key(section, form_type):
+    return f"{section['part']}-{section['item']}" if is_quarterly(form_type) else section['item']
+
+
+def _shingles(text, size=5):
+    """Hashes of overlapping runs of `size` words, insensitive to case, punctuation and layout"""
+    words = _WORD_RE.findall(text.lower())
+    if len(words) < size:
+        return {zlib.crc32(' '.join(words).encode('utf-8'))} if words else set()
+    return {zlib.crc32(' '.join(words[i:i + size]).encode('utf-8')) for i in range(len(words) - size + 1)}
+
+
+def section_change(old_text, new_text):
+    """
+    Measure how much a section changed
+
+    Returns:
+        float: 0.0 for identical wording, up to 1.0 for no shared passages
+    """
+    old_shingles = _shingles(old_text)
+    new_shingles = _shingles(new_text)
+    if not old_shingles and not new_shingles:
+        return 0.0
+    return 1.0 - len(old_shingles & new_shingles) / len(old_shingles | new_shingles)
+
+
+def diff_sections(base_text, base_sections, new_text, new_sections, form_type='10-K', amendment=False):
+    """
+    Compare two filings section by section
+
+    Args:
+        base_text (str), base_sections (list): Previously analyzed filing and its section index
+        new_text (str), new_sections (list): New filing and its section index
+        form_type (str): Form type of the new filing
+        amendment (bool): The new filing only contains amended sections
+
+    Returns:
+        dict: Change (0.0 to 1.0) by section key, for every section in either filing
+    """
+    base = {section_key(section, form_type): base_text[section['start']:section['end']] for section in base_sections}
+    new = {section_key(section, form_type): new_text[section['start']:section['end']] for section in new_sections}
+
+    changes = {}
+    for key in set(base) | set(new):
+        if key not in new:
+            # Amendments leave untouched items out; in a full filing a missing item is a change
+            changes[key] = 0.0 if amendment else 1.0
+        elif key not in base:
+            changes[key] = 1.0
+        else:
+            changes[key] = section_change(base[key], new[key])
+    return changes
+
+
+def categories_to_regenerate(categories, changes, form_type='10-K', threshold=None):
+    """
+    Select the insight categories whose source sections changed materially
+
+    Categories without a section mapping are always regenerated.
+    """
+    threshold = SECTION_CHANGE_THRESHOLD if threshold is None else threshold
+    mapping = CATEGORY_SECTIONS_10Q if is_quarterly(form_type) else CATEGORY_SECTIONS_10K
+    regenerate = []
+    for category in categories:
+        sections = mapping.get(category)
+        if sections is None or any(changes.get(section, 0.0) > threshold for section in sections):
+            regenerate.append(category)
+    return regenerate
+
+
+def merge_amended_sections(base_text, base_sections, amended_text, amended_sections, form_type='10-K'):
+    """
+    Build the text of a filing as amended: the original with the amended sections replaced
+
+    Amended sections not present in the original are appended.
+    """
+    amended = {section_key(section, form_type): amended_text[section['start']:section['end']] for section in amended_sections}
+    pieces = []
+    position = 0
+    for section in base_sections:
+        key = section_key(section, form_type)
+        if key in amended:
+            pieces.append(base_text[position:section['start']])
+            pieces.append(amended.pop(key))
+            position = section['end']
+    pieces.append(base_text[position:])
+    pieces.extend(amended.values())
+    return '\n'.join(piece.strip('\n') for piece in pieces if piece)
+
+
+def find_base_document(cik, filing):
+    """
+    Find the most recent analyzed filing a new filing can be compared with
+
+    Args:
+        cik (str): Company CIK
+        filing (dict): The new filing with 'form_type', 'accession_number' and 'filing_date'
+
+    Returns:
+        Document or None: A processed document of the same form family with insights
+    """
+    filed = datetime.date.fromisoformat(filing['filing_date'])
+    candidates = (Document.query
+                  .filter(Document.cik == cik,
+                          Document.processed.is_(True),
+                          Document.use_demo_mode.isnot(True),
+                          Document.use_local_processing.isnot(True),
+                          Document.form_type.in_(form_family(filing['form_type'])),
+                          Document.accession_number != filing['accession_number'],
+                          Document.filing_date <= filed)
+                  .order_by(Document.filing_date.desc(), Document.created_at.desc())
+                  .all())
+    for document in candidates:
+        if document.insights:
+            return document
+    return None
+
+
+def analyze_incrementally(cik, company_name, filing, base_document, prefetched=False):
+    """
+    Analyze a new filing, reusing the insights of a previous analysis where its sections are unchanged
+
+    Args:
+        cik (str): Company CIK
+        company_name (str): Company name for the document title
+        filing (dict): The new filing, including its document 'url'
+        base_document (Document): Previous analysis to diff against (see find_base_document)
+        prefetched (bool): Mark the new document as prefetched
+
+    Returns:
+        Document: The new, processed document
+    """
+    form_type = filing['form_type']
+    amendment = form_type.upper().endswith('/A')
+
+    base_text = get_filing_text(base_document.url)
+    base_sections = get_filing_sections(base_document.url, base_document.form_type or form_type)
+    new_text = get_filing_text(filing['url'])
+    new_sections = get_filing_sections(filing['url'], form_type)
+
+    categories = [insight.category for insight in base_document.insights]
+    if base_sections and new_sections:
+        changes = diff_sections(base_text, base_sections, new_text, new_sections, form_type, amendment)
+        regenerate = categories_to_regenerate(categories, changes, form_type)
+    else:
+        # Without section indexes nothing can be reused safely
+        changes = {}
+        regenerate = categories
+    logger.info(f"Filing {filing['accession_number']} vs document {base_document.id}: "
+                f"changed sections {sorted(key for key, change in changes.items() if change > SECTION_CHANGE_THRESHOLD)}, "
+                f"regenerating {regenerate} of {len(categories)} categories")
+
+    document = Document(
+        url=filing['url'],
+        content_type='edgar',
+        title=f"{form_type} Filing: {company_name}",
+        company_name=company_name,
+        cik=cik,
+        accession_number=filing['accession_number'],
+        filing_date=datetime.date.fromisoformat(filing['filing_date']),
+        form_type=form_type,
+        base_document_id=base_document.id,
+        prefetched=prefetched,
+        use_buffett_mode=base_document.use_buffett_mode,
+        use_biotech_mode=base_document.use_biotech_mode,
+        industry_type=base_document.industry_type
+    )
+    db.session.add(document)
+    db.session.commit()
+    processing = Processing(document_id=document.id, status='processing')
+    db.session.add(processing)
+    db.session.commit()
+
+    try:
+        insights = {}
+        if regenerate:
+            if amendment and base_sections and new_sections:
+                content = merge_amended_sections(base_text, base_sections, new_text, new_sections, form_type)
+            else:
+                content = new_text
+            insights = generate_insights(
+                content,
+                filter_categories=regenerate,
+                financial_context=get_financial_context(document)
+            )
+            record_api_usage(document, content, insights)
+
+        for insight in base_document.insights:
+            if insight.category not in insights:
+                insights[insight.category] = insight.content
+        for category, content in insights.items():
+            db.session.add(Insight(document_id=document.id, category=category, content=content))
+
+        document.processed = True
+        processing.status = 'completed'
+        processing.completed_at = datetime.datetime.utcnow()
+        db.session.commit()
+    except Exception as e:
+        logger.exception(f"Incremental analysis of document {document.id} failed: {str(e)}")
+        db.session.rollback()
+        processing.status = 'failed'
+        processing.error = str(e)
+        processing.completed_at = datetime.datetime.utcnow()
+        db.session.commit()
+        raise
+
+    logger.info(f"Incrementally analyzed {form_type} {filing['accession_number']} as document {document.id}, "
+                f"reused {len(categories) - len(regenerate)} of {len(categories)} categories")
+    return document
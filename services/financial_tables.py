@@ -0,0 +1,477 @@
+"""
+Financial statement table extraction for InsightLens
+
+Plain PDF text extraction turns balance sheets and income statements into
+jumbled token runs. This module re-reads only the pages identified as primary
+financial statements, using the position of every text fragment on the page to
+rebuild rows (line item + one value per period column). Values are kept as
+compact typed arrays and rendered as a small pipe-separated table for prompts.
+"""
+
+import re
+import math
+import logging
+from array import array
+
+import PyPDF2
+
+logger = logging.getLogger(__name__)
+
+# Statement headings, matched against whole lines near the top of a page
+STATEMENT_PATTERNS = [
+    ('balance_sheet', re.compile(
+        r'^(consolidated\s+)?(balance\s+sheets?|statements?\s+of\s+financial\s+(position|condition))\b', re.I)),
+    ('income_statement', re.compile(
+        r'^(consolidated\s+)?(income\s+statements?|statements?\s+of\s+(\(loss\)\s+)?(operations|income|earnings|\(loss\)\s+income|loss))\b', re.I)),
+    ('cash_flow', re.compile(r'^(consolidated\s+)?statements?\s+of\s+cash\s+flows?\b', re.I)),
+]
+
+STATEMENT_LABELS = {
+    'balance_sheet': 'BALANCE SHEET',
+    'income_statement': 'INCOME STATEMENT',
+    'cash_flow': 'CASH FLOW STATEMENT',
+}
+
+# Only the first few lines of a page are checked for a statement heading
+HEADING_SEARCH_LINES = 8
+
+# Upper bound on statement pages re-read with layout extraction per document
+MAX_STATEMENT_PAGES = 12
+
+# Upper bound on unsampled pages read while looking for statements that the
+# sampled extraction skipped
+MAX_PROBE_PAGES = 40
+
+# Fragments whose baselines differ by less than this many points share a row
+ROW_TOLERANCE = 2.5
+
+# Minimum number of rows with values for a page to count as a statement table
+MIN_TABLE_ROWS = 5
+
+PAGE_MARKER_RE = re.compile(r'^\[Page (\d+)\]$', re.M)
+ITEM_8_RE = re.compile(r'item\s+8\.?\s+financial\s+statements', re.I)
+TOC_ITEM_8_RE = re.compile(r'^item\s+8\.?\s+financial\s+statements.*?\s(\d{1,4})\s*$', re.I | re.M)
+PAGE_NUMBER_LINE_RE = re.compile(r'^\d{1,4}$')
+YEAR_RE = re.compile(r'^(19|20)\d{2}$')
+NUMBER_RE = re.compile(r'^\(?-?\$?\s*\(?\d[\d,]*(\.\d+)?\)?%?$')
+DASH_VALUES = {'—', '–', '-', '— ', '$—', '$ —'}
+UNITS_RE = re.compile(r'in\s+(thousands|millions|billions)', re.I)
+
+
+def split_pages(content):
+    """
+    Split extracted PDF content into pages using the "[Page N]" markers
+    written by the PDF parser
+
+    Returns:
+        dict: Zero-based page index -> page text
+    """
+    pages = {}
+    markers = list(PAGE_MARKER_RE.finditer(content or ''))
+    for i, marker in enumerate(markers):
+        end = markers[i + 1].start() if i + 1 < len(markers) else len(content)
+        pages[int(marker.group(1)) - 1] = content[marker.end():end]
+    return pages
+
+
+def find_statement_pages(content):
+    """
+    Identify financial statement pages from extracted PDF content
+
+    Uses the page markers of the existing extraction, so no extra pass over
+    the document is needed.
+
+    Args:
+        content (str): Text returned by extract_pdf_content
+
+    Returns:
+        list: (page_index, statement_type) tuples, page_index is zero-based
+    """
+    pages = []
+    for page_index, page_text in sorted(split_pages(content).items()):
+        statement_type = detect_statement_type(page_text)
+        if statement_type:
+            pages.append((page_index, statement_type))
+        if len(pages) >= MAX_STATEMENT_PAGES:
+            break
+    return pages
+
+
+def probe_statement_pages(reader, content):
+    """
+    Look for statement pages that sampled extraction skipped
+
+    Large PDFs are only sampled, so the statements are often missing from the
+    extracted content. Reading starts where Item 8 (Financial Statements) is
+    expected, otherwise in the middle of the document where annual reports
+    usually place the statements.
+
+    Args:
+        reader (PdfReader): PyPDF2 reader for the document
+        content (str): Text returned by extract_pdf_content
+
+    Returns:
+        list: (page_index, statement_type) tuples for the probed pages
+    """
+    extracted_pages = split_pages(content)
+    total_pages = len(reader.pages)
+
+    start = locate_item_8(extracted_pages, total_pages)
+    if start is None:
+        start = int(total_pages * 0.35)
+
+    found = []
+    found_types = set()
+    probed = 0
+    for page_index in range(start, total_pages):
+        if probed >= MAX_PROBE_PAGES or len(found_types) == len(STATEMENT_LABELS):
+            break
+        if page_index in extracted_pages:
+            statement_type = detect_statement_type(extracted_pages[page_index])
+            if statement_type:
+                found_types.add(statement_type)
+            continue
+        probed += 1
+        try:
+            statement_type = detect_statement_type(reader.pages[page_index].extract_text() or '')
+        except Exception as e:
+            logger.warning(f"Failed to read page {page_index + 1} while probing for statements: {str(e)}")
+            continue
+        if statement_type:
+            found.append((page_index, statement_type))
+            found_types.add(statement_type)
+
+    logger.info(f"Probed {probed} unsampled pages for financial statements, found {len(found)}")
+    return found
+
+
+def locate_item_8(extracted_pages, total_pages):
+    """
+    Estimate the zero-based page index where Item 8 starts
+
+    Prefers the table of contents entry, translated from the printed page
+    number to a PDF page index using the page numbers printed at the bottom
+    of the extracted pages. Falls back to a sampled page whose text opens
+    Item 8 outside the front matter.
+
+    Returns:
+        int or None: Page index, or None if Item 8 could not be located
+    """
+    offsets = {}
+    for page_index, page_text in extracted_pages.items():
+        lines = [line.strip() for line in page_text.strip().splitlines() if line.strip()]
+        if lines and PAGE_NUMBER_LINE_RE.match(lines[-1]):
+            offset = page_index - int(lines[-1])
+            offsets[offset] = offsets.get(offset, 0) + 1
+
+    if offsets:
+        offset = max(offsets, key=offsets.get)
+        for page_index in sorted(extracted_pages):
+            toc_match = TOC_ITEM_8_RE.search(extracted_pages[page_index])
+            if toc_match:
+                candidate = int(toc_match.group(1)) + offset
+                if 0 <= candidate < total_pages:
+                    return candidate
+
+    front_matter = max(int(total_pages * 0.05), 3)
+    anchors = [
+        page_index for page_index, page_text in extracted_pages.items()
+        if page_index > front_matter and ITEM_8_RE.search(page_text)
+    ]
+    return min(anchors) if anchors else None
+
+
+def detect_statement_type(page_text):
+    """Return the statement type if one of the first lines of a page is a statement heading"""
+    lines = [line.strip() for line in page_text.strip().splitlines() if line.strip()]
+    for line in lines[:HEADING_SEARCH_LINES]:
+        # Index pages list statements followed by page numbers, skip those
+        if re.search(r'\s\d{1,3}$', line):
+            continue
+        for statement_type, pattern in STATEMENT_PATTERNS:
+            if pattern.match(line):
+                return statement_type
+    return None
+
+
+def extract_financial_statements(pdf_path, content):
+    """
+    Extract structured financial statement tables from a PDF
+
+    Args:
+        pdf_path (str): Path to the PDF file
+        content (str): Text already extracted by extract_pdf_content
+
+    Returns:
+        list: Statement dicts with keys statement_type, title, page, units,
+            periods, line_items and values (array of float64, row-major,
+            NaN for empty cells)
+    """
+    statements = []
+    with open(pdf_path, 'rb') as f:
+        reader = PyPDF2.PdfReader(f)
+        
+        statement_pages = find_statement_pages(content)
+        if len({statement_type for _, statement_type in statement_pages}) < len(STATEMENT_LABELS):
+            statement_pages.extend(probe_statement_pages(reader, content))
+        statement_pages = sorted(set(statement_pages))[:MAX_STATEMENT_PAGES]
+        
+        for page_index, statement_type in statement_pages:
+            if page_index >= len(reader.pages):
+                continue
+            try:
+                statement = extract_statement_from_page(reader.pages[page_index], statement_type)
+            except Exception as e:
+                logger.warning(f"Layout extraction failed on page {page_index + 1}: {str(e)}")
+                continue
+            if statement:
+                statement['page'] = page_index + 1
+                statements.append(statement)
+
+    logger.info(f"Extracted {len(statements)} financial statement tables from {len(statement_pages)} candidate pages")
+    return statements
+
+
+def extract_statement_from_page(page, statement_type):
+    """
+    Rebuild the rows of a statement page from positioned text fragments
+
+    Args:
+        page (PageObject): PyPDF2 page
+        statement_type (str): One of the STATEMENT_PATTERNS keys
+
+    Returns:
+        dict or None: Statement table, or None if the page does not look like a table
+    """
+    rows = group_fragments_into_rows(collect_fragments(page))
+
+    title = None
+    units = None
+    periods = []
+    period_positions = []
+    parsed_rows = []
+    pending_label = ''
+
+    for fragments in rows:
+        line_text = ' '.join(text for _, text in fragments).strip()
+        if not title:
+            for _, pattern in STATEMENT_PATTERNS:
+                if pattern.match(line_text):
+                    title = line_text
+                    break
+        if not units:
+            units_match = UNITS_RE.search(line_text)
+            if units_match:
+                units = units_match.group(1).lower()
+
+        tokens = split_row_tokens(fragments)
+
+        # The period header is the first row made only of years
+        if not periods and tokens and all(YEAR_RE.match(token) for _, token in tokens):
+            periods = [token for _, token in tokens]
+            period_positions = [x for x, _ in tokens]
+            continue
+
+        label_parts = []
+        values = []
+        for x, token in tokens:
+            value = parse_value(token)
+            label = ' '.join(label_parts)
+            # A closing note reference such as "11)" in "(note 11)" belongs to the label
+            if value is not None and not values and token.endswith(')') and label.count('(') > label.count(')'):
+                value = None
+            if value is None:
+                if not values:
+                    label_parts.append(token)
+            else:
+                values.append((x, value))
+
+        label = ' '.join(label_parts).strip(' :')
+        if values and label:
+            # Line items that wrap start their second line in lower case
+            if pending_label and not label[0].isupper():
+                label = f"{pending_label} {label}"
+            parsed_rows.append((label, values))
+            pending_label = ''
+        else:
+            pending_label = label if label and not values else ''
+
+    if not periods or len(parsed_rows) < MIN_TABLE_ROWS:
+        return None
+
+    line_items = []
+    values = array('d')
+    for label, row_values in parsed_rows:
+        line_items.append(label)
+        values.extend(assign_columns(row_values, period_positions))
+
+    return {
+        'statement_type': statement_type,
+        'title': title or STATEMENT_LABELS[statement_type].title(),
+        'units': units,
+        'periods': periods,
+        'line_items': line_items,
+        'values': values,
+    }
+
+
+def collect_fragments(page):
+    """Return (x, y, text) for every non-empty text fragment on a page"""
+    fragments = []
+
+    def visitor(text, cm, tm, font_dict, font_size):
+        if not text or not text.strip():
+            return
+        # Position of the text origin in user space (text matrix times current matrix)
+        x = tm[4] * cm[0] + tm[5] * cm[2] + cm[4]
+        y = tm[4] * cm[1] + tm[5] * cm[3] + cm[5]
+        fragments.append((x, y, text))
+
+    page.extract_text(visitor_text=visitor)
+    return fragments
+
+
+def group_fragments_into_rows(fragments):
+    """Group fragments into rows by baseline, top to bottom, each row sorted left to right"""
+    rows = []
+    for x, y, text in sorted(fragments, key=lambda fragment: -fragment[1]):
+        if rows and abs(rows[-1][0] - y) <= ROW_TOLERANCE:
+            rows[-1][1].append((x, text))
+        else:
+            rows.append([y, [(x, text)]])
+    return [sorted(row, key=lambda fragment: fragment[0]) for _, row in rows]
+
+
+def split_row_tokens(fragments):
+    """
+    Split the fragments of a row into label words and value tokens
+
+    Currency symbols are dropped and values that were split across fragments
+    (for example "(122,695" and ")") are rejoined.
+    """
+    tokens = []
+    for x, text in fragments:
+        for token in re.split(r'\s{2,}|(?<=\d)\s(?=[\$\(\d—–])|(?<=\))(?=[\$\(])', text.strip()):
+            token = token.strip()
+            if not token or token == '$':
+                continue
+            token = token.lstrip('$').strip()
+            if token == ')' and tokens:
+                tokens[-1] = (tokens[-1][0], tokens[-1][1] + ')')
+                continue
+            tokens.append((x, token))
+    return tokens
+
+
+def parse_value(token):
+    """
+    Parse a statement cell into a float
+
+    Returns:
+        float or None: The value ("(1,234)" becomes -1234.0, a dash becomes 0.0),
+            or None if the token is not a number
+    """
+    if token in DASH_VALUES:
+        return 0.0
+    if not NUMBER_RE.match(token):
+        return None
+    negative = token.startswith('(') or token.startswith('-')
+    cleaned = re.sub(r'[^\d.]', '', token)
+    if not cleaned or cleaned == '.':
+        return None
+    try:
+        value = float(cleaned)
+    except ValueError:
+        return None
+    return -value if negative else value
+
+
+def assign_columns(row_values, period_positions):
+    """
+    Place the values of a row under the period columns
+
+    Values are matched to the nearest period header by x position. Rows with
+    no header positions are right-aligned. Missing cells are NaN.
+    """
+    columns = len(period_positions)
+    cells = [math.nan] * columns
+    if len(row_values) >= columns:
+        for i, (_, value) in enumerate(row_values[-columns:]):
+            cells[i] = value
+        return cells
+
+    for x, value in row_values:
+        nearest = min(range(columns), key=lambda i: abs(period_positions[i] - x))
+        if math.isnan(cells[nearest]):
+            cells[nearest] = value
+    return cells
+
+
+def pack_values(values):
+    """Serialize a float64 array to bytes for storage"""
+    return array('d', values).tobytes()
+
+
+def unpack_values(data):
+    """Deserialize bytes written by pack_values back into a float64 array"""
+    values = array('d')
+    if data:
+        values.frombytes(data)
+    return values
+
+
+def format_number(value):
+    """Format a statement value compactly for prompts"""
+    if math.isnan(value):
+        return ''
+    if value == int(value):
+        return str(int(value))
+    return f"{value:.2f}"
+
+
+def format_statement_table(statement, max_rows=60):
+    """
+    Render one statement as a compact pipe-separated table
+
+    Args:
+        statement (dict): Statement with periods, line_items and values
+        max_rows (int): Maximum number of line items to include
+
+    Returns:
+        str: Table text, one line per line item
+    """
+    periods = statement['periods']
+    columns = len(periods)
+    label = STATEMENT_LABELS.get(statement['statement_type'], statement['statement_type'].upper())
+    header_note = f"page {statement['page']}" if statement.get('page') else ''
+    if statement.get('units'):
+        header_note = f"{header_note}, {statement['units']}" if header_note else statement['units']
+
+    lines = [f"{label} ({header_note}) | " + ' | '.join(periods) if header_note else f"{label} | " + ' | '.join(periods)]
+    values = statement['values']
+    for row, line_item in enumerate(statement['line_items'][:max_rows]):
+        cells = values[row * columns:(row + 1) * columns]
+        lines.append(f"{line_item} | " + ' | '.join(format_number(value) for value in cells))
+    return '\n'.join(lines)
+
+
+def format_statements_for_prompt(statements, max_chars=6000):
+    """
+    Render statements as a compact block to put ahead of the document content
+
+    Args:
+        statements (list): Statement dicts
+        max_chars (int): Character budget for the whole block
+
+    Returns:
+        str: The tables, or an empty string if there are none
+    """
+    blocks = []
+    used = 0
+    for statement in statements:
+        table = format_statement_table(statement)
+        if used + len(table) > max_chars:
+            break
+        blocks.append(table)
+        used += len(table) + 2
+    return '\n\n'.join(blocks)
@@ -0,0 +1,114 @@
+"""
+EDGAR full-submission (.txt) filter
+
+A filing's complete submission text file wraps every document of the filing in an
+SGML envelope: the primary 10-K or 10-Q, each exhibit, and uuencoded graphics, Excel
+and ZIP payloads. Only the primary document is useful for analysis, so it is cut out
+of the envelope before any text extraction; the other documents are skipped without
+being copied or parsed.
+"""
+
+import re
+import logging
+
+from services.html_text import html_to_text
+
+logger = logging.getLogger(__name__)
+
+_HEADER_FIELD_RE = re.compile(r'^<(TYPE|SEQUENCE|FILENAME|DESCRIPTION)>([^\n<]*)', re.M)
+_SUBMISSION_TYPE_RE = re.compile(r'CONFORMED SUBMISSION TYPE:\s*(\S+)')
+_WRAPPER_TAG_RE = re.compile(r'</?(?:XBRL|XML|PDF)>', re.I)
+# Layout tags of plain-text filings (pre-HTML EDGAR)
+_TEXT_TAG_RE = re.compile(r'^\s*</?(?:PAGE|S|C|TABLE|CAPTION|FN)>[^\n]*$\n?', re.I | re.M)
+
+
+def is_full_submission(raw):
+    """Check whether text is an EDGAR full submission with a <DOCUMENT> envelope"""
+    return '<DOCUMENT>' in raw[:200000]
+
+
+def list_documents(raw):
+    """
+    List the documents of a full submission without copying their contents
+
+    Args:
+        raw (str): Full submission text
+
+    Returns:
+        list: Documents in filing order, as dicts with 'type', 'sequence', 'filename',
+            'description' and the 'start'/'end' offsets of their <TEXT> body in raw
+    """
+    documents = []
+    position = raw.find('<DOCUMENT>')
+    while position != -1:
+        end = raw.find('</DOCUMENT>', position)
+        if end == -1:
+            end = len(raw)
+        text_start = raw.find('<TEXT>', position, end)
+        header = raw[position:text_start if text_start != -1 else min(end, position + 2000)]
+        document = {'type': '', 'sequence': '', 'filename': '', 'description': ''}
+        for field, value in _HEADER_FIELD_RE.findall(header):
+            document[field.lower()] = value.strip()
+        if text_start != -1:
+            text_end = raw.rfind('</TEXT>', text_start, end)
+            document['start'] = text_start + len('<TEXT>')
+            document['end'] = text_end if text_end != -1 else end
+        else:
+            document['start'] = document['end'] = end
+        documents.append(document)
+        position = raw.find('<DOCUMENT>', end)
+    return documents
+
+
+def primary_document(raw, form=None):
+    """
+    Find the primary document of a full submission
+
+    Args:
+        raw (str): Full submission text
+        form (str, optional): Expected form type, e.g. '10-K'; defaults to the
+            submission type in the SEC header
+
+    Returns:
+        dict or None: The document (see list_documents), or None if there is none
+    """
+    documents = list_documents(raw)
+    if not documents:
+        return None
+    if form is None:
+        match = _SUBMISSION_TYPE_RE.search(raw, 0, documents[0]['start'])
+        form = match.group(1) if match else None
+    if form:
+        for document in documents:
+            if document['type'].upper() == form.upper():
+                return document
+    # By convention the primary document comes first
+    return documents[0]
+
+
+def submission_to_text(raw, form=None):
+    """
+    Extract the text of the primary document of a full submission
+
+    Text that is not a full submission is returned unchanged.
+
+    Args:
+        raw (str): Full submission text (e.g. from an accession's .txt URL)
+        form (str, optional): Expected form type of the primary document
+
+    Returns:
+        str: Text of the primary document, one block per line
+    """
+    if not raw or not is_full_submission(raw):
+        return raw
+
+    document = primary_document(raw, form)
+    if document is None:
+        return raw
+    body = _WRAPPER_TAG_RE.sub('', raw[document['start']:document['end']])
+    logger.info(f"Kept {document['type']} {document['filename']} ({len(body)} of {len(raw)} characters) "
+                f"from the full submission, dropping exhibits and graphics")
+
+    if re.search(r'<html|<body|<div|<p\b', body[:5000], re.I):
+        return html_to_text(body)
+    return _TEXT_TAG_RE.sub('', body).strip()
@@ -0,0 +1,106 @@
+"""
+Fast HTML-to-text extraction for SEC filings
+
+10-K documents are multi-megabyte inline XBRL (iXBRL) HTML. This module parses them
+with lxml's C parser and produces line-separated text in a single walk of the tree,
+skipping scripts, styles, the hidden <ix:header> block and other display:none content.
+Block elements (paragraphs, divs, table rows, ...) start a new line; table cells on a
+row are joined with spaces.
+"""
+
+import re
+import logging
+from lxml import etree
+
+logger = logging.getLogger(__name__)
+
+# Elements whose content is never text of the document
+SKIP_TAGS = {'script', 'style', 'head', 'noscript', 'template', 'ix:header', 'ix:hidden', 'xbrli:context'}
+
+# Elements that start a new line
+BLOCK_TAGS = {
+    'p', 'div', 'br', 'tr', 'li', 'ul', 'ol', 'table', 'section', 'article', 'header', 'footer',
+    'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'hr', 'pre', 'blockquote', 'dt', 'dd', 'center', 'title',
+}
+
+# Elements separated from their neighbours on the same line
+CELL_TAGS = {'td', 'th'}
+
+_HIDDEN_STYLE_RE = re.compile(r'display\s*:\s*none', re.I)
+_HORIZONTAL_SPACE_RE = re.compile(r'[ \t\r\f\v\xa0​]+')
+
+
+def _parser(encoding=None):
+    return etree.HTMLParser(encoding=encoding, remove_comments=True, remove_pis=True, huge_tree=True)
+
+
+def parse_html(html):
+    """
+    Parse HTML (bytes or str) with lxml
+
+    Bytes are preferred: lxml then honours the document's declared encoding. iXBRL
+    documents start with an XML declaration, which lxml refuses on str input, so str
+    input is encoded to UTF-8 first.
+
+    Returns:
+        lxml element: The document root, or None if nothing could be parsed
+    """
+    if isinstance(html, str):
+        return etree.fromstring(html.encode('utf-8'), _parser('utf-8'))
+    return etree.fromstring(html, _parser())
+
+
+def html_to_text(html):
+    """
+    Extract readable text from an HTML or iXBRL document in one pass
+
+    Args:
+        html (bytes or str): The document
+
+    Returns:
+        str: Text with one block per line and blank lines removed
+    """
+    root = parse_html(html)
+    if root is None:
+        return ''
+
+    parts = []
+    skipped = set()
+    walker = etree.iterwalk(root, events=('start', 'end'))
+    for event, element in walker:
+        tag = element.tag
+        if not isinstance(tag, str):
+            # Comments and processing instructions left by the parser; keep their tail
+            if event == 'end' and element.tail:
+                parts.append(element.tail)
+            continue
+
+        if event == 'start':
+            style = element.get('style')
+            if tag in SKIP_TAGS or (style and _HIDDEN_STYLE_RE.search(style)):
+                walker.skip_subtree()
+                # Emit the tail here and ignore the element's end event, which some
+                # lxml versions still report for a skipped subtree
+                skipped.add(element)
+                if element.tail:
+                    parts.append(element.tail)
+                continue
+            if tag in BLOCK_TAGS:
+                parts.append('\n')
+            elif tag in CELL_TAGS:
+                parts.append(' ')
+            if element.text:
+                parts.append(element.text)
+        else:
+            if element in skipped:
+                skipped.discard(element)
+                continue
+            if tag in BLOCK_TAGS:
+                parts.append('\n')
+            elif tag in CELL_TAGS:
+                parts.append(' ')
+            if element.tail:
+                parts.append(element.tail)
+
+    text = _HORIZONTAL_SPACE_RE.sub(' ', ''.join(parts))
+    return '\n'.join(line.strip() for line in text.split('\n') if line and not line.isspace())
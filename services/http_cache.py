@@ -0,0 +1,268 @@
+"""
+HTTP cache with conditional revalidation for EDGAR metadata and web pages
+
+Response bodies are stored in the disk cache together with their ETag and
+Last-Modified validators. Later requests revalidate with If-None-Match /
+If-Modified-Since, so an unchanged resource costs a 304 with no body. A small
+in-process cache keeps the parsed form of each response, so repeated lookups
+of an unchanged resource do not parse it again.
+
+Web pages pasted by users (investor-relations pages, earnings releases) are kept
+in a separate size-bounded store, keyed by normalized URL, that honors
+Cache-Control and keeps the text extracted from each page next to its body.
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+from cachetools import LRUCache
+from diskcache import Cache
+
+from services.cache_service import disk_cache, CACHE_DIR
+
+logger = logging.getLogger(__name__)
+
+# Responses younger than this are served without contacting the server at all
+HTTP_CACHE_FRESH_SECONDS = int(os.environ.get('HTTP_CACHE_FRESH_SECONDS', 60))
+
+# Number of parsed responses kept in memory
+HTTP_CACHE_PARSED_ENTRIES = int(os.environ.get('HTTP_CACHE_PARSED_ENTRIES', 32))
+
+# Web pages younger than this are served without revalidation, unless Cache-Control says otherwise
+HTTP_PAGE_FRESH_SECONDS = int(os.environ.get('HTTP_PAGE_FRESH_SECONDS', 0))
+
+# Size of the on-disk web page cache in MB; least recently used pages are evicted first
+HTTP_PAGE_CACHE_MB = int(os.environ.get('HTTP_PAGE_CACHE_MB', 256))
+
+# Query parameters that only track the visitor and never change the page
+TRACKING_PARAMS = ('utm_', 'gclid', 'fbclid', 'mc_cid', 'mc_eid', '_ga')
+
+page_cache = Cache(
+    os.path.join(CACHE_DIR, 'http_pages'),
+    size_limit=HTTP_PAGE_CACHE_MB * 1024 * 1024,
+    eviction_policy='least-recently-used'
+)
+
+_parsed_cache = LRUCache(maxsize=HTTP_CACHE_PARSED_ENTRIES)
+_parsed_lock = threading.Lock()
+
+_stats_lock = threading.Lock()
+_stats = {'fresh_hits': 0, 'revalidated': 0, 'fetched': 0, 'parsed_hits': 0, 'errors': 0}
+
+
+def _cache_key(url):
+    return f"http:{url}"
+
+
+def _count(stat):
+    with _stats_lock:
+        _stats[stat] += 1
+
+
+def normalize_url(url):
+    """
+    Normalize a URL so equivalent spellings share a cache entry
+
+    Lowercases the scheme and host, drops default ports, the fragment and tracking
+    parameters, and sorts the query.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = parts.hostname or ''
+    if parts.port and (scheme, parts.port) not in (('http', 80), ('https', 443)):
+        host = f"{host}:{parts.port}"
+    query = urlencode(sorted(
+        (name, value) for name, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not name.lower().startswith(TRACKING_PARAMS)
+    ))
+    return urlunsplit((scheme, host, parts.path or '/', query, ''))
+
+
+def parse_cache_control(headers):
+    """
+    Read the caching directives of a response
+
+    Returns:
+        tuple: (store, max_age) - whether the response may be stored, and the seconds
+            it stays fresh (0 for no-cache, None if the server did not say)
+    """
+    directives = {}
+    for directive in (headers.get('Cache-Control') or '').lower().split(','):
+        name, _, value = directive.strip().partition('=')
+        directives[name] = value.strip('"')
+    if 'no-store' in directives:
+        return False, 0
+    if 'no-cache' in directives:
+        return True, 0
+    for name in ('s-maxage', 'max-age'):
+        if directives.get(name, '').isdigit():
+            return True, int(directives[name])
+    return True, None
+
+
+def cached_get(url, fetch=None, fresh_for=None, store=None, cache_control=False, cache_url=None):
+    """
+    GET a URL through the cache, revalidating stored copies with the server
+
+    Args:
+        url (str): URL to fetch
+        fetch (callable, optional): Function taking (url, headers=...) and returning a
+            requests.Response; defaults to the shared EDGAR client
+        fresh_for (int, optional): Seconds a stored copy is used without revalidation
+            (defaults to HTTP_CACHE_FRESH_SECONDS)
+        store (Cache, optional): Cache to keep the entry in (defaults to disk_cache)
+        cache_control (bool): Let the response's Cache-Control header decide whether it
+            is stored and how long it stays fresh
+        cache_url (str, optional): URL the entry is stored under, if not the fetched URL
+
+    Returns:
+        dict: Cache entry with 'body' (bytes), 'etag', 'last_modified', 'content_type',
+            'fetched_at' and 'validated_at'
+    """
+    if fetch is None:
+        from services.edgar_client import edgar_get
+        fetch = edgar_get
+    if fresh_for is None:
+        fresh_for = HTTP_CACHE_FRESH_SECONDS
+    if store is None:
+        store = disk_cache
+
+    key = _cache_key(cache_url or url)
+    entry = store.get(key)
+
+    if entry and cache_control and entry.get('max_age') is not None:
+        fresh_for = entry['max_age']
+    if entry and time.time() - entry['validated_at'] < fresh_for:
+        _count('fresh_hits')
+        return entry
+
+    headers = {}
+    if entry:
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+
+    try:
+        response = fetch(url, headers=headers)
+    except Exception as e:
+        # Serve the stored copy if the server cannot be reached
+        if entry:
+            logger.warning(f"Revalidation of {url} failed, using cached copy: {str(e)}")
+            _count('errors')
+            return entry
+        raise
+
+    if response.status_code == 304 and entry:
+        entry['validated_at'] = time.time()
+        if cache_control:
+            entry['max_age'] = parse_cache_control(response.headers)[1]
+        store.set(key, entry)
+        _count('revalidated')
+        return entry
+
+    response.raise_for_status()
+    now = time.time()
+    entry = {
+        'url': cache_url or url,
+        'body': response.content,
+        'etag': response.headers.get('ETag'),
+        'last_modified': response.headers.get('Last-Modified'),
+        'content_type': response.headers.get('Content-Type'),
+        'fetched_at': now,
+        'validated_at': now,
+    }
+    if cache_control:
+        storable, entry['max_age'] = parse_cache_control(response.headers)
+        if not storable:
+            store.delete(key)
+            _count('fetched')
+            return entry
+    store.set(key, entry)
+    _count('fetched')
+    return entry
+
+
+def cached_get_parsed(url, parse, fetch=None, fresh_for=None):
+    """
+    GET a URL through the cache and return its parsed form
+
+    The parsed value is kept in memory and reused for as long as the stored response
+    is unchanged, so callers should treat it as read-only.
+
+    Args:
+        url (str): URL to fetch
+        parse (callable): Function converting the body bytes to the parsed value
+        fetch (callable, optional): See cached_get
+        fresh_for (int, optional): See cached_get
+
+    Returns:
+        The parsed response body
+    """
+    entry = cached_get(url, fetch=fetch, fresh_for=fresh_for)
+    version = (entry['fetched_at'], entry.get('etag'), entry.get('last_modified'))
+
+    with _parsed_lock:
+        cached = _parsed_cache.get(url)
+    if cached and cached[0] == version:
+        _count('parsed_hits')
+        return cached[1]
+
+    parsed = parse(entry['body'])
+    with _parsed_lock:
+        _parsed_cache[url] = (version, parsed)
+    return parsed
+
+
+def cached_get_json(url, fetch=None, fresh_for=None):
+    """GET a JSON document through the cache and return it parsed"""
+    return cached_get_parsed(url, json.loads, fetch=fetch, fresh_for=fresh_for)
+
+
+def cached_get_page(url, fetch, fresh_for=None):
+    """
+    GET a web page through the page cache
+
+    Args:
+        url (str): Page URL; it is fetched as given and stored under its normalized
+            form (see normalize_url), so equivalent spellings share an entry
+        fetch (callable): See cached_get
+        fresh_for (int, optional): Freshness when the server sends no max-age
+            (defaults to HTTP_PAGE_FRESH_SECONDS, i.e. revalidate every time)
+
+    Returns:
+        dict: Cache entry, see cached_get
+    """
+    fresh_for = HTTP_PAGE_FRESH_SECONDS if fresh_for is None else fresh_for
+    return cached_get(url, fetch=fetch, fresh_for=fresh_for, store=page_cache, cache_control=True,
+                      cache_url=normalize_url(url))
+
+
+def get_extracted_text(entry, extractor):
+    """Return text extracted from a cached page by the named extractor, or None"""
+    return entry.get('extracted', {}).get(extractor)
+
+
+def save_extracted_text(entry, extractor, text):
+    """
+    Keep text extracted from a cached page next to its body
+
+    The text is dropped together with the body when the page changes.
+    """
+    entry.setdefault('extracted', {})[extractor] = text
+    key = _cache_key(entry['url'])
+    stored = page_cache.get(key)
+    if stored is not None and stored['fetched_at'] == entry['fetched_at']:
+        page_cache.set(key, entry)
+
+
+def get_http_cache_stats():
+    """Return hit, revalidation and fetch counts for this worker"""
+    with _stats_lock:
+        stats = dict(_stats)
+    with _parsed_lock:
+        stats['parsed_entries'] = len(_parsed_cache)
+    return stats
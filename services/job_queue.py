@@ -0,0 +1,404 @@
+"""
+Database-backed job queue for document processing
+
+Uploads and EDGAR requests add a row to the job table instead of starting a thread in
+the web worker. A fixed pool of worker threads claims queued jobs, highest priority
+first, with SELECT ... FOR UPDATE SKIP LOCKED so several processes can share the
+queue. A claimed job holds a lease that its worker renews while the job runs; if the
+worker dies (restart, deploy, crash) the lease runs out and another worker picks the
+job up again. Failed jobs are retried with exponential backoff up to max_attempts.
+
+The workers run inside the web app (main.py) by default, or in a separate worker
+process (worker.py) when the web app sets JOB_WORKERS=0. On startup, documents left
+pending or processing without a job (e.g. by the old thread-per-request processing)
+are queued again.
+"""
+
+import os
+import json
+import socket
+import logging
+import datetime
+import threading
+
+from app import app, db
+from models import Document, Processing, Job
+from services.document_processor import process_document
+from services.cancellation import ProcessingCancelled, cancel_local
+
+logger = logging.getLogger(__name__)
+
+# Worker threads that run queued jobs in the web process; 0 only queues jobs for worker.py
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 3))
+
+# Seconds a claimed job stays reserved for its worker without a lease renewal
+JOB_LEASE_SECONDS = int(os.environ.get('JOB_LEASE_SECONDS', 600))
+
+# Attempts before a job is marked failed, and the delay before the first retry (doubled each time)
+JOB_MAX_ATTEMPTS = int(os.environ.get('JOB_MAX_ATTEMPTS', 3))
+JOB_RETRY_BASE_SECONDS = int(os.environ.get('JOB_RETRY_BASE_SECONDS', 30))
+JOB_RETRY_MAX_SECONDS = 3600
+
+# Seconds an idle worker waits before checking the queue again
+JOB_POLL_SECONDS = float(os.environ.get('JOB_POLL_SECONDS', 2))
+
+# Unfinished documents younger than this are queued again on startup
+JOB_RECOVERY_HOURS = float(os.environ.get('JOB_RECOVERY_HOURS', 24))
+
+# Job priorities; higher runs first
+PRIORITY_INTERACTIVE = 10  # A user is waiting on the insights page
+PRIORITY_HISTORY = 5  # Filings of a multi-year 10-K history
+PRIORITY_BACKGROUND = 0
+
+ACTIVE_STATUSES = ('queued', 'running')
+
+_worker_threads = []
+_stop_event = threading.Event()
+_wake_event = threading.Event()
+
+
+def _process_document_job(job):
+    document = Document.query.get(job.document_id)
+    if document is None:
+        raise ValueError(f"Document {job.document_id} not found")
+    if document.processed:
+        # An earlier attempt finished but lost its lease before recording it
+        logger.info(f"Document {document.id} is already processed, skipping job {job.id}")
+        return
+    if not process_document(document.id):
+        processing = Processing.query.filter_by(document_id=document.id).first()
+        if processing and processing.status == 'cancelled':
+            raise ProcessingCancelled(f"Processing of document {document.id} was cancelled")
+        raise RuntimeError(processing.error if processing and processing.error else f"Processing of document {document.id} failed")
+
+
+# Job kind -> function called with the claimed Job; raising an exception fails the attempt,
+# raising ProcessingCancelled ends the job as cancelled without a retry
+JOB_HANDLERS = {
+    'process_document': _process_document_job,
+}
+
+
+def enqueue(kind, document_id=None, payload=None, priority=PRIORITY_BACKGROUND, max_attempts=None):
+    """
+    Add a job to the queue
+
+    A document that already has a queued or running job of the same kind is not
+    queued twice; the existing job is returned instead.
+
+    Args:
+        kind (str): Handler name (see JOB_HANDLERS)
+        document_id (int, optional): Document the job works on
+        payload (dict, optional): JSON arguments for the handler
+        priority (int): Higher runs first (see PRIORITY_INTERACTIVE and friends)
+        max_attempts (int, optional): Defaults to JOB_MAX_ATTEMPTS
+
+    Returns:
+        Job: The queued job
+    """
+    if document_id is not None:
+        existing = (Job.query
+                    .filter(Job.kind == kind, Job.document_id == document_id, Job.status.in_(ACTIVE_STATUSES))
+                    .first())
+        if existing:
+            return existing
+
+    job = Job(
+        kind=kind,
+        document_id=document_id,
+        payload=json.dumps(payload) if payload else None,
+        priority=priority,
+        max_attempts=max_attempts or JOB_MAX_ATTEMPTS,
+        run_after=datetime.datetime.utcnow()
+    )
+    db.session.add(job)
+    db.session.commit()
+    _wake_event.set()
+    logger.info(f"Queued {kind} job {job.id} for document {document_id} (priority {priority})")
+    return job
+
+
+def claim_job(worker_id, kinds=None):
+    """
+    Claim the next runnable job for a worker
+
+    Runnable jobs are queued jobs whose run_after has passed and running jobs whose
+    lease expired. The row is locked with FOR UPDATE SKIP LOCKED, so concurrent
+    workers claim different jobs instead of waiting on each other.
+
+    Args:
+        worker_id (str): Identifies the worker holding the lease
+        kinds (iterable, optional): Only claim these job kinds (defaults to JOB_HANDLERS)
+
+    Returns:
+        Job or None: The claimed job, now 'running' with a fresh lease
+    """
+    now = datetime.datetime.utcnow()
+    kinds = list(JOB_HANDLERS if kinds is None else kinds)
+    job = (Job.query
+           .filter(Job.kind.in_(kinds),
+                   db.or_(db.and_(Job.status == 'queued', Job.run_after <= now),
+                          db.and_(Job.status == 'running', Job.lease_expires_at < now)))
+           .order_by(Job.priority.desc(), Job.run_after, Job.id)
+           .with_for_update(skip_locked=True)
+           .first())
+    if job is None:
+        db.session.rollback()
+        return None
+
+    if job.status == 'running':
+        logger.warning(f"Job {job.id} lost its worker {job.worker_id}, whose lease expired; claiming it again")
+
+    # Without row locks (SQLite) two workers can read the same row; matching on the
+    # attempt count lets only one of the updates through
+    claimed = (Job.query
+               .filter_by(id=job.id, status=job.status, attempts=job.attempts)
+               .update({
+                   'status': 'running',
+                   'worker_id': worker_id,
+                   'attempts': job.attempts + 1,
+                   'started_at': now,
+                   'lease_expires_at': now + datetime.timedelta(seconds=JOB_LEASE_SECONDS)
+               }, synchronize_session=False))
+    db.session.commit()
+    if not claimed:
+        return None
+    return Job.query.get(job.id)
+
+
+def _update_owned_job(job_id, worker_id, values):
+    """Update a job only while the worker still holds it; returns False if the lease was lost"""
+    updated = (Job.query
+               .filter_by(id=job_id, worker_id=worker_id, status='running')
+               .update(values, synchronize_session=False))
+    db.session.commit()
+    return bool(updated)
+
+
+def _keep_lease(job_id, worker_id, stop_event):
+    interval = max(JOB_LEASE_SECONDS / 3, 1)
+    while not stop_event.wait(interval):
+        with app.app_context():
+            try:
+                lease = datetime.datetime.utcnow() + datetime.timedelta(seconds=JOB_LEASE_SECONDS)
+                if not _update_owned_job(job_id, worker_id, {'lease_expires_at': lease}):
+                    logger.warning(f"Worker {worker_id} lost the lease on job {job_id}")
+                    return
+            except Exception as e:
+                logger.warning(f"Could not renew the lease on job {job_id}: {str(e)}")
+                db.session.rollback()
+            finally:
+                db.session.remove()
+
+
+def _set_processing(document_id, status, error):
+    if document_id is None:
+        return
+    processing = Processing.query.filter_by(document_id=document_id).first()
+    if processing:
+        processing.status = status
+        processing.error = error
+        if status == 'failed':
+            processing.completed_at = datetime.datetime.utcnow()
+        db.session.commit()
+
+
+def retry_delay(attempts):
+    """Seconds to wait before retrying a job that failed its attempts-th attempt"""
+    return min(JOB_RETRY_BASE_SECONDS * 2 ** max(attempts - 1, 0), JOB_RETRY_MAX_SECONDS)
+
+
+def run_job(job, worker_id):
+    """
+    Run a claimed job and record the outcome
+
+    Failed attempts are queued again after retry_delay until max_attempts is reached;
+    meanwhile the document's processing status shows 'pending' with the error.
+
+    Args:
+        job (Job): Job returned by claim_job
+        worker_id (str): Worker holding the lease
+
+    Returns:
+        bool: True if the job completed
+    """
+    job_id, document_id = job.id, job.document_id
+    handler = JOB_HANDLERS.get(job.kind)
+    if handler is None:
+        error = f"No handler for job kind '{job.kind}'"
+    elif job.attempts > job.max_attempts:
+        error = f"Gave up after {job.max_attempts} attempts; the last worker stopped without finishing"
+    else:
+        error = None
+        stop_event = threading.Event()
+        keeper = threading.Thread(target=_keep_lease, args=(job_id, worker_id, stop_event), daemon=True)
+        keeper.start()
+        try:
+            handler(job)
+        except ProcessingCancelled as e:
+            logger.info(f"Job {job_id} ({job.kind}) stopped: {str(e)}")
+            db.session.rollback()
+            _update_owned_job(job_id, worker_id, {'status': 'cancelled', 'finished_at': datetime.datetime.utcnow()})
+            return False
+        except Exception as e:
+            logger.exception(f"Job {job_id} ({job.kind}) failed on attempt {job.attempts}: {str(e)}")
+            db.session.rollback()
+            error = str(e) or e.__class__.__name__
+        finally:
+            stop_event.set()
+            keeper.join()
+
+    now = datetime.datetime.utcnow()
+    if error is None:
+        if not _update_owned_job(job_id, worker_id, {'status': 'completed', 'finished_at': now, 'last_error': None}):
+            logger.warning(f"Job {job_id} finished after worker {worker_id} lost its lease")
+        return True
+
+    job = Job.query.get(job_id)
+    if handler is not None and job.attempts < job.max_attempts:
+        delay = retry_delay(job.attempts)
+        if _update_owned_job(job_id, worker_id, {
+            'status': 'queued',
+            'worker_id': None,
+            'lease_expires_at': None,
+            'run_after': now + datetime.timedelta(seconds=delay),
+            'last_error': error
+        }):
+            _set_processing(document_id, 'pending',
+                            f"Attempt {job.attempts} of {job.max_attempts} failed ({error}); retrying in {delay} seconds")
+            logger.info(f"Job {job_id} will be retried in {delay} seconds")
+        return False
+
+    if _update_owned_job(job_id, worker_id, {'status': 'failed', 'finished_at': now, 'last_error': error}):
+        _set_processing(document_id, 'failed', error)
+        logger.error(f"Job {job_id} failed after {job.attempts} attempts: {error}")
+    return False
+
+
+def run_next_job(worker_id):
+    """
+    Claim and run one job
+
+    Returns:
+        bool: True if a job was run (whatever its outcome), False if none was runnable
+    """
+    job = claim_job(worker_id)
+    if job is None:
+        return False
+    run_job(job, worker_id)
+    return True
+
+
+def cancel_document_jobs(document_id):
+    """
+    Cancel the jobs of a document whose processing status was set to 'cancelled'
+
+    Queued jobs are cancelled before they start. A running job stops at its next
+    cancellation check: right away if it runs in this process, otherwise once its
+    worker sees the new status (see services.cancellation).
+
+    Returns:
+        int: Number of queued jobs cancelled
+    """
+    cancelled = (Job.query
+                 .filter_by(document_id=document_id, status='queued')
+                 .update({'status': 'cancelled', 'finished_at': datetime.datetime.utcnow()}, synchronize_session=False))
+    db.session.commit()
+    cancel_local(document_id)
+    return cancelled
+
+
+def recover_orphaned_jobs(max_age_hours=None):
+    """
+    Queue documents whose processing was interrupted
+
+    Finds documents that are pending or processing but have no queued or running job,
+    which happens when a process was restarted while running the old per-request
+    threads, or a job row was lost. Running jobs whose worker died need no recovery:
+    claim_job takes them over once their lease expires. Prefetched documents are left
+    to the next prefetch run.
+
+    Args:
+        max_age_hours (float, optional): Only recover documents started within this
+            many hours (defaults to JOB_RECOVERY_HOURS)
+
+    Returns:
+        int: Number of documents queued again
+    """
+    max_age_hours = JOB_RECOVERY_HOURS if max_age_hours is None else max_age_hours
+    since = datetime.datetime.utcnow() - datetime.timedelta(hours=max_age_hours)
+    active = db.session.query(Job.document_id).filter(Job.document_id.isnot(None), Job.status.in_(ACTIVE_STATUSES))
+    stuck = (Processing.query
+             .join(Document, Document.id == Processing.document_id)
+             .filter(Processing.status.in_(('pending', 'processing')),
+                     Processing.started_at >= since,
+                     Document.processed.isnot(True),
+                     Document.prefetched.isnot(True),
+                     Processing.document_id.notin_(active))
+             .all())
+    for processing in stuck:
+        processing.status = 'pending'
+        enqueue('process_document', processing.document_id, priority=PRIORITY_INTERACTIVE)
+    if stuck:
+        logger.info(f"Queued {len(stuck)} interrupted documents again: {[p.document_id for p in stuck]}")
+    return len(stuck)
+
+
+def _worker_loop(worker_id):
+    while not _stop_event.is_set():
+        ran = False
+        try:
+            with app.app_context():
+                try:
+                    ran = run_next_job(worker_id)
+                finally:
+                    db.session.remove()
+        except Exception as e:
+            logger.warning(f"Job worker {worker_id} could not poll the queue: {str(e)}")
+        if not ran:
+            _wake_event.wait(JOB_POLL_SECONDS)
+            _wake_event.clear()
+
+
+def start_job_workers(count=None):
+    """
+    Recover interrupted documents and start the worker threads of this process
+
+    Does nothing if count is 0 or workers already run in this process.
+
+    Args:
+        count (int, optional): Worker threads (defaults to JOB_WORKERS)
+
+    Returns:
+        bool: True if workers were started
+    """
+    count = JOB_WORKERS if count is None else count
+    if count <= 0 or _worker_threads:
+        return False
+
+    with app.app_context():
+        try:
+            recover_orphaned_jobs()
+        except Exception as e:
+            logger.error(f"Could not recover interrupted jobs: {str(e)}")
+            db.session.rollback()
+        finally:
+            db.session.remove()
+
+    _stop_event.clear()
+    prefix = f"{socket.gethostname()}-{os.getpid()}"
+    for index in range(count):
+        thread = threading.Thread(target=_worker_loop, args=(f"{prefix}-{index}",), name=f"job-worker-{index}", daemon=True)
+        thread.start()
+        _worker_threads.append(thread)
+    logger.info(f"Started {count} job workers")
+    return True
+
+
+def stop_job_workers(timeout=None):
+    """Ask the worker threads to stop after their current job and wait for them"""
+    _stop_event.set()
+    _wake_event.set()
+    for thread in _worker_threads:
+        thread.join(timeout)
+    _worker_threads.clear()
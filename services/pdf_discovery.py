@@ -0,0 +1,190 @@
+"""
+Annual report discovery on company websites
+
+Collects every PDF link on a page and ranks the candidates by their link text and
+URL (annual report and 10-K keywords, the most recent year) and by file size. Sizes
+come from HEAD requests sent concurrently through an async client, with a limit per
+site, so only the best candidate is downloaded afterwards instead of whichever PDF
+happened to come first (often a privacy policy).
+"""
+
+import os
+import re
+import asyncio
+import logging
+import datetime
+from urllib.parse import urljoin, urlsplit
+
+import httpx
+from bs4 import BeautifulSoup
+
+logger = logging.getLogger(__name__)
+
+# Best-ranked candidates whose size is checked with a HEAD request
+PDF_DISCOVERY_HEAD_LIMIT = int(os.environ.get('PDF_DISCOVERY_HEAD_LIMIT', 8))
+
+# Concurrent HEAD requests in total and per site
+PDF_DISCOVERY_CONCURRENCY = int(os.environ.get('PDF_DISCOVERY_CONCURRENCY', 8))
+PDF_DISCOVERY_PER_HOST = int(os.environ.get('PDF_DISCOVERY_PER_HOST', 2))
+
+# Seconds to wait for each HEAD request
+PDF_DISCOVERY_TIMEOUT = float(os.environ.get('PDF_DISCOVERY_TIMEOUT', 10))
+
+# Link text and URL keywords, with the score they add
+PDF_KEYWORD_SCORES = [
+    (re.compile(r'annual[\s_-]*report', re.I), 6),
+    (re.compile(r'\b10[\s_-]?k\b', re.I), 5),
+    (re.compile(r'\b20[\s_-]?f\b', re.I), 4),
+    (re.compile(r'integrated[\s_-]*report', re.I), 4),
+    (re.compile(r'financial[\s_-]*(report|statements)', re.I), 3),
+    (re.compile(r'shareholder[\s_-]*letter|letter[\s_-]*to[\s_-]*shareholders', re.I), 1),
+    (re.compile(r'investor', re.I), 1),
+    (re.compile(r'privacy|cookie|terms[\s_-]*(of|and)|conduct|ethics|policy|policies|charter|bylaws', re.I), -8),
+    (re.compile(r'proxy|sustainability|esg|brochure|fact[\s_-]*sheet|presentation', re.I), -3),
+]
+
+_YEAR_RE = re.compile(r'(?<!\d)(20\d{2})(?!\d)')
+
+# Annual reports are rarely smaller than this
+MIN_REPORT_BYTES = 300 * 1024
+
+
+def collect_pdf_links(html, base_url):
+    """
+    Collect the PDF links of a page
+
+    Args:
+        html (str): Page HTML
+        base_url (str): URL of the page, for resolving relative links
+
+    Returns:
+        list: Candidates as dicts with 'url' and 'text', in page order, without duplicates
+    """
+    candidates = {}
+    for link in BeautifulSoup(html, 'html.parser').find_all('a', href=True):
+        url = urljoin(base_url, link['href'].strip())
+        parts = urlsplit(url)
+        if parts.scheme not in ('http', 'https') or not parts.path.lower().endswith('.pdf'):
+            continue
+        url = url.split('#')[0]
+        text = ' '.join(link.get_text(' ', strip=True).split()) or link.get('title', '')
+        if url in candidates:
+            candidates[url]['text'] = f"{candidates[url]['text']} {text}".strip()
+        else:
+            candidates[url] = {'url': url, 'text': text}
+    return list(candidates.values())
+
+
+def candidate_year(candidate, current_year=None):
+    """Most recent year named in a candidate's link text or URL, or None"""
+    current_year = current_year or datetime.date.today().year
+    words = f"{candidate['text']} {urlsplit(candidate['url']).path}"
+    years = [int(year) for year in _YEAR_RE.findall(words) if int(year) <= current_year + 1]
+    return max(years) if years else None
+
+
+def _rank_key(candidate):
+    # Equal scores go to the more recent report
+    return candidate['score'], candidate_year(candidate) or 0
+
+
+def score_candidate(candidate, current_year=None):
+    """
+    Score a candidate by its link text, URL, year and (if known) 'size'
+
+    Returns:
+        float: Higher is more likely the latest annual report
+    """
+    current_year = current_year or datetime.date.today().year
+    words = f"{candidate['text']} {urlsplit(candidate['url']).path}"
+
+    score = sum(points for pattern, points in PDF_KEYWORD_SCORES if pattern.search(words))
+
+    year = candidate_year(candidate, current_year)
+    if year:
+        # Reports are published the year after the fiscal year they cover
+        score += max(0, 4 - (current_year - year))
+
+    size = candidate.get('size')
+    if size is not None:
+        score += 2 if size >= MIN_REPORT_BYTES else -3
+    return score
+
+
+async def _head_sizes(urls, headers, transport):
+    limits = httpx.Limits(max_connections=PDF_DISCOVERY_CONCURRENCY)
+    host_limits = {}
+
+    async with httpx.AsyncClient(headers=headers, timeout=PDF_DISCOVERY_TIMEOUT, limits=limits,
+                                 follow_redirects=True, transport=transport) as client:
+        async def head(url):
+            host = urlsplit(url).netloc.lower()
+            semaphore = host_limits.setdefault(host, asyncio.Semaphore(PDF_DISCOVERY_PER_HOST))
+            async with semaphore:
+                try:
+                    response = await client.head(url)
+                    response.raise_for_status()
+                except httpx.HTTPError as e:
+                    logger.debug(f"HEAD {url} failed: {str(e)}")
+                    return None
+            length = response.headers.get('Content-Length', '')
+            return int(length) if length.isdigit() else None
+
+        return await asyncio.gather(*(head(url) for url in urls))
+
+
+def head_sizes(urls, headers=None, transport=None):
+    """
+    Get the sizes of several URLs with concurrent HEAD requests
+
+    At most PDF_DISCOVERY_CONCURRENCY requests run at once, and at most
+    PDF_DISCOVERY_PER_HOST against the same site.
+
+    Args:
+        urls (list): URLs to check
+        headers (dict, optional): Request headers
+        transport (httpx.AsyncBaseTransport, optional): Custom transport for the client
+
+    Returns:
+        list: Content-Length of each URL, or None if it is unknown or the request failed
+    """
+    if not urls:
+        return []
+    return asyncio.run(_head_sizes(urls, headers, transport))
+
+
+def rank_pdf_links(html, base_url, headers=None, max_bytes=None, transport=None):
+    """
+    Rank the PDF links of a page, best candidate first
+
+    Candidates are first ranked by link text and URL; the best PDF_DISCOVERY_HEAD_LIMIT
+    are then checked for their size and ranked again. Links that look like policies or
+    other boilerplate, and PDFs larger than max_bytes, are left out.
+
+    Args:
+        html (str): Page HTML
+        base_url (str): URL of the page
+        headers (dict, optional): Headers for the HEAD requests
+        max_bytes (int, optional): Largest PDF worth downloading
+        transport (httpx.AsyncBaseTransport, optional): See head_sizes
+
+    Returns:
+        list: Candidates with 'url', 'text', 'size' and 'score'
+    """
+    candidates = collect_pdf_links(html, base_url)
+    for candidate in candidates:
+        candidate['size'] = None
+        candidate['score'] = score_candidate(candidate)
+    candidates = sorted((c for c in candidates if c['score'] >= 0), key=_rank_key, reverse=True)
+
+    checked = candidates[:PDF_DISCOVERY_HEAD_LIMIT]
+    for candidate, size in zip(checked, head_sizes([c['url'] for c in checked], headers, transport)):
+        candidate['size'] = size
+        candidate['score'] = score_candidate(candidate)
+    if max_bytes:
+        candidates = [c for c in candidates if c['size'] is None or c['size'] <= max_bytes]
+
+    candidates.sort(key=_rank_key, reverse=True)
+    logger.info(f"Ranked {len(candidates)} PDF links on {base_url}: "
+                f"{[(c['url'], c['score']) for c in candidates[:3]]}")
+    return candidates
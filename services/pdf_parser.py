@@ -3,69 +3,90 @@ import logging
 import tempfile
 import time
 import threading
+import contextlib
 import concurrent.futures
 from functools import lru_cache
 from tqdm import tqdm
 import PyPDF2
-from langchain_community.document_loaders import PyPDFLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+from services.extraction_metrics import ExtractionMetrics, register_run
+from services.cancellation import ProcessingCancelled
 
 logger = logging.getLogger(__name__)
 
-# Page extraction statistics for monitoring processing time
-page_processing_times = {}
+# Extraction budgets, so a single huge upload cannot exhaust the worker's memory.
+# Extraction stops early (keeping the pages read so far) once either is reached.
+PDF_EXTRACTION_CHAR_BUDGET = int(os.environ.get('PDF_EXTRACTION_CHAR_BUDGET', 2000000))
+PDF_EXTRACTION_MEMORY_BUDGET_MB = int(os.environ.get('PDF_EXTRACTION_MEMORY_BUDGET_MB', 256))
 
-def extract_pdf_content(pdf_path):
+# Number of pages in flight per worker; pages are submitted in windows of this size
+# times the worker count instead of all at once
+PAGES_PER_WORKER_WINDOW = 2
+
+def extract_pdf_content(pdf_path, metrics=None, progress_callback=None):
     """
-    Extract text content from a PDF file using PyPDF2 for large files or LangChain for smaller files
+    Extract text content from a PDF file using PyPDF2
+    Large and medium files are sampled, smaller files are read in full
+    Extraction stops early once the character or memory budget is reached
     Returns a string containing the extracted text
+    
+    Args:
+        pdf_path (str or file): Path to the PDF file, or a seekable binary file object
+            (e.g. io.BytesIO or mmap) holding the PDF
+        metrics (ExtractionMetrics, optional): Collector for per-page timings and errors.
+            A new one is created (and registered for the metrics endpoint) if not given.
+        progress_callback (callable, optional): Called as progress_callback(pages_done, pages_total)
+            after each window of pages is extracted; raising ProcessingCancelled from it
+            stops extraction
     """
+    if metrics is None:
+        metrics = ExtractionMetrics(source=pdf_source_name(pdf_path))
+    if metrics.run_id is None:
+        register_run(metrics)
+    
     try:
         start_time = time.time()
         
         # First, verify the PDF is valid
-        num_pages = validate_pdf(pdf_path)
+        if isinstance(pdf_path, (str, os.PathLike)):
+            num_pages = validate_pdf(pdf_path)
+        else:
+            num_pages = count_pdf_pages(pdf_path)
+        metrics.total_pages = num_pages
         
         # For very large PDFs (over 100 pages), use fast extraction with page sampling
         # This will sample important pages rather than process the entire document
         if num_pages > 100:
             logger.info(f"Large PDF detected ({num_pages} pages). Using optimized extraction.")
-            content = extract_pdf_content_fast_parallel(pdf_path, num_pages)
+            metrics.mode = 'fast'
+            content = extract_pdf_content_fast_parallel(pdf_path, num_pages, metrics, progress_callback)
         
         # For medium-sized PDFs (30-100 pages), use a hybrid approach for better performance
         elif num_pages > 30:
             logger.info(f"Medium-sized PDF detected ({num_pages} pages). Using semi-optimized extraction.")
-            content = extract_pdf_content_medium_parallel(pdf_path, num_pages)
+            metrics.mode = 'medium'
+            content = extract_pdf_content_medium_parallel(pdf_path, num_pages, metrics, progress_callback)
         
-        # For smaller PDFs, use LangChain's PyPDFLoader
+        # For smaller PDFs, read every page with the same page engine
         else:
             logger.info(f"Small PDF detected ({num_pages} pages). Using comprehensive extraction.")
-            loader = PyPDFLoader(pdf_path)
-            documents = loader.load()
-            
-            # Split into smaller chunks if needed - increase chunk size for better performance
-            text_splitter = RecursiveCharacterTextSplitter(
-                chunk_size=3000,  # Larger chunks for better performance
-                chunk_overlap=150  # Smaller overlap
-            )
-            
-            # Get all chunks
-            all_splits = text_splitter.split_documents(documents)
-            
-            # Combine all text
-            content = ' '.join([doc.page_content for doc in all_splits])
+            metrics.mode = 'full'
+            content = extract_pdf_content_full(pdf_path, num_pages, metrics, progress_callback)
         
         end_time = time.time()
         logger.info(f"PDF processing took {end_time - start_time:.2f} seconds for {num_pages} pages")
         
         return content
         
+    except ProcessingCancelled:
+        raise
     except Exception as e:
-        logger.error(f"Error extracting content from PDF {pdf_path}: {str(e)}")
+        logger.error(f"Error extracting content from PDF {pdf_source_name(pdf_path)}: {str(e)}")
         raise Exception(f"Failed to extract content from PDF: {str(e)}")
+    finally:
+        metrics.finish()
 
 
-def extract_pdf_content_fast_parallel(pdf_path, total_pages):
+def extract_pdf_content_fast_parallel(pdf_path, total_pages, metrics=None, progress_callback=None):
     """
     Extract content from a large PDF by sampling key pages only
     Uses parallel processing for better performance
@@ -75,13 +96,25 @@ def extract_pdf_content_fast_parallel(pdf_path, total_pages):
         pages_to_extract = select_pages_to_extract(total_pages, 'fast')
         
         # Use parallel processing to extract text from pages
-        return extract_pages_parallel(pdf_path, pages_to_extract, total_pages)
+        return extract_pages_parallel(pdf_path, pages_to_extract, total_pages, metrics, progress_callback)
             
     except Exception as e:
-        logger.error(f"Error extracting content from PDF {pdf_path}: {str(e)}")
+        logger.error(f"Error extracting content from PDF {pdf_source_name(pdf_path)}: {str(e)}")
         raise Exception(f"Failed to extract content from PDF: {str(e)}")
 
-def extract_pdf_content_medium_parallel(pdf_path, total_pages):
+def extract_pdf_content_full(pdf_path, total_pages, metrics=None, progress_callback=None):
+    """
+    Extract content from every page of a small PDF
+    Uses the same parallel page engine as the sampled modes
+    """
+    try:
+        return extract_pages_parallel(pdf_path, list(range(total_pages)), total_pages, metrics, progress_callback)
+            
+    except Exception as e:
+        logger.error(f"Error extracting content from PDF {pdf_source_name(pdf_path)}: {str(e)}")
+        raise Exception(f"Failed to extract content from PDF: {str(e)}")
+
+def extract_pdf_content_medium_parallel(pdf_path, total_pages, metrics=None, progress_callback=None):
     """
     Extract content from a medium-sized PDF by processing key pages and sampling others
     Uses parallel processing for better performance
@@ -91,10 +124,10 @@ def extract_pdf_content_medium_parallel(pdf_path, total_pages):
         pages_to_extract = select_pages_to_extract(total_pages, 'medium')
         
         # Use parallel processing to extract text from pages
-        return extract_pages_parallel(pdf_path, pages_to_extract, total_pages)
+        return extract_pages_parallel(pdf_path, pages_to_extract, total_pages, metrics, progress_callback)
             
     except Exception as e:
-        logger.error(f"Error extracting content from PDF {pdf_path}: {str(e)}")
+        logger.error(f"Error extracting content from PDF {pdf_source_name(pdf_path)}: {str(e)}")
         raise Exception(f"Failed to extract content from PDF: {str(e)}")
 
 def select_pages_to_extract(total_pages, mode='medium'):
@@ -165,21 +198,37 @@ def select_pages_to_extract(total_pages, mode='medium'):
     # Remove duplicates and sort
     return sorted(set(pages_to_extract))
 
-def extract_pages_parallel(pdf_path, pages_to_extract, total_pages):
+def extract_pages_parallel(pdf_path, pages_to_extract, total_pages, metrics=None, progress_callback=None,
+                           char_budget=None, memory_budget_mb=None):
     """
     Extract text from pages using parallel processing
     
+    Pages are submitted in bounded windows, in page order, so only a few pages are
+    in flight at once. After each window the character and memory budgets are checked
+    and extraction stops early if either has been reached.
+    
     Args:
-        pdf_path (str): Path to the PDF file
+        pdf_path (str or file): Path to the PDF file, or a seekable binary file object
         pages_to_extract (list): List of page numbers to extract
         total_pages (int): Total number of pages in the document
+        metrics (ExtractionMetrics, optional): Collector for per-page timings and errors
+        progress_callback (callable, optional): Called as progress_callback(pages_done, pages_total)
+        char_budget (int, optional): Maximum characters to extract (defaults to PDF_EXTRACTION_CHAR_BUDGET)
+        memory_budget_mb (int, optional): Maximum resident memory growth in MB during extraction
+            (defaults to PDF_EXTRACTION_MEMORY_BUDGET_MB)
         
     Returns:
         str: Extracted text
     """
+    if char_budget is None:
+        char_budget = PDF_EXTRACTION_CHAR_BUDGET
+    if memory_budget_mb is None:
+        memory_budget_mb = PDF_EXTRACTION_MEMORY_BUDGET_MB
+    
     # Open PDF file once and keep it open for all workers
-    with open(pdf_path, 'rb') as f:
+    with open_pdf(pdf_path) as f:
         reader = PyPDF2.PdfReader(f)
+        pages = sorted(i for i in set(pages_to_extract) if i < len(reader.pages))
         
         # Determine the appropriate number of workers based on system and document size
         # For very large documents, use fewer workers to avoid memory issues
@@ -187,56 +236,132 @@ def extract_pages_parallel(pdf_path, pages_to_extract, total_pages):
             max_workers = min(4, os.cpu_count() or 4)
         else:
             max_workers = min(6, os.cpu_count() or 4)
+        window_size = max_workers * PAGES_PER_WORKER_WINDOW
+        
+        start_rss_mb = get_resident_memory_mb()
+        page_texts = {}
+        total_chars = 0
+        pages_done = 0
+        stop_reason = None
+        
+        if progress_callback:
+            progress_callback(0, len(pages))
         
-        # Extract text using parallel processing
-        content = []
         with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-            # Submit extraction jobs for each page
-            future_to_page = {
-                executor.submit(extract_page_text, reader, i): i 
-                for i in pages_to_extract if i < len(reader.pages)
-            }
-            
-            # Process completed pages
-            for future in concurrent.futures.as_completed(future_to_page):
-                page_num = future_to_page[future]
-                try:
-                    page_text = future.result()
+            for window_start in range(0, len(pages), window_size):
+                window = pages[window_start:window_start + window_size]
+                
+                # Submit extraction jobs for this window only
+                future_to_page = {
+                    executor.submit(extract_page_text, reader, i, metrics): i 
+                    for i in window
+                }
+                
+                # Pages complete out of order, so collect them by page number first
+                window_texts = {}
+                for future in concurrent.futures.as_completed(future_to_page):
+                    page_num = future_to_page[future]
+                    try:
+                        page_text = future.result()
+                        if page_text:
+                            window_texts[page_num] = page_text
+                    except Exception as e:
+                        logger.warning(f"Error extracting page {page_num}: {str(e)}")
+                        if metrics:
+                            metrics.record_error(page_num, e)
+                
+                # Keep pages in order up to the character budget
+                for page_num in sorted(window_texts):
+                    page_text = window_texts[page_num]
+                    if total_chars + len(page_text) > char_budget:
+                        page_text = page_text[:char_budget - total_chars]
+                        stop_reason = 'char_budget'
                     if page_text:
-                        content.append(f"[Page {page_num + 1}]\n{page_text}")
-                except Exception as e:
-                    logger.warning(f"Error extracting page {page_num}: {str(e)}")
+                        page_texts[page_num] = page_text
+                        total_chars += len(page_text)
+                    if stop_reason:
+                        break
+                
+                pages_done += len(window)
+                if progress_callback:
+                    progress_callback(pages_done, len(pages))
+                
+                if not stop_reason and start_rss_mb is not None and pages_done < len(pages):
+                    current_rss_mb = get_resident_memory_mb()
+                    if current_rss_mb is not None and current_rss_mb - start_rss_mb > memory_budget_mb:
+                        stop_reason = 'memory_budget'
+                
+                if stop_reason:
+                    break
         
-        # Join all extracted text
-        text = "\n\n".join(content)
+        if stop_reason:
+            logger.warning(
+                f"Stopped extraction of {pdf_source_name(pdf_path)} early ({stop_reason}) "
+                f"after {pages_done} of {len(pages)} pages, {total_chars} characters"
+            )
+            if metrics:
+                metrics.stop_reason = stop_reason
+        
+        # Join all extracted text in page order
+        text = "\n\n".join(
+            f"[Page {page_num + 1}]\n{page_texts[page_num]}" for page_num in sorted(page_texts)
+        )
         
-        logger.info(f"Successfully extracted content from {len(pages_to_extract)} pages out of {total_pages}")
+        logger.info(f"Successfully extracted content from {pages_done} pages out of {total_pages}")
         return text
 
-def extract_page_text(reader, page_num):
+def open_pdf(pdf_path):
+    """Open a PDF path for reading; a file object is used as is and left open"""
+    if isinstance(pdf_path, (str, os.PathLike)):
+        return open(pdf_path, 'rb')
+    pdf_path.seek(0)
+    return contextlib.nullcontext(pdf_path)
+
+def pdf_source_name(pdf_path):
+    """Name of a PDF path or file object for logs and metrics"""
+    if isinstance(pdf_path, (str, os.PathLike)):
+        return os.path.basename(pdf_path)
+    return getattr(pdf_path, 'name', None) or 'in-memory PDF'
+
+def get_resident_memory_mb():
+    """
+    Return the resident memory of this process in MB, or None if it cannot be read
+    Reads /proc/self/statm, which is available on the Linux hosts we deploy to
+    """
+    try:
+        with open('/proc/self/statm') as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+def extract_page_text(reader, page_num, metrics=None):
     """
     Extract text from a single page
     
     Args:
         reader (PdfReader): PyPDF2 reader object
         page_num (int): Page number to extract
+        metrics (ExtractionMetrics, optional): Collector for per-page timings and errors
         
     Returns:
         str: Extracted text
     """
-    start_time = time.time()
+    start_time = time.perf_counter()
     try:
         page = reader.pages[page_num]
         text = page.extract_text()
         
         # Track processing time for performance monitoring
-        end_time = time.time()
-        processing_time = end_time - start_time
-        page_processing_times[page_num] = processing_time
+        if metrics:
+            metrics.record_page(page_num, time.perf_counter() - start_time, len(text or ""))
         
         return text
     except Exception as e:
         logger.warning(f"Failed to extract text from page {page_num}: {str(e)}")
+        if metrics:
+            metrics.record_page(page_num, time.perf_counter() - start_time)
+            metrics.record_error(page_num, e)
         return ""
 
 @lru_cache(maxsize=16)
@@ -247,12 +372,24 @@ def validate_pdf(pdf_path):
     Uses LRU cache to avoid repeatedly validating the same file
     """
     try:
-        with open(pdf_path, 'rb') as f:
-            reader = PyPDF2.PdfReader(f)
-            num_pages = len(reader.pages)
-            if num_pages == 0:
-                raise ValueError("PDF file has no pages")
-            return num_pages
+        f = open(pdf_path, 'rb')
+    except OSError as e:
+        raise ValueError(f"PDF validation error: {str(e)}")
+    with f:
+        return count_pdf_pages(f)
+
+def count_pdf_pages(stream):
+    """
+    Validate that a binary file object holds a readable PDF
+    Returns the number of pages in the PDF
+    """
+    try:
+        stream.seek(0)
+        reader = PyPDF2.PdfReader(stream)
+        num_pages = len(reader.pages)
+        if num_pages == 0:
+            raise ValueError("PDF file has no pages")
+        return num_pages
     except PyPDF2.errors.PdfReadError:
         raise ValueError("Invalid or corrupted PDF file")
     except Exception as e:
@@ -0,0 +1,187 @@
+"""
+Checkpointed stages of the document processing pipeline
+
+process_document runs a document through these stages, each stored as a
+PipelineStage row with its status and output:
+
+    fetch               Source of the document: the uploaded PDF path or the resolved filing URL
+    extract             Content hash of the extracted text, kept compressed by services.text_store
+    index               Financial context for the prompts: PDF statement tables or XBRL facts (JSON)
+    analyze:<category>  One row per insight category, stored as soon as the AI call returns
+    persist             Insights saved and the document marked processed
+
+A completed stage is not run again: a retried job reuses the text and the insights
+finished by the failed attempt and only generates the categories still missing, and
+regenerating an insight reads the stored text instead of downloading and parsing the
+document again.
+"""
+
+import json
+import logging
+import datetime
+
+from app import db
+from models import PipelineStage
+from services.ai_service import is_error_insight
+
+logger = logging.getLogger(__name__)
+
+STAGE_FETCH = 'fetch'
+STAGE_EXTRACT = 'extract'
+STAGE_INDEX = 'index'
+STAGE_PERSIST = 'persist'
+ANALYZE_PREFIX = 'analyze:'
+
+
+def analyze_stage(category):
+    """Stage name of an insight category"""
+    return f"{ANALYZE_PREFIX}{category}"
+
+
+def get_stage(document_id, name):
+    return PipelineStage.query.filter_by(document_id=document_id, stage=name).first()
+
+
+def get_stages(document_id):
+    """Return the stages recorded for a document, in the order they ran"""
+    return PipelineStage.query.filter_by(document_id=document_id).order_by(PipelineStage.id).all()
+
+
+def completed_output(document_id, name, as_json=False):
+    """
+    Get the stored output of a completed stage
+
+    Returns:
+        The output (decoded from JSON if as_json), or None if the stage has not completed
+    """
+    stage = get_stage(document_id, name)
+    if stage is None or stage.status != 'completed':
+        return None
+    return json.loads(stage.output) if as_json else stage.output
+
+
+def record_stage(document_id, name, status, output=None, error=None):
+    """Create or update a stage and commit it"""
+    stage = get_stage(document_id, name) or PipelineStage(document_id=document_id, stage=name, attempts=0)
+    now = datetime.datetime.utcnow()
+    stage.status = status
+    stage.output = output
+    stage.error = error
+    stage.attempts = (stage.attempts or 0) + 1
+    stage.started_at = stage.started_at or now
+    stage.completed_at = now if status == 'completed' else None
+    db.session.add(stage)
+    db.session.commit()
+    return stage
+
+
+def reset_stage(document_id, name):
+    """Mark a stage pending again, so the next run_stage computes it anew"""
+    stage = get_stage(document_id, name)
+    if stage is not None:
+        stage.status = 'pending'
+        stage.output = None
+        stage.completed_at = None
+        db.session.commit()
+
+
+def run_stage(document_id, name, func, as_json=False):
+    """
+    Run a stage once and store its output
+
+    If the stage already completed (in an earlier attempt), its stored output is
+    returned without calling func. Otherwise func is called and its result stored; an
+    exception marks the stage failed and is raised again.
+
+    Args:
+        document_id (int): Document being processed
+        name (str): Stage name (see STAGE_FETCH and friends)
+        func (callable): Computes the output; must return a string unless as_json
+        as_json (bool): Store the output as JSON (for None, dicts and lists)
+
+    Returns:
+        The stage output
+    """
+    stage = get_stage(document_id, name)
+    if stage is not None and stage.status == 'completed':
+        logger.info(f"Reusing the {name} stage of document {document_id} from attempt {stage.attempts}")
+        return json.loads(stage.output) if as_json else stage.output
+
+    stage = stage or PipelineStage(document_id=document_id, stage=name, attempts=0)
+    stage.status = 'running'
+    stage.error = None
+    stage.attempts = (stage.attempts or 0) + 1
+    stage.started_at = datetime.datetime.utcnow()
+    db.session.add(stage)
+    db.session.commit()
+    stage_id = stage.id
+
+    try:
+        output = func()
+    except Exception as e:
+        db.session.rollback()
+        stage = PipelineStage.query.get(stage_id)
+        stage.status = 'failed'
+        stage.error = str(e)
+        db.session.commit()
+        raise
+
+    stage = PipelineStage.query.get(stage_id)
+    stage.status = 'completed'
+    stage.output = json.dumps(output) if as_json else output
+    stage.completed_at = datetime.datetime.utcnow()
+    db.session.commit()
+    return output
+
+
+def completed_insights(document_id, categories):
+    """
+    Get the insights of the categories whose analyze stage completed
+
+    Returns:
+        dict: Insight content by category
+    """
+    names = {analyze_stage(category): category for category in categories}
+    stages = (PipelineStage.query
+              .filter(PipelineStage.document_id == document_id,
+                      PipelineStage.stage.in_(list(names)),
+                      PipelineStage.status == 'completed')
+              .all())
+    return {names[stage.stage]: stage.output for stage in stages}
+
+
+def insight_recorder(document_id):
+    """
+    Build an on_insight callback for generate_insights that stores each category as it finishes
+
+    Recording errors are logged, never raised, so they cannot fail the analysis.
+    """
+    def record(category, content):
+        try:
+            record_stage(document_id, analyze_stage(category), 'completed', output=content)
+        except Exception as e:
+            logger.warning(f"Could not store the {category} insight of document {document_id}: {str(e)}")
+            db.session.rollback()
+    return record
+
+
+def record_insights(document_id, insights, overwrite=False):
+    """
+    Store analyze stages for insights not recorded yet
+
+    Placeholders for failed AI calls (see ai_service.is_error_insight) are stored as
+    failed stages, so the next attempt generates those categories again.
+
+    Args:
+        document_id (int): Analyzed document
+        insights (dict): Insight content by category
+        overwrite (bool): Replace completed stages too (for regenerated insights)
+    """
+    done = completed_insights(document_id, insights)
+    for category, content in insights.items():
+        if is_error_insight(content):
+            # A failed regeneration keeps the earlier insight
+            if category not in done:
+                record_stage(document_id, analyze_stage(category), 'failed', error=content)
+        elif overwrite or category not in done:
+            record_stage(document_id, analyze_stage(category), 'completed', output=content)
@@ -0,0 +1,228 @@
+"""
+Watchlist prefetch for SEC filings
+
+Checks a watchlist of companies for new 10-K, 10-K/A and 10-Q filings, downloads and
+extracts them, builds their section index and analyzes them ahead of time. The analysis
+warms the AI response cache and leaves a processed document behind, so opening a watched
+company's latest 10-K redirects straight to its insights. When an earlier filing of the
+same kind has been analyzed, only the insights whose sections changed are regenerated
+(see services.filing_watcher).
+
+Run it once (e.g. from a nightly cron job) with:
+    python -m services.prefetch
+
+or let the web app run it periodically by setting PREFETCH_INTERVAL_HOURS.
+"""
+
+import os
+import time
+import logging
+import datetime
+import threading
+
+import portalocker
+
+from app import app, db
+from models import Document, Processing
+from services.cache_service import disk_cache, CACHE_DIR
+from services.demo_service import SEC_QUICK_ACCESS
+from services.edgar_service import get_submissions, list_filings, resolve_filing_document, get_filing_text, get_filing_sections
+from services.document_processor import process_document
+from services.filing_watcher import find_base_document, analyze_incrementally
+
+logger = logging.getLogger(__name__)
+
+# CIKs to prefetch (comma separated); defaults to the quick-access companies
+PREFETCH_WATCHLIST = [
+    cik.strip() for cik in os.environ.get('PREFETCH_WATCHLIST', '').split(',') if cik.strip()
+] or [company['cik'] for company in SEC_QUICK_ACCESS]
+
+# Form types checked for new filings
+PREFETCH_FORMS = tuple(
+    form.strip() for form in os.environ.get('PREFETCH_FORMS', '10-K,10-K/A,10-Q').split(',') if form.strip()
+)
+
+# Run AI analysis of new filings (uses API budget); otherwise only text and sections are prepared
+PREFETCH_ANALYZE = os.environ.get('PREFETCH_ANALYZE', 'true').lower() == 'true'
+
+# Hours between runs of the in-app scheduler; 0 disables it
+PREFETCH_INTERVAL_HOURS = float(os.environ.get('PREFETCH_INTERVAL_HOURS', 0))
+
+PREFETCH_LOCK_PATH = os.path.join(CACHE_DIR, 'prefetch.lock')
+LAST_RUN_KEY = 'prefetch:last_run'
+
+_scheduler_thread = None
+
+
+def find_prefetched_document(url):
+    """
+    Find a processed, prefetched document for a filing URL
+
+    Returns:
+        Document or None: The most recent prefetched analysis of the filing
+    """
+    return (Document.query
+            .filter_by(url=url, prefetched=True, processed=True)
+            .order_by(Document.created_at.desc())
+            .first())
+
+
+def latest_filings(cik, forms=PREFETCH_FORMS):
+    """
+    Get the most recent filing of each form type for a company
+
+    Returns:
+        list: Filings (see edgar_service.list_filings) with their document 'url'
+    """
+    recent = get_submissions(cik).get('filings', {}).get('recent', {})
+    latest = {}
+    for filing in list_filings(recent, forms):
+        if filing['form_type'] not in latest:
+            latest[filing['form_type']] = dict(filing, url=resolve_filing_document(cik, filing))
+
+    # An amendment only matters if it amends the latest annual report
+    amendment, annual = latest.get('10-K/A'), latest.get('10-K')
+    if amendment and annual and amendment['filing_date'] < annual['filing_date']:
+        del latest['10-K/A']
+    return list(latest.values())
+
+
+def prefetch_filing(cik, company_name, filing, analyze=PREFETCH_ANALYZE):
+    """
+    Prepare one filing: extract its text, index its sections and optionally analyze it
+
+    Args:
+        cik (str): Company CIK
+        company_name (str): Company name for the document title
+        filing (dict): Filing from latest_filings
+        analyze (bool): Create and process a prefetched document
+
+    Returns:
+        str: 'current' if it was already prepared, 'extracted', 'updated' (incrementally
+            from an earlier analysis) or 'analyzed'
+    """
+    url = filing['url']
+    if find_prefetched_document(url) or (not analyze and disk_cache.get(f"filing_sections:{url}") is not None):
+        return 'current'
+
+    text = get_filing_text(url)
+    sections = get_filing_sections(url, filing['form_type'])
+    logger.info(f"Prefetched {filing['form_type']} {filing['accession_number']} for CIK {cik}: "
+                f"{len(text)} characters, {len(sections)} sections")
+    if not analyze:
+        return 'extracted'
+
+    base_document = find_base_document(cik, filing)
+    if base_document:
+        analyze_incrementally(cik, company_name, filing, base_document, prefetched=True)
+        return 'updated'
+
+    document = Document(
+        url=url,
+        content_type='edgar',
+        title=f"{filing['form_type']} Filing: {company_name}",
+        company_name=company_name,
+        cik=cik,
+        accession_number=filing['accession_number'],
+        filing_date=datetime.date.fromisoformat(filing['filing_date']),
+        form_type=filing['form_type'],
+        prefetched=True
+    )
+    db.session.add(document)
+    db.session.commit()
+    db.session.add(Processing(document_id=document.id))
+    db.session.commit()
+
+    if not process_document(document.id):
+        raise ValueError(f"Analysis of prefetched document {document.id} failed")
+    return 'analyzed'
+
+
+def run_prefetch(watchlist=None, forms=None, analyze=None):
+    """
+    Prefetch the latest filings of every company on the watchlist
+
+    Must run inside the Flask app context.
+
+    Args:
+        watchlist (list, optional): CIKs (defaults to PREFETCH_WATCHLIST)
+        forms (tuple, optional): Form types (defaults to PREFETCH_FORMS)
+        analyze (bool, optional): See prefetch_filing (defaults to PREFETCH_ANALYZE)
+
+    Returns:
+        dict: Counts of 'current', 'extracted', 'updated', 'analyzed' and 'failed' filings
+    """
+    watchlist = watchlist or PREFETCH_WATCHLIST
+    forms = forms or PREFETCH_FORMS
+    analyze = PREFETCH_ANALYZE if analyze is None else analyze
+
+    summary = {'current': 0, 'extracted': 0, 'updated': 0, 'analyzed': 0, 'failed': 0}
+    start_time = time.time()
+    for cik in watchlist:
+        try:
+            company_name = get_submissions(cik).get('name') or f"Company CIK: {cik}"
+            filings = latest_filings(cik, forms)
+        except Exception as e:
+            logger.error(f"Prefetch could not list filings for CIK {cik}: {str(e)}")
+            summary['failed'] += 1
+            continue
+
+        for filing in filings:
+            try:
+                summary[prefetch_filing(cik, company_name, filing, analyze)] += 1
+            except Exception as e:
+                logger.error(f"Prefetch of {filing['accession_number']} for CIK {cik} failed: {str(e)}")
+                db.session.rollback()
+                summary['failed'] += 1
+
+    disk_cache.set(LAST_RUN_KEY, time.time())
+    logger.info(f"Prefetch finished in {time.time() - start_time:.1f} seconds: {summary}")
+    return summary
+
+
+def _scheduler_loop(interval_hours):
+    interval = interval_hours * 3600
+    while True:
+        last_run = disk_cache.get(LAST_RUN_KEY) or 0
+        wait = last_run + interval - time.time()
+        if wait > 0:
+            time.sleep(min(wait, interval))
+            continue
+        try:
+            # Only one process on the host runs the job; the others skip this round
+            with portalocker.Lock(PREFETCH_LOCK_PATH, timeout=0, fail_when_locked=True):
+                with app.app_context():
+                    try:
+                        run_prefetch()
+                    finally:
+                        db.session.remove()
+        except portalocker.exceptions.LockException:
+            time.sleep(60)
+        except Exception as e:
+            logger.error(f"Scheduled prefetch failed: {str(e)}")
+            disk_cache.set(LAST_RUN_KEY, time.time())
+
+
+def start_prefetch_scheduler(interval_hours=None):
+    """
+    Run the prefetch job every interval_hours in a background thread
+
+    Does nothing if the interval is 0 or a scheduler already runs in this process.
+
+    Returns:
+        bool: True if a scheduler thread was started
+    """
+    global _scheduler_thread
+    interval_hours = PREFETCH_INTERVAL_HOURS if interval_hours is None else interval_hours
+    if interval_hours <= 0 or _scheduler_thread is not None:
+        return False
+    _scheduler_thread = threading.Thread(target=_scheduler_loop, args=(interval_hours,), daemon=True)
+    _scheduler_thread.start()
+    logger.info(f"Prefetch scheduler started for {len(PREFETCH_WATCHLIST)} companies every {interval_hours:g} hours")
+    return True
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    with app.app_context():
+        print(run_prefetch())
@@ -0,0 +1,162 @@
+"""
+Token-bucket rate limiting shared across threads and processes
+
+The bucket state (available tokens and the time it was last updated) lives in a small
+file guarded by an exclusive file lock, so every gunicorn worker on the host draws from
+the same budget. Callers reserve a token and sleep until it is due rather than failing,
+which keeps requests queued in arrival order.
+"""
+
+import os
+import time
+import struct
+import logging
+import tempfile
+import threading
+from collections import deque
+
+try:
+    import portalocker
+    PORTALOCKER_AVAILABLE = True
+except ImportError:
+    PORTALOCKER_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Bucket state on disk: available tokens, last update time (wall clock, shared by processes)
+_STATE_FORMAT = 'dd'
+_STATE_SIZE = struct.calcsize(_STATE_FORMAT)
+
+# Number of recent waits kept for the percentile in the stats
+MAX_RECENT_WAITS = 1000
+
+# Waits longer than this are logged, since they mean the limiter is saturated
+SLOW_WAIT_SECONDS = 2.0
+
+
+class TokenBucket:
+    """
+    Token bucket refilled at `rate` tokens per second up to `capacity` tokens
+
+    With a state file the budget is shared by every process using the same path;
+    without one (or without portalocker) it is shared by the threads of this process only.
+    """
+
+    def __init__(self, name, rate, capacity, state_path=None):
+        self.name = name
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self.state_path = state_path if PORTALOCKER_AVAILABLE else None
+        self._lock = threading.Lock()
+        self._local_state = (self.capacity, time.time())
+
+        # Wait statistics for this process
+        self._stats_lock = threading.Lock()
+        self._requests = 0
+        self._waited_requests = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+        self._recent_waits = deque(maxlen=MAX_RECENT_WAITS)
+
+    def acquire(self):
+        """
+        Take one token, sleeping until it is available
+
+        Returns:
+            float: Seconds spent waiting
+        """
+        with self._lock:
+            if self.state_path:
+                wait = self._reserve_shared()
+            else:
+                wait = self._reserve_local()
+
+        if wait > 0:
+            if wait >= SLOW_WAIT_SECONDS:
+                logger.warning(f"Rate limiter '{self.name}' is saturated, waiting {wait:.2f}s")
+            time.sleep(wait)
+
+        self._record_wait(wait)
+        return wait
+
+    def _reserve(self, tokens, updated_at, now):
+        """Refill the bucket and reserve one token; returns the new state and the wait"""
+        tokens = min(self.capacity, tokens + max(now - updated_at, 0.0) * self.rate)
+        tokens -= 1.0
+        # A negative balance is a queue of reservations, each due 1/rate seconds apart
+        wait = -tokens / self.rate if tokens < 0 else 0.0
+        return (tokens, now), wait
+
+    def _reserve_local(self):
+        tokens, updated_at = self._local_state
+        self._local_state, wait = self._reserve(tokens, updated_at, time.time())
+        return wait
+
+    def _reserve_shared(self):
+        try:
+            with open(self.state_path, 'a+b') as f:
+                portalocker.lock(f, portalocker.LOCK_EX)
+                try:
+                    f.seek(0)
+                    data = f.read(_STATE_SIZE)
+                    if len(data) == _STATE_SIZE:
+                        tokens, updated_at = struct.unpack(_STATE_FORMAT, data)
+                    else:
+                        tokens, updated_at = self.capacity, time.time()
+
+                    state, wait = self._reserve(tokens, updated_at, time.time())
+
+                    f.seek(0)
+                    f.truncate()
+                    f.write(struct.pack(_STATE_FORMAT, *state))
+                    f.flush()
+                finally:
+                    portalocker.unlock(f)
+            return wait
+        except OSError as e:
+            # Fall back to the in-process bucket rather than failing the request
+            logger.warning(f"Rate limiter state file {self.state_path} unavailable: {str(e)}")
+            return self._reserve_local()
+
+    def _record_wait(self, wait):
+        with self._stats_lock:
+            self._requests += 1
+            if wait > 0:
+                self._waited_requests += 1
+                self._total_wait += wait
+                self._max_wait = max(self._max_wait, wait)
+            self._recent_waits.append(wait)
+
+    def stats(self):
+        """
+        Wait-time statistics for this process
+
+        Returns:
+            dict: Configuration, request counts and wait times in milliseconds
+        """
+        with self._stats_lock:
+            recent = sorted(self._recent_waits)
+            requests = self._requests
+            waited = self._waited_requests
+            total_wait = self._total_wait
+            max_wait = self._max_wait
+
+        p95 = recent[min(int(len(recent) * 0.95), len(recent) - 1)] if recent else 0.0
+        return {
+            'name': self.name,
+            'rate_per_second': self.rate,
+            'burst': self.capacity,
+            'shared_across_processes': bool(self.state_path),
+            'pid': os.getpid(),
+            'requests': requests,
+            'waited_requests': waited,
+            'total_wait_ms': round(total_wait * 1000, 1),
+            'mean_wait_ms': round(total_wait / requests * 1000, 2) if requests else 0.0,
+            'p95_wait_ms': round(p95 * 1000, 2),
+            'max_wait_ms': round(max_wait * 1000, 2),
+        }
+
+
+def default_state_path(name):
+    """Path of the shared state file for a named bucket, in the system temp directory"""
+    return os.path.join(tempfile.gettempdir(), f'insightlens_{name}_rate.bucket')
@@ -0,0 +1,100 @@
+"""
+Compressed store of extracted document text
+
+The text of a document is extracted once, by the extract stage of the pipeline, and
+stored as a DocumentText row: zstd-compressed UTF-8 (zlib when zstandard is not
+installed) keyed by the document and the SHA-256 of the text. The extract stage
+records the hash, so retries and regenerated insights read exactly the text that was
+analyzed instead of downloading or parsing the document again.
+"""
+
+import os
+import zlib
+import hashlib
+import logging
+
+from app import db
+from models import DocumentText
+
+try:
+    import zstandard
+    ZSTANDARD_AVAILABLE = True
+except ImportError:
+    ZSTANDARD_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# zstd compression level for stored text (1-22); text is written once and read many times
+TEXT_ZSTD_LEVEL = int(os.environ.get('TEXT_ZSTD_LEVEL', 10))
+
+
+def content_hash(text):
+    """SHA-256 hex digest of the UTF-8 text"""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def compress_text(text):
+    """
+    Compress text for storage
+
+    Returns:
+        tuple: (codec, compressed bytes)
+    """
+    raw = text.encode('utf-8')
+    if ZSTANDARD_AVAILABLE:
+        return 'zstd', zstandard.ZstdCompressor(level=TEXT_ZSTD_LEVEL).compress(raw)
+    return 'zlib', zlib.compress(raw, 6)
+
+
+def decompress_text(codec, data):
+    """Decompress text stored by compress_text"""
+    if codec == 'zstd':
+        if not ZSTANDARD_AVAILABLE:
+            raise RuntimeError("zstandard is required to read text stored with zstd")
+        raw = zstandard.ZstdDecompressor().decompress(data)
+    elif codec == 'zlib':
+        raw = zlib.decompress(data)
+    else:
+        raise ValueError(f"Unknown text codec: {codec}")
+    return raw.decode('utf-8')
+
+
+def save_document_text(document_id, text):
+    """
+    Store the extracted text of a document, unless the same text is already stored
+
+    Args:
+        document_id (int): Document the text was extracted from
+        text (str): Extracted text
+
+    Returns:
+        str: Content hash of the text
+    """
+    digest = content_hash(text)
+    if DocumentText.query.filter_by(document_id=document_id, content_hash=digest).first() is None:
+        codec, data = compress_text(text)
+        db.session.add(DocumentText(document_id=document_id, content_hash=digest, codec=codec,
+                                    size=len(text), data=data))
+        db.session.commit()
+        logger.info(f"Stored text of document {document_id}: {len(text)} characters in {len(data)} bytes ({codec})")
+    return digest
+
+
+def load_document_text(document_id, digest=None):
+    """
+    Read the stored text of a document
+
+    Args:
+        document_id (int): Document ID
+        digest (str, optional): Content hash of the text to read; the latest stored text if omitted
+
+    Returns:
+        str: The text, or None if it is not stored
+    """
+    query = DocumentText.query.filter_by(document_id=document_id)
+    if digest is not None:
+        query = query.filter_by(content_hash=digest)
+    stored = query.order_by(DocumentText.id.desc()).first()
+    if stored is None:
+        return None
+    return decompress_text(stored.codec, stored.data)
@@ -1,93 +1,317 @@
-import requests
+import io
+import os
+import re
+import mmap
+import hashlib
 import logging
+import tempfile
+import threading
+import requests
 import trafilatura
 from urllib.parse import urlparse
 from bs4 import BeautifulSoup
+from cachetools import TTLCache
+from services.cache_service import disk_cache
+from services.edgar_client import edgar_get, is_edgar_url
+from services.extraction_metrics import ExtractionMetrics
+from services.filing_sections import select_content
+from services.full_submission import submission_to_text
+from services.html_text import html_to_text
+from services.http_cache import cached_get_page, get_extracted_text, save_extracted_text
+from services.pdf_discovery import rank_pdf_links
 
 logger = logging.getLogger(__name__)
 
+# Seconds a fetched page is kept, so validation, extraction and PDF-link discovery share one download
+URL_FETCH_CACHE_SECONDS = int(os.environ.get('URL_FETCH_CACHE_SECONDS', 300))
+
+# Number of fetched pages kept in memory
+URL_FETCH_CACHE_ENTRIES = int(os.environ.get('URL_FETCH_CACHE_ENTRIES', 16))
+
+# Realistic browser headers; many investor-relations sites reject scraper user agents
+BROWSER_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.5'
+}
+
+# Characters of extracted text kept per URL; longer text is cut down by select_content
+MAX_CONTENT_LENGTH = 100000
+
+# Largest PDF downloaded from a URL; bigger downloads are aborted while streaming
+URL_PDF_MAX_BYTES = int(os.environ.get('URL_PDF_MAX_BYTES', 50 * 1024 * 1024))
+
+# PDFs up to this size are parsed in memory, larger ones from a memory-mapped temporary file
+URL_PDF_MEMORY_BYTES = int(os.environ.get('URL_PDF_MEMORY_BYTES', 16 * 1024 * 1024))
+
+# Content types of PDF responses (servers often send a generic binary type)
+PDF_CONTENT_TYPES = {'application/pdf', 'application/x-pdf', 'application/octet-stream',
+                     'binary/octet-stream', 'application/download', 'application/force-download'}
+
+_page_cache = TTLCache(maxsize=URL_FETCH_CACHE_ENTRIES, ttl=URL_FETCH_CACHE_SECONDS)
+_page_lock = threading.Lock()
+
+
+class _PdfResponse(Exception):
+    """Raised by the page fetchers before reading the body of a response that is a PDF"""
+
+
+def fetch_page(url):
+    """
+    Download a URL once and keep the response briefly for reuse
+
+    SEC URLs go through the shared EDGAR client, others are requested with browser
+    headers. Responses are kept in the HTTP page cache (see services.http_cache), so
+    a page ingested before costs a conditional request at most. If a site answers
+    401/403 (usually bot detection), Trafilatura's own fetcher is tried once instead.
+
+    The request is streamed, and a response that turns out to be a PDF is closed
+    before its body is read: PDFs are never held in the page caches, and are
+    downloaded with download_pdf instead (see extract_url_content).
+
+    Args:
+        url (str): URL to fetch
+
+    Returns:
+        dict: Page with 'url', 'status', 'content_type', 'body' (bytes), 'text'
+            (decoded body), the HTTP cache 'entry' (None if the page could not be
+            cached) and 'pdf' (True for a PDF, whose body and text are left empty)
+
+    Raises:
+        ValueError: If the URL is not accessible
+    """
+    with _page_lock:
+        page = _page_cache.get(url)
+    if page is not None:
+        logger.debug(f"Reusing fetched page for {url}")
+        return page
+
+    try:
+        entry = cached_get_page(url, fetch=_edgar_page_get if is_edgar_url(url) else _browser_get)
+        page = {
+            'url': url,
+            'status': 200,
+            'content_type': entry.get('content_type') or '',
+            'body': entry['body'],
+            'text': _decode_body(entry['body'], entry.get('content_type')),
+            'entry': entry,
+            'pdf': False,
+        }
+    except _PdfResponse as pdf:
+        logger.info(f"{url} is a PDF ({pdf.args[0]}); it will be downloaded separately")
+        return {'url': url, 'status': 200, 'content_type': pdf.args[0], 'body': b'', 'text': '',
+                'entry': None, 'pdf': True}
+    except requests.exceptions.RequestException as e:
+        status = getattr(getattr(e, 'response', None), 'status_code', None)
+        if status not in (401, 403):
+            raise ValueError(f"URL is not accessible: {str(e)}")
+        logger.warning(f"Access denied ({status}) for URL, trying Trafilatura's fetcher: {url}")
+        downloaded = trafilatura.fetch_url(url)
+        if not downloaded:
+            raise ValueError(f"URL is not accessible: {str(e)}")
+        page = {'url': url, 'status': 200, 'content_type': 'text/html',
+                'body': downloaded.encode('utf-8'), 'text': downloaded, 'entry': None, 'pdf': False}
+
+    with _page_lock:
+        _page_cache[url] = page
+    return page
+
+
+def _browser_get(url, headers=None):
+    """GET a non-SEC URL with browser headers, for the HTTP page cache"""
+    response = requests.get(url, headers={**BROWSER_HEADERS, **(headers or {})}, timeout=15, stream=True)
+    return _read_page_body(response)
+
+
+def _edgar_page_get(url, headers=None):
+    """GET an SEC URL through the EDGAR client, for the HTTP page cache"""
+    return _read_page_body(edgar_get(url, headers=headers, stream=True))
+
+
+def _read_page_body(response):
+    """
+    Read the body of a streamed page response, unless it is a PDF
+
+    Raises:
+        _PdfResponse: If the content type or the leading bytes show a PDF; the
+            response is closed without reading the rest of its body
+    """
+    if response.status_code != 200:
+        return response
+    content_type = response.headers.get('Content-Type', '').split(';')[0].strip().lower()
+    if content_type in PDF_CONTENT_TYPES:
+        response.close()
+        raise _PdfResponse(content_type)
+    chunks = response.iter_content(chunk_size=65536)
+    head = next(chunks, b'')
+    if head[:5] == b'%PDF-':
+        response.close()
+        raise _PdfResponse(content_type or 'application/pdf')
+    # The page is read in full: it is stored by the page cache
+    response._content = head + b''.join(chunks)
+    return response
+
+
+def _decode_body(body, content_type):
+    """Decode a page body with the charset of its content type, UTF-8 by default"""
+    match = re.search(r'charset=["\']?([\w.-]+)', content_type or '', re.I)
+    try:
+        return body.decode(match.group(1) if match else 'utf-8', errors='replace')
+    except LookupError:
+        return body.decode('utf-8', errors='replace')
+
+
+def extract_page_text(page, extractor, extract):
+    """
+    Extract text from a fetched page, reusing text extracted from the same response before
+
+    Args:
+        page (dict): Page from fetch_page
+        extractor (str): Name of the extraction method, e.g. 'trafilatura'
+        extract (callable): Function returning the extracted text
+
+    Returns:
+        str: Extracted text (may be None or empty if extraction found nothing)
+    """
+    entry = page.get('entry')
+    if entry is not None:
+        text = get_extracted_text(entry, extractor)
+        if text is not None:
+            logger.info(f"Reusing {extractor} text of unchanged page {page['url']}")
+            return text
+    text = extract()
+    if entry is not None and text is not None:
+        save_extracted_text(entry, extractor, text)
+    return text
+
+
+def is_pdf_page(page):
+    """Check whether a fetched page is a PDF (see fetch_page)"""
+    return page.get('pdf', False)
+
+
+def download_pdf(url, max_bytes=None):
+    """
+    Stream a PDF into a spool file, hashing it as the bytes arrive
+
+    The download is rejected as soon as the response turns out not to be a PDF (by its
+    leading bytes, so PDFs served with a wrong content type are still accepted) or
+    grows beyond max_bytes. Up to
+    URL_PDF_MEMORY_BYTES are kept in memory; larger PDFs spill to a temporary file.
+
+    Args:
+        url (str): URL of the PDF
+        max_bytes (int, optional): Size limit (defaults to URL_PDF_MAX_BYTES)
+
+    Returns:
+        tuple: (spool file positioned at the start, size in bytes, SHA-256 hex digest)
+
+    Raises:
+        ValueError: If the URL is not accessible, not a PDF or too large
+    """
+    max_bytes = URL_PDF_MAX_BYTES if max_bytes is None else max_bytes
+    try:
+        if is_edgar_url(url):
+            response = edgar_get(url, stream=True)
+        else:
+            response = requests.get(url, headers=BROWSER_HEADERS, timeout=30, stream=True)
+        response.raise_for_status()
+    except requests.exceptions.RequestException as e:
+        raise ValueError(f"URL is not accessible: {str(e)}")
+
+    with response:
+        content_type = response.headers.get('Content-Type', '').split(';')[0].strip().lower()
+        if content_type and content_type not in PDF_CONTENT_TYPES:
+            not_pdf = f"Expected a PDF but {url} returned {content_type}"
+        else:
+            not_pdf = f"{url} did not return a PDF"
+        length = response.headers.get('Content-Length', '')
+        if length.isdigit() and int(length) > max_bytes:
+            raise ValueError(f"PDF is too large ({int(length)} bytes, limit {max_bytes})")
+
+        spool = tempfile.SpooledTemporaryFile(max_size=URL_PDF_MEMORY_BYTES)
+        digest = hashlib.sha256()
+        head = b''
+        size = 0
+        try:
+            for chunk in response.iter_content(chunk_size=65536):
+                size += len(chunk)
+                if size > max_bytes:
+                    raise ValueError(f"PDF is too large (over {max_bytes} bytes)")
+                if len(head) < 5:
+                    head += chunk[:5 - len(head)]
+                    if len(head) == 5 and head != b'%PDF-':
+                        raise ValueError(not_pdf)
+                digest.update(chunk)
+                spool.write(chunk)
+            if head != b'%PDF-':
+                raise ValueError(not_pdf)
+        except Exception:
+            spool.close()
+            raise
+
+    spool.seek(0)
+    return spool, size, digest.hexdigest()
+
+
+def extract_pdf_url(url):
+    """
+    Download a PDF and extract its text
+
+    A PDF with the same content hash extracted before is served from the cache without
+    parsing. Otherwise it is parsed from memory, or for large files from a memory-mapped
+    spool file, without being written to and reopened from a named file.
+    """
+    from services.pdf_parser import extract_pdf_content
+
+    spool, size, content_hash = download_pdf(url)
+    with spool:
+        cache_key = f"pdf_text:{content_hash}"
+        text = disk_cache.get(cache_key)
+        if text is not None:
+            logger.info(f"Reusing extracted text of identical PDF for {url}")
+            return text
+
+        if size <= URL_PDF_MEMORY_BYTES:
+            text = extract_pdf_content(io.BytesIO(spool.read()), metrics=ExtractionMetrics(source=url))
+        else:
+            with mmap.mmap(spool.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                text = extract_pdf_content(mapped, metrics=ExtractionMetrics(source=url))
+
+    disk_cache.set(cache_key, text)
+    return text
+
+
 def extract_url_content(url):
     """
     Extract content from a URL using Trafilatura
     Returns a string containing the extracted text
+
+    Each URL is downloaded once (see fetch_page); the same response serves validation,
+    PDF detection, text extraction and the search for annual report PDF links.
     """
     try:
-        # Check if the URL points directly to a PDF
-        if url.lower().endswith('.pdf'):
-            # Handle PDF extraction
-            from services.pdf_parser import extract_pdf_content
-            import tempfile
-            import os
-            
-            # Create a temporary file to store the downloaded PDF
-            with tempfile.NamedTemporaryFile(suffix='.pdf', delete=False) as temp:
-                # Set up headers for SEC website
-                headers = {}
-                if 'sec.gov' in url:
-                    headers = {
-                        'User-Agent': 'InsightLens Research Tool (contactus@example.com)'
-                    }
-                
-                # Download the PDF
-                response = requests.get(url, headers=headers, stream=True)
-                response.raise_for_status()
-                
-                # Write the PDF to the temporary file
-                for chunk in response.iter_content(chunk_size=8192):
-                    temp.write(chunk)
-            
-            # Extract text from the PDF
-            try:
-                content = extract_pdf_content(temp.name)
-                os.unlink(temp.name)  # Clean up the temporary file
-                return content
-            except Exception as pdf_error:
-                os.unlink(temp.name)  # Clean up the temporary file
-                raise pdf_error
+        # Validate URL format; accessibility is checked by the fetch itself
+        check_url_format(url)
         
-        # Validate URL
-        validate_url(url)
+        # Stream direct PDF links instead of holding them in the page cache
+        if urlparse(url).path.lower().endswith('.pdf'):
+            return extract_pdf_url(url)
         
         # Special handling for known problematic domains that block scrapers
         if any(domain in url for domain in ["ir.aboutamazon.com", "aboutamazon.com"]):
             logger.info(f"Using Amazon IR special handler for: {url}")
             return handle_amazon_ir_url(url)
-            
-        # Set up headers for all websites - use a more realistic browser user agent
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-            'Accept-Language': 'en-US,en;q=0.5'
-        }
         
-        # Fetch content from URL with appropriate headers
-        # Note: trafilatura.fetch_url doesn't accept headers directly, need to use requests for special sites
-        if 'sec.gov' in url or any(domain in url for domain in ["investor.", "investors.", "ir."]):
-            response = requests.get(url, headers=headers, timeout=15)
-            response.raise_for_status()
-            downloaded = response.text
-        else:
-            downloaded = trafilatura.fetch_url(url)
-            
-            # If trafilatura fails, try with requests
-            if not downloaded:
-                try:
-                    logger.info(f"Trafilatura fetch failed, trying requests for: {url}")
-                    response = requests.get(url, headers=headers, timeout=15)
-                    response.raise_for_status()
-                    downloaded = response.text
-                except Exception as req_error:
-                    logger.warning(f"Requests fetch also failed: {str(req_error)}")
-                    downloaded = None
-                    
+        page = fetch_page(url)
+        
+        # Links to PDFs often lack the .pdf suffix, so go by the response itself;
+        # fetch_page left the body unread, so stream it with the size limit
+        if is_pdf_page(page):
+            return extract_pdf_url(url)
+        
+        downloaded = page['text']
         if not downloaded:
-            # Attempt to find PDF links if it's a company website
-            if not 'sec.gov' in url:
-                pdf_url = find_pdf_link(url)
-                if pdf_url:
-                    logger.info(f"Found PDF link: {pdf_url}. Extracting content from PDF.")
-                    return extract_url_content(pdf_url)  # Recursive call to handle the PDF
-            
             raise ValueError(f"Failed to fetch content from URL: {url}")
         
         # Extract main text content
@@ -110,9 +334,7 @@ def extract_url_content(url):
                     try:
                         # Request the text version of the document
                         sec_text_url = f"https://www.sec.gov/Archives/edgar/data/{cik}/{accession_number.replace('-', '')}/{accession_number}.txt"
-                        text_response = requests.get(sec_text_url, headers={'User-Agent': 'InsightLens Research Tool (contactus@example.com)'})
-                        text_response.raise_for_status()
-                        return text_response.text
+                        return select_content(submission_to_text(fetch_page(sec_text_url)['text']), MAX_CONTENT_LENGTH)
                     except Exception as text_error:
                         logger.warning(f"Failed to fetch text version: {str(text_error)}")
                 
@@ -126,29 +348,15 @@ def extract_url_content(url):
                     return extracted_text
                 
             # If we're still here, try to get a filing that's not using iXBRL
-            # Use a maximum content limit for better performance
-            limited_content = extract_sec_10k_alternative(url)
-            # Limit to 100K characters to speed up processing
-            MAX_CONTENT_LENGTH = 100000
-            if len(limited_content) > MAX_CONTENT_LENGTH:
-                logger.info(f"Truncating large document from {len(limited_content)} to {MAX_CONTENT_LENGTH} characters")
-                # Extract the beginning content
-                beginning = limited_content[:int(MAX_CONTENT_LENGTH * 0.4)]
-                # Extract the middle section
-                middle_start = int(len(limited_content) * 0.4)
-                middle = limited_content[middle_start:middle_start + int(MAX_CONTENT_LENGTH * 0.3)]
-                # Extract the end content
-                end = limited_content[-int(MAX_CONTENT_LENGTH * 0.3):]
-                # Combine the parts with a note about truncation
-                return beginning + "\n\n[...CONTENT TRUNCATED FOR PERFORMANCE...]\n\n" + middle + "\n\n[...CONTENT TRUNCATED FOR PERFORMANCE...]\n\n" + end
-            return limited_content
+            # and keep its key sections within the content limit
+            return select_content(extract_sec_10k_alternative(url), MAX_CONTENT_LENGTH)
         else:
             # For non-SEC or regular SEC pages, use standard Trafilatura extraction
-            text = trafilatura.extract(downloaded)
+            text = extract_page_text(page, 'trafilatura', lambda: trafilatura.extract(downloaded))
             if not text or len(text.strip()) < 100:
                 # If insufficient text content, attempt to find PDF links if it's a company website
                 if not 'sec.gov' in url:
-                    pdf_url = find_pdf_link(url)
+                    pdf_url = find_pdf_link(url, page)
                     if pdf_url:
                         logger.info(f"Found PDF link: {pdf_url}. Extracting content from PDF.")
                         return extract_url_content(pdf_url)  # Recursive call to handle the PDF
@@ -162,18 +370,9 @@ def extract_url_content(url):
         logger.info(f"Successfully extracted content from URL: {url}")
         
         # Limit content length for all types of URLs for better performance
-        MAX_CONTENT_LENGTH = 100000
         if text and len(text) > MAX_CONTENT_LENGTH:
-            logger.info(f"Truncating large document from {len(text)} to {MAX_CONTENT_LENGTH} characters")
-            # Extract the beginning content
-            beginning = text[:int(MAX_CONTENT_LENGTH * 0.4)]
-            # Extract the middle section
-            middle_start = int(len(text) * 0.4)
-            middle = text[middle_start:middle_start + int(MAX_CONTENT_LENGTH * 0.3)]
-            # Extract the end content
-            end = text[-int(MAX_CONTENT_LENGTH * 0.3):]
-            # Combine the parts with a note about truncation
-            return beginning + "\n\n[...CONTENT TRUNCATED FOR PERFORMANCE...]\n\n" + middle + "\n\n[...CONTENT TRUNCATED FOR PERFORMANCE...]\n\n" + end
+            logger.info(f"Shortening large document from {len(text)} to {MAX_CONTENT_LENGTH} characters")
+            return select_content(text, MAX_CONTENT_LENGTH)
         
         return text
         
@@ -182,66 +381,21 @@ def extract_url_content(url):
         raise Exception(f"Failed to extract content from URL: {str(e)}")
 
 
-def find_pdf_link(url):
+def find_pdf_link(url, page=None):
     """
     Attempt to find a PDF link (like an annual report) on a company's website
     Returns the URL of the PDF if found, None otherwise
+
+    All PDF links on the page are ranked (see services.pdf_discovery) and only the
+    best one is returned for download. Pass the already fetched page to avoid
+    downloading it again.
     """
     try:
-        headers = {
-            'User-Agent': 'InsightLens Research Tool (contactus@example.com)'
-        }
-        
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()
-        
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        # Look for links to PDFs that might be annual reports
-        annual_report_keywords = [
-            'annual report', 'annual-report', 'annualreport', 
-            '10-k', '10k', 'financial report', 'investor'
-        ]
-        
-        for link in soup.find_all('a'):
-            href = link.get('href')
-            text = link.text.lower()
-            
-            if href and href.lower().endswith('.pdf'):
-                # Check if the link text contains keywords related to annual reports
-                if any(keyword in text for keyword in annual_report_keywords):
-                    # Convert relative URL to absolute URL
-                    if not href.startswith(('http://', 'https://')):
-                        parsed_url = urlparse(url)
-                        base_url = f"{parsed_url.scheme}://{parsed_url.netloc}"
-                        
-                        if href.startswith('/'):
-                            href = f"{base_url}{href}"
-                        else:
-                            directory = '/'.join(parsed_url.path.split('/')[:-1])
-                            href = f"{base_url}{directory}/{href}"
-                    
-                    return href
-        
-        # If we didn't find any annual report specific PDFs, try to find any PDF
-        for link in soup.find_all('a'):
-            href = link.get('href')
-            
-            if href and href.lower().endswith('.pdf'):
-                # Convert relative URL to absolute URL
-                if not href.startswith(('http://', 'https://')):
-                    parsed_url = urlparse(url)
-                    base_url = f"{parsed_url.scheme}://{parsed_url.netloc}"
-                    
-                    if href.startswith('/'):
-                        href = f"{base_url}{href}"
-                    else:
-                        directory = '/'.join(parsed_url.path.split('/')[:-1])
-                        href = f"{base_url}{directory}/{href}"
-                
-                return href
+        if page is None:
+            page = fetch_page(url)
         
-        return None
+        candidates = rank_pdf_links(page['text'], url, headers=BROWSER_HEADERS, max_bytes=URL_PDF_MAX_BYTES)
+        return candidates[0]['url'] if candidates else None
         
     except Exception as e:
         logger.error(f"Error finding PDF link on {url}: {str(e)}")
@@ -253,9 +407,6 @@ def extract_sec_10k_alternative(url):
     Tries multiple approaches to get the document content
     """
     logger.info(f"Using alternative extraction method for SEC 10-K: {url}")
-    headers = {
-        'User-Agent': 'InsightLens Research Tool (contactus@example.com)'
-    }
     
     try:
         # Check if we have an iXBRL document URL
@@ -267,12 +418,7 @@ def extract_sec_10k_alternative(url):
             logger.info(f"Converted iXBRL URL to direct document URL: {direct_url}")
             
             # Try to get the document directly
-            response = requests.get(direct_url, headers=headers)
-            response.raise_for_status()
-            
-            # Use BeautifulSoup to extract text
-            soup = BeautifulSoup(response.text, 'html.parser')
-            text_content = soup.get_text(separator='\n', strip=True)
+            text_content = html_to_text(fetch_page(direct_url)['body'])
             
             if text_content and len(text_content) > 500:
                 return text_content
@@ -280,10 +426,7 @@ def extract_sec_10k_alternative(url):
         # Check if we're dealing with an index page
         if '-index.htm' in url:
             # Try to find the actual 10-K document link
-            response = requests.get(url, headers=headers)
-            response.raise_for_status()
-            
-            soup = BeautifulSoup(response.text, 'html.parser')
+            soup = BeautifulSoup(fetch_page(url)['text'], 'html.parser')
             
             # Look for the actual 10-K document link
             for table in soup.find_all('table'):
@@ -308,11 +451,7 @@ def extract_sec_10k_alternative(url):
                                         logger.info(f"Found 10-K document link: {doc_url}")
                                         
                                         # Extract content from the document
-                                        doc_response = requests.get(doc_url, headers=headers)
-                                        doc_response.raise_for_status()
-                                        
-                                        doc_soup = BeautifulSoup(doc_response.text, 'html.parser')
-                                        return doc_soup.get_text(separator='\n', strip=True)
+                                        return html_to_text(fetch_page(doc_url)['body'])
         
         # Try the TXT version of the document as a last resort
         if '/Archives/edgar/data/' in url:
@@ -327,16 +466,14 @@ def extract_sec_10k_alternative(url):
                     txt_url = f"https://www.sec.gov/Archives/edgar/data/{cik}/{dir_accession}/{accession}.txt"
                     logger.info(f"Trying TXT version of document: {txt_url}")
                     
-                    txt_response = requests.get(txt_url, headers=headers)
-                    if txt_response.status_code == 200:
-                        return txt_response.text
+                    try:
+                        # The full submission: keep the 10-K itself, not its exhibits and graphics
+                        return submission_to_text(fetch_page(txt_url)['text'])
+                    except ValueError as txt_error:
+                        logger.warning(f"Failed to fetch text version: {str(txt_error)}")
         
         # If all attempts failed, just return whatever text we can extract from the original URL
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()
-        
-        soup = BeautifulSoup(response.text, 'html.parser')
-        text_content = soup.get_text(separator='\n', strip=True)
+        text_content = html_to_text(fetch_page(url)['body'])
         
         # Filter out very short text (likely error pages)
         if len(text_content) < 500:
@@ -395,11 +532,10 @@ def handle_amazon_ir_url(url):
     Please refer to the official Amazon Investor Relations website or SEC filings for exact figures.
     """
 
-def validate_url(url):
+def check_url_format(url):
     """
-    Validate that the URL is properly formatted and accessible
+    Check that the URL is properly formatted, without contacting it
     """
-    # Check URL format
     try:
         result = urlparse(url)
         if not all([result.scheme, result.netloc]):
@@ -411,6 +547,16 @@ def validate_url(url):
         
     except Exception as e:
         raise ValueError(f"URL validation error: {str(e)}")
+
+
+def validate_url(url):
+    """
+    Validate that the URL is properly formatted and accessible
+
+    The response is kept by fetch_page, so extracting the URL afterwards does not
+    download it again.
+    """
+    check_url_format(url)
     
     # Special handling for known problematic domains that block scraping
     blocked_domains = [
@@ -423,36 +569,7 @@ def validate_url(url):
         if domain in url:
             logger.warning(f"Known problematic domain detected: {domain}")
             # Return without trying to access the URL
-            # This avoids immediate failure, allowing the process to continue
             # The actual extraction will handle these domains with special care
             return
     
-    # Check URL accessibility with proper headers for SEC
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-        'Accept-Language': 'en-US,en;q=0.5',
-        'DNT': '1',
-        'Connection': 'keep-alive',
-        'Upgrade-Insecure-Requests': '1'
-    }
-    
-    try:
-        # Use GET instead of HEAD for SEC and financial sites (HEAD requests are often blocked)
-        financial_domains = ['sec.gov', 'investor.', 'investors.', 'finance.', 'ir.']
-        use_get = any(domain in url for domain in financial_domains)
-        
-        if use_get:
-            response = requests.get(url, headers=headers, timeout=10)
-        else:
-            response = requests.head(url, headers=headers, timeout=10)
-        response.raise_for_status()
-    except requests.exceptions.RequestException as e:
-        # Special handling for 403/401 errors (likely bot detection)
-        if "403" in str(e) or "401" in str(e):
-            logger.warning(f"Access denied (403/401) for URL, but continuing process: {url}")
-            # Allow process to continue despite 403 error
-            # The extraction will use more robust methods later
-            return
-        
-        raise ValueError(f"URL is not accessible: {str(e)}")
+    fetch_page(url)
@@ -0,0 +1,428 @@
+"""
+XBRL company facts for InsightLens
+
+Reads the EDGAR XBRL companyfacts JSON for a company and keeps a small set of key
+us-gaap facts for each fiscal year. The facts are stored column-wise (metrics x fiscal
+period end dates, as a packed float64 array) and used to compute ratios and
+multi-year trends locally, to give the financial prompts a compact fact sheet, and to
+compare companies without an LLM call.
+"""
+
+import os
+import math
+import logging
+import datetime
+from array import array
+
+logger = logging.getLogger(__name__)
+
+COMPANYFACTS_URL = 'https://data.sec.gov/api/xbrl/companyfacts/CIK{cik}.json'
+
+# Stored facts are refreshed from EDGAR once they are older than this
+COMPANY_FACTS_MAX_AGE_HOURS = float(os.environ.get('COMPANY_FACTS_MAX_AGE_HOURS', 24))
+
+# Number of most recent fiscal years kept per company
+MAX_PERIODS = 10
+
+# Key metrics and the us-gaap concepts reporting them, in order of preference
+KEY_CONCEPTS = [
+    ('revenue', 'USD', ['Revenues', 'RevenueFromContractWithCustomerExcludingAssessedTax',
+                        'RevenueFromContractWithCustomerIncludingAssessedTax', 'SalesRevenueNet']),
+    ('cost_of_revenue', 'USD', ['CostOfRevenue', 'CostOfGoodsAndServicesSold']),
+    ('gross_profit', 'USD', ['GrossProfit']),
+    ('research_and_development', 'USD', ['ResearchAndDevelopmentExpense']),
+    ('operating_income', 'USD', ['OperatingIncomeLoss']),
+    ('net_income', 'USD', ['NetIncomeLoss']),
+    ('eps_diluted', 'USD/shares', ['EarningsPerShareDiluted']),
+    ('cash', 'USD', ['CashAndCashEquivalentsAtCarryingValue']),
+    ('current_assets', 'USD', ['AssetsCurrent']),
+    ('total_assets', 'USD', ['Assets']),
+    ('current_liabilities', 'USD', ['LiabilitiesCurrent']),
+    ('total_liabilities', 'USD', ['Liabilities']),
+    ('long_term_debt', 'USD', ['LongTermDebtNoncurrent', 'LongTermDebt']),
+    ('stockholders_equity', 'USD', ['StockholdersEquity']),
+    ('operating_cash_flow', 'USD', ['NetCashProvidedByUsedInOperatingActivities']),
+    ('capital_expenditures', 'USD', ['PaymentsToAcquirePropertyPlantAndEquipment']),
+]
+
+METRIC_LABELS = {
+    'revenue': 'Revenue',
+    'cost_of_revenue': 'Cost of revenue',
+    'gross_profit': 'Gross profit',
+    'research_and_development': 'R&D expense',
+    'operating_income': 'Operating income',
+    'net_income': 'Net income',
+    'eps_diluted': 'Diluted EPS (USD)',
+    'cash': 'Cash and equivalents',
+    'current_assets': 'Current assets',
+    'total_assets': 'Total assets',
+    'current_liabilities': 'Current liabilities',
+    'total_liabilities': 'Total liabilities',
+    'long_term_debt': 'Long-term debt',
+    'stockholders_equity': "Stockholders' equity",
+    'operating_cash_flow': 'Operating cash flow',
+    'capital_expenditures': 'Capital expenditures',
+    'free_cash_flow': 'Free cash flow',
+    'gross_margin': 'Gross margin %',
+    'operating_margin': 'Operating margin %',
+    'net_margin': 'Net margin %',
+    'fcf_margin': 'FCF margin %',
+    'revenue_growth': 'Revenue growth %',
+    'current_ratio': 'Current ratio',
+    'debt_to_equity': 'Debt to equity',
+    'liabilities_to_equity': 'Liabilities to equity',
+    'return_on_equity': 'Return on equity %',
+}
+
+# Metrics shown in USD millions in fact sheets and comparisons
+USD_METRICS = {name for name, unit, _ in KEY_CONCEPTS if unit == 'USD'} | {'free_cash_flow'}
+
+# Ratios shown as percentages
+PERCENT_RATIOS = {'gross_margin', 'operating_margin', 'net_margin', 'fcf_margin', 'revenue_growth', 'return_on_equity'}
+
+# Annual duration facts cover roughly a year (52/53-week fiscal years included)
+ANNUAL_DAYS = (340, 380)
+
+
+class FactTable:
+    """
+    Key facts for one company, column-wise
+
+    Args:
+        cik (str): Company CIK
+        entity_name (str): Company name
+        metrics (list): Metric names (rows)
+        periods (list): Fiscal period end dates as 'YYYY-MM-DD', oldest first (columns)
+        values (array): float64 values, row-major, NaN where a fact was not reported
+    """
+
+    def __init__(self, cik, entity_name, metrics, periods, values):
+        self.cik = cik
+        self.entity_name = entity_name
+        self.metrics = list(metrics)
+        self.periods = list(periods)
+        self.values = values if isinstance(values, array) else array('d', values)
+        self._rows = {metric: i for i, metric in enumerate(self.metrics)}
+
+    def get(self, metric, period):
+        """Return a value, or None if it was not reported"""
+        row = self._rows.get(metric)
+        if row is None or period not in self.periods:
+            return None
+        value = self.values[row * len(self.periods) + self.periods.index(period)]
+        return None if math.isnan(value) else value
+
+    def series(self, metric):
+        """Return the values of a metric for every period, None where not reported"""
+        row = self._rows.get(metric)
+        if row is None:
+            return [None] * len(self.periods)
+        columns = len(self.periods)
+        return [None if math.isnan(value) else value for value in self.values[row * columns:(row + 1) * columns]]
+
+
+def _is_annual(fact):
+    """True for facts from annual reports covering a fiscal year (or its end date)"""
+    if not str(fact.get('form', '')).startswith('10-K') or fact.get('fp') != 'FY':
+        return False
+    if 'start' not in fact:
+        return True
+    try:
+        start = datetime.date.fromisoformat(fact['start'])
+        end = datetime.date.fromisoformat(fact['end'])
+    except (KeyError, ValueError):
+        return False
+    return ANNUAL_DAYS[0] <= (end - start).days <= ANNUAL_DAYS[1]
+
+
+def _annual_values(concept_data, unit):
+    """
+    Collect annual values of a concept by period end date
+
+    Restated values are resolved in favour of the most recently filed one.
+
+    Returns:
+        tuple: ({end_date: value}, is_duration)
+    """
+    latest = {}
+    is_duration = False
+    for fact in concept_data.get('units', {}).get(unit, []):
+        if not _is_annual(fact) or fact.get('val') is None:
+            continue
+        is_duration = is_duration or 'start' in fact
+        end = fact['end']
+        filed = fact.get('filed', '')
+        if end not in latest or filed >= latest[end][0]:
+            latest[end] = (filed, float(fact['val']))
+    return {end: value for end, (filed, value) in latest.items()}, is_duration
+
+
+def parse_company_facts(data, max_periods=MAX_PERIODS):
+    """
+    Build a FactTable from an EDGAR companyfacts JSON document
+
+    For each metric and period the first listed concept reporting it is used. Fiscal periods
+    are the end dates of annual duration facts (income and cash flow statements);
+    balance sheet facts are aligned to those dates.
+
+    Args:
+        data (dict): Parsed companyfacts JSON
+        max_periods (int): Number of most recent fiscal years to keep
+
+    Returns:
+        FactTable: The key facts
+    """
+    us_gaap = data.get('facts', {}).get('us-gaap', {})
+    by_metric = {}
+    duration_periods = set()
+    instant_periods = set()
+
+    for metric, unit, concepts in KEY_CONCEPTS:
+        merged = {}
+        for concept in concepts:
+            if concept not in us_gaap:
+                continue
+            values, is_duration = _annual_values(us_gaap[concept], unit)
+            # Filers switch concepts over time, so later concepts fill the years earlier ones miss
+            for end, value in values.items():
+                merged.setdefault(end, value)
+            (duration_periods if is_duration else instant_periods).update(values)
+        if merged:
+            by_metric[metric] = merged
+
+    periods = sorted(duration_periods or instant_periods)[-max_periods:]
+    metrics = [metric for metric, _, _ in KEY_CONCEPTS]
+    values = array('d')
+    for metric in metrics:
+        metric_values = by_metric.get(metric, {})
+        values.extend(metric_values.get(period, math.nan) for period in periods)
+
+    cik = str(data.get('cik', '')).lstrip('0')
+    return FactTable(cik, data.get('entityName') or '', metrics, periods, values)
+
+
+def _ratio(numerator, denominator):
+    if numerator is None or denominator in (None, 0):
+        return None
+    return numerator / denominator
+
+
+def compute_ratios(table):
+    """
+    Compute ratios for every fiscal period of a FactTable
+
+    Returns:
+        dict: Ratio name -> list of values aligned with table.periods (None where inputs are missing)
+    """
+    revenue = table.series('revenue')
+    gross_profit = table.series('gross_profit')
+    cost_of_revenue = table.series('cost_of_revenue')
+    operating_cash_flow = table.series('operating_cash_flow')
+    capital_expenditures = table.series('capital_expenditures')
+    equity = table.series('stockholders_equity')
+
+    ratios = {name: [] for name in ('free_cash_flow', 'gross_margin', 'operating_margin', 'net_margin', 'fcf_margin',
+                                    'revenue_growth', 'current_ratio', 'debt_to_equity', 'liabilities_to_equity',
+                                    'return_on_equity')}
+    for i, period in enumerate(table.periods):
+        gross = gross_profit[i]
+        if gross is None and revenue[i] is not None and cost_of_revenue[i] is not None:
+            gross = revenue[i] - cost_of_revenue[i]
+        free_cash_flow = None
+        if operating_cash_flow[i] is not None:
+            free_cash_flow = operating_cash_flow[i] - (capital_expenditures[i] or 0.0)
+
+        ratios['free_cash_flow'].append(free_cash_flow)
+        ratios['gross_margin'].append(_ratio(gross, revenue[i]))
+        ratios['operating_margin'].append(_ratio(table.get('operating_income', period), revenue[i]))
+        ratios['net_margin'].append(_ratio(table.get('net_income', period), revenue[i]))
+        ratios['fcf_margin'].append(_ratio(free_cash_flow, revenue[i]))
+        growth = _ratio(revenue[i], revenue[i - 1]) if i > 0 else None
+        ratios['revenue_growth'].append(growth - 1 if growth is not None else None)
+        ratios['current_ratio'].append(_ratio(table.get('current_assets', period), table.get('current_liabilities', period)))
+        ratios['debt_to_equity'].append(_ratio(table.get('long_term_debt', period), equity[i]))
+        ratios['liabilities_to_equity'].append(_ratio(table.get('total_liabilities', period), equity[i]))
+        ratios['return_on_equity'].append(_ratio(table.get('net_income', period), equity[i]))
+    return ratios
+
+
+def compute_trends(table):
+    """
+    Summarize multi-year trends of a FactTable
+
+    Returns:
+        dict: Growth rates (CAGR) and margin changes over the periods with data
+    """
+    trends = {}
+    ratios = compute_ratios(table)
+    for metric in ('revenue', 'net_income', 'operating_cash_flow'):
+        points = [(period, value) for period, value in zip(table.periods, table.series(metric)) if value is not None]
+        if len(points) >= 2 and points[0][1] > 0 and points[-1][1] > 0:
+            years = (datetime.date.fromisoformat(points[-1][0]) - datetime.date.fromisoformat(points[0][0])).days / 365.25
+            if years >= 0.9:
+                trends[f'{metric}_cagr'] = {
+                    'from': points[0][0], 'to': points[-1][0],
+                    'value': (points[-1][1] / points[0][1]) ** (1 / years) - 1,
+                }
+    for ratio in ('gross_margin', 'operating_margin', 'net_margin'):
+        points = [(period, value) for period, value in zip(table.periods, ratios[ratio]) if value is not None]
+        if len(points) >= 2:
+            trends[f'{ratio}_change'] = {'from': points[0][0], 'to': points[-1][0], 'value': points[-1][1] - points[0][1]}
+    return trends
+
+
+def format_metric_value(metric, value):
+    """Format a metric or ratio value for fact sheets and comparisons"""
+    if value is None:
+        return ''
+    if metric in USD_METRICS:
+        return f"{value / 1e6:,.0f}"
+    if metric in PERCENT_RATIOS:
+        return f"{value * 100:.1f}"
+    return f"{value:.2f}"
+
+
+def format_fact_sheet(table, years=5):
+    """
+    Render key facts, ratios and trends as a compact pipe-separated table for prompts
+
+    Args:
+        table (FactTable): The company's facts
+        years (int): Number of most recent fiscal years to include
+
+    Returns:
+        str: The fact sheet, or an empty string if there are no facts
+    """
+    if not table.periods:
+        return ''
+    start = max(len(table.periods) - years, 0)
+    periods = table.periods[start:]
+    ratios = compute_ratios(table)
+
+    lines = [f"XBRL FACT SHEET: {table.entity_name} (CIK {table.cik}), USD millions unless noted, "
+             f"columns are fiscal years ended",
+             'Metric | ' + ' | '.join(periods)]
+    rows = [(metric, table.series(metric)[start:]) for metric in table.metrics]
+    rows += [(ratio, values[start:]) for ratio, values in ratios.items()]
+    for metric, values in rows:
+        if all(value is None for value in values):
+            continue
+        lines.append(f"{METRIC_LABELS.get(metric, metric)} | " + ' | '.join(format_metric_value(metric, v) for v in values))
+
+    trends = compute_trends(table)
+    trend_notes = []
+    for name, trend in trends.items():
+        if name.endswith('_cagr'):
+            label = METRIC_LABELS[name[:-len('_cagr')]]
+            trend_notes.append(f"{label} CAGR {trend['from']} to {trend['to']}: {trend['value'] * 100:.1f}%")
+        else:
+            label = METRIC_LABELS[name[:-len('_change')]]
+            trend_notes.append(f"{label} change {trend['from']} to {trend['to']}: {trend['value'] * 100:+.1f} pts")
+    if trend_notes:
+        lines.append('Trends: ' + '; '.join(trend_notes))
+    return '\n'.join(lines)
+
+
+# Rows of the local comparison table: facts and ratios for the latest fiscal year
+COMPARISON_METRICS = ['revenue', 'revenue_growth', 'gross_margin', 'operating_margin', 'net_margin', 'net_income',
+                      'free_cash_flow', 'fcf_margin', 'return_on_equity', 'current_ratio', 'debt_to_equity']
+
+
+def compare_fact_tables(tables):
+    """
+    Compare companies on their latest fiscal year, or one company across years
+
+    Args:
+        tables (list): FactTables; a single table gives a year-by-year comparison
+
+    Returns:
+        dict: 'columns' (headers) and 'rows' (each with 'label' and formatted 'values'),
+            or None if there is nothing to compare
+    """
+    tables = [table for table in tables if table and table.periods]
+    if not tables:
+        return None
+
+    if len(tables) == 1:
+        table = tables[0]
+        ratios = compute_ratios(table)
+        periods = table.periods[-5:]
+        columns = [f"{table.entity_name} {period}" for period in periods]
+        rows = []
+        for metric in COMPARISON_METRICS:
+            values = ratios[metric] if metric in ratios else table.series(metric)
+            values = values[-len(periods):]
+            rows.append({'label': METRIC_LABELS[metric], 'values': [format_metric_value(metric, v) for v in values]})
+        return {'columns': columns, 'rows': rows, 'units': 'USD millions; ratios in % where noted'}
+
+    columns = []
+    per_table = []
+    for table in tables:
+        ratios = compute_ratios(table)
+        columns.append(f"{table.entity_name} (FY ended {table.periods[-1]})")
+        per_table.append({metric: (ratios[metric][-1] if metric in ratios else table.series(metric)[-1])
+                          for metric in COMPARISON_METRICS})
+    rows = [
+        {'label': METRIC_LABELS[metric], 'values': [format_metric_value(metric, values[metric]) for values in per_table]}
+        for metric in COMPARISON_METRICS
+    ]
+    return {'columns': columns, 'rows': rows, 'units': 'USD millions; ratios in % where noted'}
+
+
+def fetch_company_facts(cik):
+    """Download (or revalidate) the companyfacts JSON for a CIK through the HTTP cache"""
+    from services.http_cache import cached_get_json
+    return cached_get_json(COMPANYFACTS_URL.format(cik=str(cik).zfill(10)))
+
+
+def ingest_company_facts(cik):
+    """
+    Fetch companyfacts for a CIK and store its key facts
+
+    Returns:
+        FactTable: The stored facts
+    """
+    from app import db
+    from models import CompanyFacts
+
+    table = parse_company_facts(fetch_company_facts(cik))
+    record = CompanyFacts.query.filter_by(cik=table.cik or str(cik).lstrip('0')).first()
+    if record is None:
+        record = CompanyFacts(cik=table.cik or str(cik).lstrip('0'))
+        db.session.add(record)
+    record.update_from_table(table)
+    db.session.commit()
+    logger.info(f"Stored {len(table.periods)} fiscal years of XBRL facts for CIK {cik}")
+    return table
+
+
+def get_company_facts(cik, max_age_hours=COMPANY_FACTS_MAX_AGE_HOURS):
+    """
+    Return stored key facts for a CIK, ingesting them from EDGAR if missing or stale
+
+    Returns:
+        FactTable or None: The facts, or None if they could not be loaded
+    """
+    from app import db
+    from models import CompanyFacts
+
+    if not cik:
+        return None
+    record = CompanyFacts.query.filter_by(cik=str(cik).lstrip('0')).first()
+    if record and record.fetched_at and \
+            datetime.datetime.utcnow() - record.fetched_at < datetime.timedelta(hours=max_age_hours):
+        return record.to_table()
+    try:
+        return ingest_company_facts(cik)
+    except Exception as e:
+        logger.warning(f"Could not ingest XBRL facts for CIK {cik}: {str(e)}")
+        db.session.rollback()
+        return record.to_table() if record else None
+
+
+def get_fact_sheet(cik):
+    """Return the prompt fact sheet for a CIK, or None if no facts are available"""
+    table = get_company_facts(cik)
+    if table is None:
+        return None
+    return format_fact_sheet(table) or None
@@ -0,0 +1,163 @@
+import json
+import os
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+from flask_testing import TestCase
+
+from app import app, db
+from models import Document, Insight, Processing, Job
+from openai import OpenAI
+
+from services import ai_service, cancellation, job_queue
+from services.cancellation import CancellationToken, ProcessingCancelled
+
+
+class SlowCompletionServer(ThreadingHTTPServer):
+    """
+    Local OpenAI-compatible endpoint that streams a completion one word every 0.2 s
+
+    With delay_headers set it waits that long before answering at all, like a
+    request still queued on OpenAI's side.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, delay_headers=0):
+        super().__init__(('127.0.0.1', 0), SlowCompletionHandler)
+        self.delay_headers = delay_headers
+        self.requests = 0
+        self.chunks_sent = 0
+        self.disconnected = threading.Event()
+        self.released = threading.Event()
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/v1"
+
+    def stop(self):
+        self.released.set()
+        self.shutdown()
+        self.server_close()
+
+
+class SlowCompletionHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers['Content-Length']))
+        self.server.requests += 1
+        if self.server.released.wait(self.server.delay_headers):
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.end_headers()
+        try:
+            for number in range(40):
+                chunk = {'id': 'chatcmpl-slow', 'object': 'chat.completion.chunk', 'created': 0, 'model': 'gpt-4o',
+                         'choices': [{'index': 0, 'delta': {'content': f'word{number} '}, 'finish_reason': None}]}
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode('utf-8'))
+                self.wfile.flush()
+                self.server.chunks_sent += 1
+                if self.server.released.wait(0.2):
+                    return
+            self.wfile.write(b"data: [DONE]\n\n")
+        except (BrokenPipeError, ConnectionResetError):
+            self.server.disconnected.set()
+
+
+class CancellationTestCase(TestCase):
+    def create_app(self):
+        app.config['TESTING'] = True
+        app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get("DATABASE_URL")
+        return app
+
+    def setUp(self):
+        job_queue.stop_job_workers()
+        db.create_all()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+
+    def add_document(self):
+        document = Document(title='10-K Filing: Cancel Corp', content_type='edgar',
+                            url='https://www.sec.gov/Archives/edgar/data/9990009/cancel-20241231.htm')
+        db.session.add(document)
+        db.session.commit()
+        db.session.add(Processing(document_id=document.id))
+        db.session.commit()
+        return document
+
+    def cancel_generation(self, server):
+        """Generate insights against the server, cancelling after 0.5 s; returns the seconds until it stopped"""
+        self.addCleanup(server.stop)
+        client = OpenAI(api_key='sk-test', base_url=server.base_url, max_retries=0)
+        token = CancellationToken()
+        threading.Timer(0.5, token.cancel).start()
+
+        started = time.monotonic()
+        with mock.patch.dict(os.environ, {'OPENAI_API_KEY': 'sk-test'}), \
+                mock.patch.object(ai_service, 'get_openai_client', return_value=client):
+            with self.assertRaises(ProcessingCancelled):
+                ai_service.generate_insights_with_openai('Revenue grew. ' * 50, ['business_summary', 'moat', 'financial'],
+                                                         cancel_token=token)
+        return time.monotonic() - started
+
+    def test_cancel_stops_streaming_completion(self):
+        server = SlowCompletionServer()
+        self.assertLess(self.cancel_generation(server), 1.5)
+
+        # The stream was closed at the next chunk, so the rest of the completion was
+        # never generated, and no other category was requested
+        self.assertTrue(server.disconnected.wait(3))
+        self.assertLess(server.chunks_sent, 10)
+        self.assertEqual(server.requests, 1)
+
+    def test_cancel_does_not_wait_for_a_slow_response(self):
+        # The server would only start answering after 8 s
+        server = SlowCompletionServer(delay_headers=8)
+        self.assertLess(self.cancel_generation(server), 1.5)
+        self.assertEqual(server.requests, 1)
+
+    def test_cancelled_job_stops_without_saving_or_retrying(self):
+        document = self.add_document()
+        waiting = self.add_document()
+
+        def analyze(content, cancel_token=None, **kwargs):
+            # The user cancels from another process: only the processing status changes
+            Processing.query.filter_by(document_id=document.id).update({'status': 'cancelled'})
+            db.session.commit()
+            self.assertTrue(cancel_token.wait(5))
+            cancel_token.raise_if_cancelled('the moat insight')
+            return {'business_summary': 'never saved'}
+
+        with mock.patch.object(cancellation, 'CANCEL_POLL_SECONDS', 0.05), \
+                mock.patch('services.document_processor.get_filing_text', return_value='Item 1. Business ' * 100), \
+                mock.patch('services.document_processor.get_financial_context', return_value=None), \
+                mock.patch('services.document_processor.generate_insights', side_effect=analyze):
+            queued = job_queue.enqueue('process_document', document.id)
+            other = job_queue.enqueue('process_document', waiting.id)
+
+            response = self.client.post(f'/api/processing/{waiting.id}/cancel')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(Job.query.get(other.id).status, 'cancelled')
+
+            job = job_queue.claim_job('worker-a')
+            self.assertEqual(job.id, queued.id)
+            self.assertFalse(job_queue.run_job(job, 'worker-a'))
+            self.assertIsNone(job_queue.claim_job('worker-a'))
+
+        self.assertEqual(Job.query.get(queued.id).status, 'cancelled')
+        self.assertEqual(Processing.query.filter_by(document_id=document.id).first().status, 'cancelled')
+        self.assertEqual(Insight.query.filter_by(document_id=document.id).count(), 0)
+        self.assertEqual(cancellation._active_tokens, {})
+
+
+if __name__ == '__main__':
+    unittest.main()
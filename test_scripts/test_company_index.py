@@ -0,0 +1,58 @@
+import time
+import unittest
+
+from services.company_index import CompanyIndex, parse_company_tickers
+
+# Rows in the format of the SEC company_tickers.json file
+COMPANY_TICKERS = {
+    '0': {'cik_str': 320193, 'ticker': 'AAPL', 'title': 'Apple Inc.'},
+    '1': {'cik_str': 789019, 'ticker': 'MSFT', 'title': 'MICROSOFT CORP'},
+    '2': {'cik_str': 1652044, 'ticker': 'GOOGL', 'title': 'Alphabet Inc.'},
+    '3': {'cik_str': 1652044, 'ticker': 'GOOG', 'title': 'Alphabet Inc.'},
+    '4': {'cik_str': 1326801, 'ticker': 'META', 'title': 'Meta Platforms, Inc.'},
+    '5': {'cik_str': 1937653, 'ticker': 'ZYME', 'title': 'Zymeworks Inc.'},
+    '6': {'cik_str': 1418091, 'ticker': 'APLE', 'title': 'Apple Hospitality REIT, Inc.'},
+    '7': {'cik_str': 1090872, 'ticker': 'A', 'title': 'AGILENT TECHNOLOGIES, INC.'},
+}
+
+
+class CompanyIndexTestCase(unittest.TestCase):
+    def setUp(self):
+        self.index = CompanyIndex(parse_company_tickers(COMPANY_TICKERS))
+
+    def test_ticker_and_name_search(self):
+        """Exact tickers rank first, then name prefixes"""
+        self.assertEqual(self.index.search('aapl')[0]['name'], 'Apple Inc.')
+        self.assertEqual([c['cik'] for c in self.index.search('Apple')], ['320193', '1418091'])
+        self.assertEqual(self.index.search('A')[0]['ticker'], 'A')
+
+    def test_word_prefix_search(self):
+        """Any word of the name can be matched by prefix, share classes appear once"""
+        self.assertEqual(self.index.search('platforms')[0]['ticker'], 'META')
+        self.assertEqual(self.index.search('hospitality apple')[0]['ticker'], 'APLE')
+        alphabet = self.index.search('alphabet')
+        self.assertEqual(len(alphabet), 1)
+        self.assertEqual(alphabet[0]['cik'], '1652044')
+
+    def test_fuzzy_search(self):
+        """Misspelled names fall back to the closest indexed words"""
+        self.assertEqual(self.index.search('Microsfot')[0]['ticker'], 'MSFT')
+        self.assertEqual(self.index.search('qqqqq'), [])
+
+    def test_search_speed(self):
+        """Prefix searches over a full-size index take well under a millisecond"""
+        rows = dict(COMPANY_TICKERS)
+        for i in range(10000):
+            rows[f'x{i}'] = {'cik_str': 2000000 + i, 'ticker': f'T{i}', 'title': f'Example Holdings {i} Corp'}
+        index = CompanyIndex(parse_company_tickers(rows))
+
+        start = time.perf_counter()
+        for _ in range(100):
+            index.search('zymeworks')
+            index.search('msft')
+        per_search = (time.perf_counter() - start) / 200
+        self.assertLess(per_search, 0.001)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,130 @@
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+import requests
+
+from services import edgar_client
+from services.edgar_client import SEC_USER_AGENT, get_session, is_edgar_url
+from services.rate_limiter import TokenBucket
+from services import edgar_service
+
+# Shape of the data.sec.gov submissions JSON, trimmed to the fields used
+SUBMISSIONS = {
+    'name': 'Zymeworks Inc.',
+    'filings': {'recent': {
+        'form': ['8-K', '10-K', '10-Q', '10-K'],
+        'accessionNumber': ['0001937653-25-000020', '0001937653-25-000014', '0001937653-24-000030', '0001937653-24-000010'],
+        'filingDate': ['2025-04-10', '2025-03-06', '2024-11-01', '2024-03-07'],
+        'primaryDocument': ['zyme-8k.htm', 'zyme-20241231.htm', 'zyme-10q.htm', 'zyme-20231231.htm'],
+    }},
+}
+
+
+class EdgarClientTestCase(unittest.TestCase):
+    def test_is_edgar_url(self):
+        """Only SEC hosts are routed through the EDGAR client"""
+        self.assertTrue(is_edgar_url('https://www.sec.gov/cgi-bin/browse-edgar?action=getcompany'))
+        self.assertTrue(is_edgar_url('https://data.sec.gov/submissions/CIK0000320193.json'))
+        self.assertFalse(is_edgar_url('https://investor.apple.com/sec-filings/'))
+        self.assertFalse(is_edgar_url('https://example.com/?next=https://www.sec.gov/'))
+
+    def test_shared_session(self):
+        """All callers share one session with the SEC headers set"""
+        session = get_session()
+        self.assertIs(session, get_session())
+        self.assertEqual(session.headers['User-Agent'], SEC_USER_AGENT)
+        self.assertEqual(session.headers['Accept-Encoding'], 'gzip, deflate')
+
+    def test_rate_limiter_queues_requests(self):
+        """Requests beyond the burst wait for tokens instead of failing"""
+        bucket = TokenBucket('test', rate=50, capacity=2)
+        start = time.monotonic()
+        for _ in range(7):
+            bucket.acquire()
+        elapsed = time.monotonic() - start
+
+        # Two tokens are available at once, the other five arrive at 50 per second
+        self.assertGreaterEqual(elapsed, 0.09)
+        stats = bucket.stats()
+        self.assertEqual(stats['requests'], 7)
+        self.assertEqual(stats['waited_requests'], 5)
+        self.assertGreater(stats['max_wait_ms'], 0)
+
+    def test_retries_take_rate_limiter_tokens(self):
+        """Every retry of a 5xx or connection error waits for its own token"""
+        def response(status):
+            result = requests.Response()
+            result.status_code = status
+            result._content = b'{}'
+            result._content_consumed = True
+            return result
+
+        session = mock.Mock()
+        session.request.side_effect = [response(503), requests.exceptions.ConnectionError('reset'), response(200)]
+        with mock.patch.object(edgar_client, 'get_session', return_value=session), \
+                mock.patch.object(edgar_client.rate_limiter, 'acquire') as acquire, \
+                mock.patch.object(edgar_client.time, 'sleep') as sleep:
+            self.assertEqual(edgar_client.edgar_get('https://data.sec.gov/submissions/CIK0001937653.json').status_code, 200)
+
+        self.assertEqual(acquire.call_count, 3)
+        self.assertEqual([call.args[0] for call in sleep.call_args_list], [0.5, 1.0])
+        self.assertEqual(get_session().adapters['https://'].max_retries.total, 0)
+
+        # Other methods and exhausted retries return the error response
+        session.request.side_effect = [response(503)] * 4
+        with mock.patch.object(edgar_client, 'get_session', return_value=session), \
+                mock.patch.object(edgar_client.rate_limiter, 'acquire') as acquire, \
+                mock.patch.object(edgar_client.time, 'sleep'):
+            self.assertEqual(edgar_client.edgar_request('POST', 'https://efts.sec.gov/LATEST/search-index').status_code, 503)
+            self.assertEqual(edgar_client.edgar_get('https://www.sec.gov/cgi-bin/browse-edgar').status_code, 503)
+        self.assertEqual(acquire.call_count, 4)
+
+    def test_rate_limiter_shared_state(self):
+        """Buckets using the same state file draw from one budget"""
+        with tempfile.TemporaryDirectory() as tmp:
+            state_path = os.path.join(tmp, 'edgar.bucket')
+            first = TokenBucket('test', rate=1, capacity=2, state_path=state_path)
+            second = TokenBucket('test', rate=1, capacity=2, state_path=state_path)
+            self.assertTrue(first.stats()['shared_across_processes'])
+
+            self.assertEqual(first.acquire(), 0.0)
+            self.assertEqual(second.acquire(), 0.0)
+            # The shared bucket is now empty, so this reservation is due in about a second
+            self.assertGreater(second._reserve_shared(), 0.9)
+
+    def test_primary_document_resolution(self):
+        """The latest 10-K URL is built from submissions metadata without fetching index pages"""
+        with mock.patch.object(edgar_service, 'get_submissions', return_value=SUBMISSIONS), \
+                mock.patch.object(edgar_service, 'edgar_get') as edgar_get:
+            url = edgar_service.get_latest_10k('1937653')
+
+        self.assertEqual(url, 'https://www.sec.gov/Archives/edgar/data/1937653/000193765325000014/zyme-20241231.htm')
+        edgar_get.assert_not_called()
+
+        # Later lookups of the same filing are memoized
+        filing = {'accession_number': '0001937653-25-000014'}
+        self.assertEqual(edgar_service.resolve_filing_document('1937653', filing), url)
+
+    def test_10k_history(self):
+        """A multi-year history lists one original 10-K per fiscal year, most recent first"""
+        submissions = {'filings': {'recent': {
+            'form': ['10-K/A', '10-K', '10-K', '10-K'],
+            'accessionNumber': ['0001937653-25-000030', '0001937653-25-000014', '0001937653-24-000010', '0001937653-23-000008'],
+            'filingDate': ['2025-04-20', '2025-03-06', '2024-03-07', '2023-03-09'],
+            'reportDate': ['2024-12-31', '2024-12-31', '2023-12-31', '2022-12-31'],
+            'primaryDocument': ['zyme-10ka.htm', 'zyme-20241231.htm', 'zyme-20231231.htm', 'zyme-20221231.htm'],
+        }}}
+        with mock.patch.object(edgar_service, 'get_submissions', return_value=submissions), \
+                mock.patch.object(edgar_service, 'edgar_get') as edgar_get:
+            history = edgar_service.get_10k_history('1937653', 2)
+
+        self.assertEqual([filing['accession_number'] for filing in history], ['0001937653-25-000014', '0001937653-24-000010'])
+        self.assertEqual(history[1]['url'], 'https://www.sec.gov/Archives/edgar/data/1937653/000193765324000010/zyme-20231231.htm')
+        edgar_get.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+import datetime
+import os
+import unittest
+
+from flask_testing import TestCase
+
+from app import app, db
+from models import Document, Processing
+from services import job_queue
+
+FILING_GROUP = 'c0ffee00-0000-4000-8000-000000000037'
+
+
+class EdgarHistoryTestCase(TestCase):
+    def create_app(self):
+        app.config['TESTING'] = True
+        app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get("DATABASE_URL")
+        return app
+
+    def setUp(self):
+        job_queue.stop_job_workers()
+        db.create_all()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+
+    def add_filing(self, year, status):
+        document = Document(title=f'10-K Filing: History Corp (FY{year})', content_type='edgar', cik='9990037',
+                            filing_group=FILING_GROUP, form_type='10-K', processed=status == 'completed',
+                            filing_date=datetime.date(year + 1, 2, 20))
+        db.session.add(document)
+        db.session.commit()
+        db.session.add(Processing(document_id=document.id, status=status))
+        db.session.commit()
+        return document
+
+    def test_history_status(self):
+        self.add_filing(2024, 'completed')
+        self.add_filing(2023, 'completed')
+        cancelled = self.add_filing(2022, 'processing')
+
+        response = self.client.get(f'/edgar/api/history/group/{FILING_GROUP}')
+        self.assertEqual([filing['status'] for filing in response.json['filings']], ['completed', 'completed', 'processing'])
+        self.assertFalse(response.json['finished'])
+
+        # A cancelled filing is as final as a failed one: the page stops refreshing
+        response = self.client.post(f'/api/processing/{cancelled.id}/cancel')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(self.client.get(f'/edgar/api/history/group/{FILING_GROUP}').json['finished'])
+
+        page = self.client.get(f'/edgar/history/group/{FILING_GROUP}').get_data(as_text=True)
+        self.assertNotIn('http-equiv="refresh"', page)
+        self.assertIn('Cancelled', page)
+        self.assertNotIn('disabled', page[page.index('Compare Filings') - 200:page.index('Compare Filings')])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+import json
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from services import edgar_cassette, edgar_client, edgar_service
+from services.cache_service import disk_cache
+from services.edgar_cassette import CassetteMiss, CassetteStore
+from services.edgar_standin import start_standin
+from services.http_cache import cached_get
+
+CIK = '9990001'
+SUBMISSIONS_URL = 'https://data.sec.gov/submissions/CIK0009990001.json'
+DOCUMENT_URL = 'https://www.sec.gov/Archives/edgar/data/9990001/000999000125000001/test-20241231.htm'
+
+SUBMISSIONS = {
+    'name': 'Stand-in Test Corp',
+    'filings': {'recent': {
+        'form': ['10-K'],
+        'accessionNumber': ['0009990001-25-000001'],
+        'filingDate': ['2025-03-01'],
+        'reportDate': ['2024-12-31'],
+        'primaryDocument': ['test-20241231.htm'],
+    }},
+}
+
+DOCUMENT = (
+    '<html><body><div style="display:none"><ix:header>hidden</ix:header></div>'
+    + ''.join(f'<p>Item {i}. The company reported revenue growth in fiscal year 2024.</p>' for i in range(40))
+    + '</body></html>'
+).encode('utf-8')
+
+
+class EdgarStandinTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        store = CassetteStore(self.directory)
+        store.save('GET', SUBMISSIONS_URL, 200, json.dumps(SUBMISSIONS).encode(),
+                   {'Content-Type': 'application/json', 'ETag': '"v1"'})
+        store.save('GET', DOCUMENT_URL, 200, DOCUMENT, {'Content-Type': 'text/html'})
+
+    def tearDown(self):
+        disk_cache.delete(f"http:{SUBMISSIONS_URL}")
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_pipeline_through_standin(self):
+        """The 10-K lookup and extraction run against the local stand-in, including a 304 revalidation"""
+        server, base_url = start_standin(self.directory)
+        try:
+            with mock.patch.object(edgar_client, 'EDGAR_STANDIN_URL', base_url):
+                url = edgar_service.get_latest_10k(CIK)
+                text = edgar_service.extract_10k_content(url)
+                cached_get(SUBMISSIONS_URL, fresh_for=0)
+        finally:
+            server.shutdown()
+
+        self.assertEqual(url, DOCUMENT_URL)
+        self.assertIn('Item 39. The company reported revenue growth', text)
+        self.assertNotIn('hidden', text)
+        self.assertEqual(server.config.stats['served'], 2)
+        self.assertEqual(server.config.stats['not_modified'], 1)
+
+    def test_error_injection(self):
+        server, base_url = start_standin(self.directory, error_rate=1.0, error_status=429)
+        try:
+            with mock.patch.object(edgar_client, 'EDGAR_STANDIN_URL', base_url):
+                response = edgar_client.edgar_get(DOCUMENT_URL)
+        finally:
+            server.shutdown()
+
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(server.config.stats['injected_errors'], 1)
+
+    def test_cassette_replay(self):
+        """Replay mode serves recordings without any network request and fails on unrecorded URLs"""
+        with mock.patch.object(edgar_cassette, 'EDGAR_CASSETTE_MODE', 'replay'), \
+                mock.patch.object(edgar_cassette, 'EDGAR_CASSETTE_DIR', self.directory), \
+                mock.patch.object(edgar_client, 'get_session') as get_session:
+            response = edgar_client.edgar_get(SUBMISSIONS_URL)
+            with self.assertRaises(CassetteMiss):
+                edgar_client.edgar_get('https://www.sec.gov/not-recorded')
+
+        self.assertEqual(response.json()['name'], 'Stand-in Test Corp')
+        self.assertEqual(response.headers['ETag'], '"v1"')
+        get_session.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
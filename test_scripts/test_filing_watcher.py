@@ -0,0 +1,116 @@
+import datetime
+import os
+import unittest
+from unittest import mock
+
+from flask_testing import TestCase
+
+from app import app, db
+from models import Document, Insight
+from services import filing_watcher
+from services.filing_sections import build_section_index
+
+BASE_URL = 'https://www.sec.gov/Archives/edgar/data/9990004/000999000425000002/watch-20241231.htm'
+AMENDMENT_URL = 'https://www.sec.gov/Archives/edgar/data/9990004/000999000425000007/watch-20241231x10ka.htm'
+
+
+def filing_text(sections):
+    return '\n'.join(f"Item {item}. {title}\n" + ' '.join([body] * 40) for item, title, body in sections)
+
+
+BASE_TEXT = filing_text([
+    ('1', 'Business', 'The company designs and sells industrial sensors to manufacturers worldwide.'),
+    ('1A', 'Risk Factors', 'Demand for sensors depends on capital spending by manufacturers.'),
+    ('7', "Management's Discussion and Analysis", 'Revenue increased twelve percent on higher sensor volumes.'),
+    ('10', 'Directors and Executive Officers', 'The board has seven directors, five of them independent.'),
+])
+
+# A Part III amendment restates only Item 10
+AMENDMENT_TEXT = filing_text([
+    ('10', 'Directors and Executive Officers', 'The board now has nine directors after two appointments in March, eight independent.'),
+])
+
+TEXTS = {BASE_URL: BASE_TEXT, AMENDMENT_URL: AMENDMENT_TEXT}
+
+
+class FilingWatcherTestCase(TestCase):
+    def create_app(self):
+        app.config['TESTING'] = True
+        app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get("DATABASE_URL")
+        return app
+
+    def setUp(self):
+        db.create_all()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+
+    def test_section_diff(self):
+        base_sections = build_section_index(BASE_TEXT)
+        amended_sections = build_section_index(AMENDMENT_TEXT)
+        changes = filing_watcher.diff_sections(BASE_TEXT, base_sections, AMENDMENT_TEXT, amended_sections, amendment=True)
+
+        self.assertEqual(changes['1'], 0.0)
+        self.assertGreater(changes['10'], 0.5)
+        self.assertEqual(
+            filing_watcher.categories_to_regenerate(['business_summary', 'financial', 'management', 'red_flags'], changes),
+            ['management']
+        )
+
+        merged = filing_watcher.merge_amended_sections(BASE_TEXT, base_sections, AMENDMENT_TEXT, amended_sections)
+        self.assertIn('nine directors', merged)
+        self.assertNotIn('seven directors', merged)
+        self.assertIn('industrial sensors', merged)
+
+    def test_amendment_reuses_unchanged_insights(self):
+        base = Document(url=BASE_URL, content_type='edgar', cik='9990004', processed=True, form_type='10-K',
+                        accession_number='0009990004-25-000002', filing_date=datetime.date(2025, 2, 20))
+        db.session.add(base)
+        db.session.commit()
+        for category in ('business_summary', 'moat', 'financial', 'management'):
+            db.session.add(Insight(document_id=base.id, category=category, content=f'<p>old {category}</p>'))
+        db.session.commit()
+
+        filing = {'form_type': '10-K/A', 'accession_number': '0009990004-25-000007',
+                  'filing_date': '2025-04-28', 'url': AMENDMENT_URL}
+        self.assertEqual(filing_watcher.find_base_document('9990004', filing).id, base.id)
+
+        def fake_generate(content, filter_categories=None, financial_context=None):
+            return {category: f'<p>new {category}</p>' for category in filter_categories}
+
+        with mock.patch.object(filing_watcher, 'get_filing_text', side_effect=TEXTS.get), \
+                mock.patch.object(filing_watcher, 'get_filing_sections',
+                                  side_effect=lambda url, form: build_section_index(TEXTS[url], form)), \
+                mock.patch.object(filing_watcher, 'get_financial_context', return_value=None), \
+                mock.patch.object(filing_watcher, 'generate_insights', side_effect=fake_generate) as generate:
+            document = filing_watcher.analyze_incrementally('9990004', 'Watch Corp', filing, base)
+
+        self.assertEqual(generate.call_args.kwargs['filter_categories'], ['management'])
+        self.assertIn('nine directors', generate.call_args.args[0])
+        insights = {insight.category: insight.content for insight in document.insights}
+        self.assertEqual(insights['management'], '<p>new management</p>')
+        self.assertEqual(insights['business_summary'], '<p>old business_summary</p>')
+        self.assertTrue(document.processed)
+        self.assertEqual(document.base_document_id, base.id)
+
+    def test_analysis_of_latest_10k_can_be_a_base(self):
+        latest = {'form_type': '10-K', 'accession_number': '0009990004-25-000002', 'filing_date': '2025-02-20',
+                  'report_date': '2024-12-31', 'primary_document': 'watch-20241231.htm', 'url': BASE_URL}
+        with mock.patch('routes.edgar_routes.get_latest_10k_filing', return_value=latest):
+            response = self.client.get('/edgar/process/9990004?company_name=Watch+Corp')
+        self.assertEqual(response.status_code, 302)
+
+        document = Document.query.filter_by(url=BASE_URL).one()
+        self.assertEqual((document.form_type, document.accession_number, document.filing_date),
+                         ('10-K', '0009990004-25-000002', datetime.date(2025, 2, 20)))
+
+        document.processed = True
+        db.session.add(Insight(document_id=document.id, category='business_summary', content='<p>pumps</p>'))
+        db.session.commit()
+        filing = {'form_type': '10-K/A', 'accession_number': '0009990004-25-000007', 'filing_date': '2025-04-28'}
+        self.assertEqual(filing_watcher.find_base_document('9990004', filing).id, document.id)
+
+
+if __name__ == '__main__':
+    unittest.main()
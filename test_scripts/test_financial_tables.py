@@ -0,0 +1,90 @@
+import math
+import os
+import unittest
+from unittest import mock
+
+from services import ai_service, cache_service
+from services.ai_service import with_financial_context
+from services.pdf_parser import extract_pdf_content
+from services.financial_tables import (
+    detect_statement_type, extract_financial_statements, format_statement_table,
+    pack_values, parse_value, unpack_values
+)
+
+ANNUAL_REPORT_PDF = os.path.join(
+    os.path.dirname(os.path.dirname(__file__)), 'uploads', '20250402003557_0001937653-25-000014.pdf'
+)
+
+
+class FinancialTablesTestCase(unittest.TestCase):
+    def test_parse_value(self):
+        """Statement cells are parsed with accounting conventions"""
+        self.assertEqual(parse_value('66,103'), 66103.0)
+        self.assertEqual(parse_value('(122,695)'), -122695.0)
+        self.assertEqual(parse_value('(1.62)'), -1.62)
+        self.assertEqual(parse_value('—'), 0.0)
+        self.assertIsNone(parse_value('Goodwill'))
+
+    def test_detect_statement_type(self):
+        """Statement headings are recognised, index pages are not"""
+        self.assertEqual(detect_statement_type('ZYMEWORKS INC.\nConsolidated Balance Sheets\n'), 'balance_sheet')
+        self.assertEqual(detect_statement_type('Consolidated Statements of Cash Flows\n'), 'cash_flow')
+        self.assertIsNone(detect_statement_type('Consolidated Balance Sheets as at December 31, 2024 and 2023 96\n'))
+
+    def test_pack_values(self):
+        """Typed arrays survive a round trip through bytes, including empty cells"""
+        values = unpack_values(pack_values([1.5, math.nan, -3.0]))
+        self.assertEqual(values[0], 1.5)
+        self.assertTrue(math.isnan(values[1]))
+        self.assertEqual(values[2], -3.0)
+
+    def test_extract_statements_from_annual_report(self):
+        """Statements skipped by page sampling are found and parsed into rows"""
+        content = extract_pdf_content(ANNUAL_REPORT_PDF)
+        statements = extract_financial_statements(ANNUAL_REPORT_PDF, content)
+        by_type = {statement['statement_type']: statement for statement in statements}
+
+        self.assertEqual(set(by_type), {'balance_sheet', 'income_statement', 'cash_flow'})
+
+        income = by_type['income_statement']
+        self.assertEqual(income['periods'], ['2024', '2023', '2022'])
+        self.assertEqual(income['units'], 'thousands')
+        row = income['line_items'].index('(Loss) income from operations')
+        self.assertEqual(list(income['values'][row * 3:row * 3 + 3]), [-137110.0, -138053.0, 130528.0])
+
+        table = format_statement_table(by_type['balance_sheet'])
+        self.assertIn('Total assets | 463091 | 580880', table)
+
+    def test_tables_replace_part_of_the_prompt_text(self):
+        """Financial prompts get the tables instead of the end of the text, not on top of it"""
+        text = 'Revenue grew in every segment. ' * 200
+        tables = 'INCOME STATEMENT (thousands)\nLine item | 2024 | 2023\nRevenue | 66103 | 58291\n'
+        prompt = with_financial_context('financial', text, tables)
+        self.assertTrue(prompt.startswith('STRUCTURED FINANCIAL DATA'))
+        self.assertLessEqual(len(prompt), len(text) + 100)
+        self.assertEqual(with_financial_context('moat', text, tables), text)
+        self.assertIn(text[:len(text) // 4], with_financial_context('financial', text, tables * 100))
+
+    def test_financial_context_is_part_of_the_cache_key(self):
+        """Responses for a long document with and without tables are cached apart"""
+        content = 'Item 7. Management discussion of results. ' * 2000  # Over the 50 KB that is hashed
+        tables = 'Revenue | 66103 | 58291'
+
+        def generate(content, categories, financial_context=None, *args):
+            return {'financial': f'<p>tables: {financial_context}</p>'}
+
+        with mock.patch.object(cache_service, 'disk_cache', {}), \
+                mock.patch.object(cache_service, 'memory_cache', {}), \
+                mock.patch.object(ai_service, 'generate_insights_with_openai', side_effect=generate) as openai:
+            without = ai_service.generate_insights(content, filter_categories=['financial'])
+            with_tables = ai_service.generate_insights(content, filter_categories=['financial'], financial_context=tables)
+            again = ai_service.generate_insights(content, filter_categories=['financial'], financial_context=tables)
+
+        self.assertEqual(without['financial'], '<p>tables: None</p>')
+        self.assertEqual(with_tables['financial'], f'<p>tables: {tables}</p>')
+        self.assertEqual(again, with_tables)
+        self.assertEqual(openai.call_count, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
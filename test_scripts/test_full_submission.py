@@ -0,0 +1,82 @@
+import unittest
+
+from services.filing_sections import select_content, TRUNCATION_MARKER
+from services.full_submission import list_documents, submission_to_text
+
+SUBMISSION = '''<SEC-DOCUMENT>0000320193-24-000123.txt : 20241101
+<SEC-HEADER>0000320193-24-000123.hdr.sgml : 20241101
+CONFORMED SUBMISSION TYPE:	10-K
+COMPANY CONFORMED NAME:			Apple Inc.
+</SEC-HEADER>
+<DOCUMENT>
+<TYPE>10-K
+<SEQUENCE>1
+<FILENAME>aapl-20240928.htm
+<DESCRIPTION>10-K
+<TEXT>
+<XBRL>
+<?xml version="1.0" encoding="utf-8"?>
+<html xmlns="http://www.w3.org/1999/xhtml"><body>
+<p>Item 7. Management's Discussion and Analysis</p>
+<p>Net sales increased 2% during 2024.</p>
+</body></html>
+</XBRL>
+</TEXT>
+</DOCUMENT>
+<DOCUMENT>
+<TYPE>EX-21.1
+<SEQUENCE>2
+<FILENAME>a10-kexhibit2112024.htm
+<TEXT>
+<html><body><p>Subsidiaries of the registrant</p></body></html>
+</TEXT>
+</DOCUMENT>
+<DOCUMENT>
+<TYPE>GRAPHIC
+<SEQUENCE>3
+<FILENAME>logo.jpg
+<TEXT>
+begin 644 logo.jpg
+M_]C_X``02D9)1@`!`0$`8`!@``#_VP!#``,"`@,"`@,#`P,$`P,$!0@%!00$
+end
+</TEXT>
+</DOCUMENT>
+</SEC-DOCUMENT>
+'''
+
+
+class FullSubmissionTestCase(unittest.TestCase):
+    def test_keeps_only_primary_document(self):
+        documents = list_documents(SUBMISSION)
+        self.assertEqual([document['type'] for document in documents], ['10-K', 'EX-21.1', 'GRAPHIC'])
+
+        text = submission_to_text(SUBMISSION)
+        self.assertEqual(text.split('\n'), [
+            "Item 7. Management's Discussion and Analysis",
+            'Net sales increased 2% during 2024.',
+        ])
+        # Text that is not a full submission passes through
+        self.assertEqual(submission_to_text('Item 1. Business'), 'Item 1. Business')
+
+    def test_select_content_keeps_key_sections(self):
+        filler = 'Routine disclosure sentence about the company.\n'
+        text = ('Annual Report on Form 10-K\n'
+                + 'Item 1. Business\n' + 'We design smartphones.\n' * 200
+                + 'Item 1A. Risk Factors\n' + 'Supply chain risk.\n' * 200
+                + 'Item 2. Properties\n' + filler * 2000
+                + 'Item 7. Management’s Discussion and Analysis\n' + 'Net sales increased.\n' * 2000
+                + 'Item 15. Exhibits\n' + filler * 2000)
+        selected = select_content(text, 20000)
+
+        self.assertLessEqual(len(selected), 20000 + 3 * len(TRUNCATION_MARKER))
+        self.assertTrue(selected.startswith('Annual Report on Form 10-K\nItem 1. Business'))
+        # Business and risk factors fit whole; MD&A takes the rest of the budget
+        self.assertEqual(selected.count('We design smartphones.'), 200)
+        self.assertEqual(selected.count('Supply chain risk.'), 200)
+        self.assertIn('Item 7. Management’s Discussion and Analysis\nNet sales increased.', selected)
+        self.assertNotIn('Item 15. Exhibits', selected)
+        self.assertEqual(select_content('short text', 20000), 'short text')
+
+
+if __name__ == '__main__':
+    unittest.main()
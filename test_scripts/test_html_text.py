@@ -0,0 +1,45 @@
+import unittest
+
+from services.html_text import html_to_text
+
+IXBRL_DOCUMENT = '''<?xml version="1.0" encoding="utf-8"?>
+<html xmlns="http://www.w3.org/1999/xhtml" xmlns:ix="http://www.xbrl.org/2013/inlineXBRL">
+<head><title>aapl-20240928</title><style>p { margin: 0 }</style><script>var x = 1;</script></head>
+<body>
+<div style="display:none"><ix:header><ix:hidden>HiddenFact</ix:hidden><ix:resources>ContextData</ix:resources></ix:header></div>
+<div><span style="font-weight:700">Item 7.</span> <span>Management&#8217;s Discussion</span></div>
+<p>Net sales increased&#160;&#160;2% during 2024.</p>
+<!-- filing agent comment -->
+<table>
+<tr><td>Total net sales</td><td>$</td><td><ix:nonFraction name="us-gaap:Revenues">391,035</ix:nonFraction></td></tr>
+</table>
+</body>
+</html>'''
+
+
+class HtmlTextTestCase(unittest.TestCase):
+    def test_extracts_paragraphs_and_table_rows(self):
+        text = html_to_text(IXBRL_DOCUMENT)
+        self.assertEqual(text.split('\n'), [
+            'Item 7. Management’s Discussion',
+            'Net sales increased 2% during 2024.',
+            'Total net sales $ 391,035',
+        ])
+
+    def test_text_after_skipped_elements_appears_once(self):
+        html = (b'<p>Revenue<script>track()</script> grew 4%</p>'
+                b'<div>Net income<span style="display:none">HiddenFact</span> of $9.1 billion</div>'
+                b'<div>Item 8.<div style="display:none">Context</div> Financial Statements</div>')
+        self.assertEqual(html_to_text(html).split('\n'), [
+            'Revenue grew 4%',
+            'Net income of $9.1 billion',
+            'Item 8. Financial Statements',
+        ])
+
+    def test_bytes_and_str_input_match(self):
+        self.assertEqual(html_to_text(IXBRL_DOCUMENT.encode('utf-8')), html_to_text(IXBRL_DOCUMENT))
+        self.assertEqual(html_to_text(b''), '')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+import json
+import unittest
+import uuid
+
+import requests
+
+from services.cache_service import disk_cache
+from services.http_cache import cached_get_json
+
+
+def make_response(status_code, body=b'', headers=None):
+    response = requests.Response()
+    response.status_code = status_code
+    response._content = body
+    response.headers.update(headers or {})
+    return response
+
+
+class FakeServer:
+    """Serves a JSON document with an ETag and answers conditional requests with 304"""
+
+    def __init__(self, document, etag):
+        self.document = document
+        self.etag = etag
+        self.requests = []
+
+    def get(self, url, headers=None):
+        self.requests.append(dict(headers or {}))
+        if headers and headers.get('If-None-Match') == self.etag:
+            return make_response(304)
+        return make_response(200, json.dumps(self.document).encode(), {'ETag': self.etag})
+
+
+class HttpCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self.url = f"https://data.sec.gov/submissions/test-{uuid.uuid4().hex}.json"
+
+    def tearDown(self):
+        disk_cache.delete(f"http:{self.url}")
+
+    def test_conditional_revalidation(self):
+        """Unchanged documents are revalidated with a 304 and not parsed again"""
+        server = FakeServer({'name': 'Apple Inc.'}, '"v1"')
+
+        first = cached_get_json(self.url, fetch=server.get, fresh_for=0)
+        second = cached_get_json(self.url, fetch=server.get, fresh_for=0)
+
+        self.assertEqual(first, {'name': 'Apple Inc.'})
+        self.assertIs(second, first)
+        self.assertEqual(server.requests[1], {'If-None-Match': '"v1"'})
+
+        # A changed document is downloaded and parsed again
+        server.document, server.etag = {'name': 'Apple Inc. (new)'}, '"v2"'
+        third = cached_get_json(self.url, fetch=server.get, fresh_for=0)
+        self.assertEqual(third, {'name': 'Apple Inc. (new)'})
+
+    def test_fresh_copy_skips_network(self):
+        """Recently validated copies are served without a request"""
+        server = FakeServer({'name': 'Apple Inc.'}, '"v1"')
+        cached_get_json(self.url, fetch=server.get)
+        cached_get_json(self.url, fetch=server.get)
+        self.assertEqual(len(server.requests), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
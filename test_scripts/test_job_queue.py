@@ -0,0 +1,119 @@
+import datetime
+import os
+import unittest
+from unittest import mock
+
+from flask_testing import TestCase
+
+from app import app, db
+from models import Document, Processing, Job
+from services import job_queue
+
+
+class JobQueueTestCase(TestCase):
+    def create_app(self):
+        app.config['TESTING'] = True
+        app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get("DATABASE_URL")
+        return app
+
+    def setUp(self):
+        # Jobs are claimed by the test, not by the app's background workers
+        job_queue.stop_job_workers()
+        db.create_all()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+
+    def add_document(self, title):
+        document = Document(title=title, content_type='url', url='https://example.com/report')
+        db.session.add(document)
+        db.session.commit()
+        db.session.add(Processing(document_id=document.id))
+        db.session.commit()
+        return document
+
+    def test_priority_retries_and_failure(self):
+        calls = []
+
+        def flaky(job):
+            calls.append(job.id)
+            raise RuntimeError('upstream timeout')
+
+        background = self.add_document('Background')
+        urgent = self.add_document('Urgent')
+        with mock.patch.dict(job_queue.JOB_HANDLERS, {'flaky': flaky}):
+            low = job_queue.enqueue('flaky', background.id, priority=job_queue.PRIORITY_BACKGROUND, max_attempts=2)
+            high = job_queue.enqueue('flaky', urgent.id, priority=job_queue.PRIORITY_INTERACTIVE, max_attempts=2)
+            # A second request for the same document reuses the queued job
+            self.assertEqual(job_queue.enqueue('flaky', urgent.id).id, high.id)
+
+            job = job_queue.claim_job('worker-a', kinds=['flaky'])
+            self.assertEqual(job.id, high.id)
+            self.assertFalse(job_queue.run_job(job, 'worker-a'))
+
+            job = Job.query.get(high.id)
+            self.assertEqual((job.status, job.attempts, job.last_error), ('queued', 1, 'upstream timeout'))
+            self.assertGreater(job.run_after, datetime.datetime.utcnow())
+            processing = Processing.query.filter_by(document_id=urgent.id).first()
+            self.assertEqual(processing.status, 'pending')
+            self.assertIn('retrying in 30 seconds', processing.error)
+
+            # While the retry waits, the lower priority job runs
+            job = job_queue.claim_job('worker-a', kinds=['flaky'])
+            self.assertEqual(job.id, low.id)
+            job_queue.run_job(job, 'worker-a')
+            self.assertIsNone(job_queue.claim_job('worker-a', kinds=['flaky']))
+
+            Job.query.filter_by(id=high.id).update({'run_after': datetime.datetime.utcnow()})
+            db.session.commit()
+            job = job_queue.claim_job('worker-b', kinds=['flaky'])
+            self.assertEqual((job.id, job.attempts), (high.id, 2))
+            job_queue.run_job(job, 'worker-b')
+
+        job = Job.query.get(high.id)
+        self.assertEqual(job.status, 'failed')
+        self.assertIsNotNone(job.finished_at)
+        self.assertEqual(Processing.query.filter_by(document_id=urgent.id).first().status, 'failed')
+        self.assertEqual(calls, [high.id, low.id, high.id])
+        self.assertEqual(job_queue.retry_delay(3), 120)
+
+    def test_expired_lease_and_startup_recovery(self):
+        finished = []
+
+        def slow(job):
+            finished.append(job.id)
+            Document.query.get(job.document_id).processed = True
+            db.session.commit()
+
+        document = self.add_document('Leased')
+        with mock.patch.dict(job_queue.JOB_HANDLERS, {'slow': slow}):
+            queued = job_queue.enqueue('slow', document.id)
+            self.assertEqual(job_queue.claim_job('worker-a', kinds=['slow']).id, queued.id)
+            self.assertIsNone(job_queue.claim_job('worker-b', kinds=['slow']))
+
+            # worker-a dies; once its lease runs out worker-b takes the job over
+            Job.query.filter_by(id=queued.id).update({'lease_expires_at': datetime.datetime.utcnow() - datetime.timedelta(seconds=1)})
+            db.session.commit()
+            job = job_queue.claim_job('worker-b', kinds=['slow'])
+            self.assertEqual((job.id, job.worker_id, job.attempts), (queued.id, 'worker-b', 2))
+            self.assertFalse(job_queue._update_owned_job(queued.id, 'worker-a', {'status': 'completed'}))
+            self.assertTrue(job_queue.run_job(job, 'worker-b'))
+        self.assertEqual(Job.query.get(queued.id).status, 'completed')
+        self.assertEqual(finished, [queued.id])
+
+        # A document left processing by a killed thread, with no job, is queued again once
+        orphan = self.add_document('Orphan')
+        Processing.query.filter_by(document_id=orphan.id).update({'status': 'processing'})
+        old = self.add_document('Old')
+        Processing.query.filter_by(document_id=old.id).update({'started_at': datetime.datetime.utcnow() - datetime.timedelta(days=3)})
+        db.session.commit()
+        self.assertEqual(job_queue.recover_orphaned_jobs(), 1)
+        self.assertEqual(job_queue.recover_orphaned_jobs(), 0)
+        job = Job.query.filter_by(document_id=orphan.id).one()
+        self.assertEqual((job.kind, job.status, job.priority), ('process_document', 'queued', job_queue.PRIORITY_INTERACTIVE))
+        self.assertEqual(Processing.query.filter_by(document_id=orphan.id).first().status, 'pending')
+
+
+if __name__ == '__main__':
+    unittest.main()
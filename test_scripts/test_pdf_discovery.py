@@ -0,0 +1,66 @@
+import asyncio
+import unittest
+
+import httpx
+
+from services import pdf_discovery
+
+INVESTOR_PAGE = '''<html><body>
+<a href="/legal/privacy-policy.pdf">Privacy Policy</a>
+<a href="/reports/ar-2021.pdf">2021 Annual Report</a>
+<a href="reports/ar-2024.pdf">2024 Annual Report</a>
+<a href="https://cdn.example.net/files/ar-2024-summary.pdf">2024 Annual Report (summary)</a>
+<a href="/reports/q3-presentation.pdf">Q3 investor presentation</a>
+<a href="/about">About us</a>
+</body></html>'''
+
+SIZES = {
+    '/reports/ar-2021.pdf': 4000000,
+    '/investors/reports/ar-2024.pdf': 6500000,
+    '/files/ar-2024-summary.pdf': 90000,
+    '/reports/q3-presentation.pdf': 2000000,
+}
+
+
+class PdfDiscoveryTestCase(unittest.TestCase):
+    def test_ranks_latest_full_annual_report_first(self):
+        active = {}
+        peak = {}
+        requested = []
+
+        async def handler(request):
+            host = request.url.host
+            active[host] = active.get(host, 0) + 1
+            peak[host] = max(peak.get(host, 0), active[host])
+            requested.append((request.method, request.url.path))
+            await asyncio.sleep(0.01)
+            active[host] -= 1
+            return httpx.Response(200, headers={'Content-Length': str(SIZES[request.url.path])})
+
+        candidates = pdf_discovery.rank_pdf_links(
+            INVESTOR_PAGE, 'https://www.example.com/investors/', transport=httpx.MockTransport(handler)
+        )
+
+        self.assertEqual(candidates[0]['url'], 'https://www.example.com/investors/reports/ar-2024.pdf')
+        self.assertEqual(candidates[0]['size'], 6500000)
+        # The small summary ranks below the full report of the same year; policies and
+        # presentations are never considered
+        urls = [candidate['url'] for candidate in candidates]
+        self.assertGreater(urls.index('https://cdn.example.net/files/ar-2024-summary.pdf'), 0)
+        self.assertNotIn('https://www.example.com/legal/privacy-policy.pdf', urls)
+        self.assertNotIn('https://www.example.com/reports/q3-presentation.pdf', urls)
+        self.assertTrue(all(method == 'HEAD' for method, _ in requested))
+        self.assertLessEqual(max(peak.values()), pdf_discovery.PDF_DISCOVERY_PER_HOST)
+
+    def test_oversized_candidates_are_skipped(self):
+        transport = httpx.MockTransport(
+            lambda request: httpx.Response(200, headers={'Content-Length': str(SIZES.get(request.url.path, 0))})
+        )
+        candidates = pdf_discovery.rank_pdf_links(
+            INVESTOR_PAGE, 'https://www.example.com/investors/', max_bytes=5000000, transport=transport
+        )
+        self.assertEqual(candidates[0]['url'], 'https://www.example.com/reports/ar-2021.pdf')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import os
+import unittest
+
+from services.pdf_parser import extract_pdf_content, extract_pages_parallel
+from services.extraction_metrics import ExtractionMetrics, get_latest_run_for_document
+
+ANNUAL_REPORT_PDF = os.path.join(
+    os.path.dirname(os.path.dirname(__file__)), 'uploads', '20250402003557_0001937653-25-000014.pdf'
+)
+SAMPLE_PDF = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'uploads', 'sample_annual_report.pdf')
+
+
+class PdfParserTestCase(unittest.TestCase):
+    def test_small_pdf_extraction(self):
+        """Small PDFs are read in full with page markers"""
+        content = extract_pdf_content(SAMPLE_PDF)
+        self.assertTrue(content.startswith('[Page 1]'))
+        self.assertIn('SAMPLE COMPANY ANNUAL REPORT', content)
+
+    def test_extraction_metrics(self):
+        """Per-page timings are recorded on the metrics collector"""
+        metrics = ExtractionMetrics(document_id=-1, source='sample_annual_report.pdf')
+        extract_pdf_content(SAMPLE_PDF, metrics=metrics)
+
+        summary = metrics.summary()
+        self.assertEqual(summary['status'], 'completed')
+        self.assertEqual(summary['mode'], 'full')
+        self.assertEqual(summary['pages_extracted'], summary['total_pages'])
+        self.assertEqual(summary['histogram'][-1]['count'], summary['pages_extracted'])
+        self.assertEqual(summary['error_count'], 0)
+        self.assertEqual(summary['slowest_pages'][0]['page'], 1)
+
+        # The run is visible to the metrics endpoint
+        self.assertEqual(get_latest_run_for_document(-1)['run_id'], summary['run_id'])
+
+    def test_metrics_errors(self):
+        """Extractor errors are counted and kept per page"""
+        metrics = ExtractionMetrics()
+        metrics.record_page(0, 0.002, 100)
+        metrics.record_page(1, 0.4, 50)
+        metrics.record_error(1, ValueError('bad xref'))
+
+        summary = metrics.summary()
+        self.assertEqual(summary['error_count'], 1)
+        self.assertEqual(summary['errors'][0], {'page': 2, 'error': 'bad xref'})
+        self.assertEqual(summary['slowest_pages'][0]['page'], 2)
+        self.assertEqual(summary['histogram'][0], {'le_ms': 5, 'count': 1})
+
+    def test_char_budget_stops_early(self):
+        """Extraction stops at the character budget and reports progress"""
+        progress = []
+        metrics = ExtractionMetrics()
+        content = extract_pages_parallel(
+            ANNUAL_REPORT_PDF, list(range(60)), 198, metrics,
+            progress_callback=lambda done, total: progress.append((done, total)),
+            char_budget=5000
+        )
+
+        self.assertEqual(metrics.stop_reason, 'char_budget')
+        self.assertLess(len(content), 5000 + 200)
+        self.assertTrue(content.startswith('[Page 1]'))
+        self.assertEqual(progress[0], (0, 60))
+        self.assertLess(progress[-1][0], 60)
+
+
+if __name__ == '__main__':
+    unittest.main()
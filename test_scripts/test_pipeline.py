@@ -0,0 +1,109 @@
+import os
+import unittest
+from unittest import mock
+
+from flask_testing import TestCase
+
+from app import app, db
+from models import Document, Insight, Processing
+from services import job_queue
+from services.document_processor import process_document, get_document_content
+from services.pipeline import get_stages, completed_output, STAGE_EXTRACT
+from services.text_store import content_hash
+
+FILING_URL = 'https://www.sec.gov/Archives/edgar/data/9990010/000999001025000002/resume-20241231.htm'
+FILING_TEXT = 'Item 1. Business\nResume Corp makes industrial pumps. ' * 40
+
+
+class PipelineTestCase(TestCase):
+    def create_app(self):
+        app.config['TESTING'] = True
+        app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get("DATABASE_URL")
+        return app
+
+    def setUp(self):
+        job_queue.stop_job_workers()
+        db.create_all()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+
+    def test_retry_resumes_after_completed_stages(self):
+        document = Document(title='10-K Filing: Resume Corp', content_type='edgar', url=FILING_URL)
+        db.session.add(document)
+        db.session.commit()
+        db.session.add(Processing(document_id=document.id))
+        db.session.commit()
+
+        requested = []
+
+        def flaky_analysis(content, filter_categories=None, on_insight=None, **kwargs):
+            requested.append(list(filter_categories))
+            insights = {}
+            for number, category in enumerate(filter_categories):
+                if len(requested) == 1 and number == 2:
+                    raise ConnectionError('Connection reset by peer')
+                insights[category] = f"<p>{category} of Resume Corp</p>"
+                on_insight(category, insights[category])
+            return insights
+
+        with mock.patch('services.document_processor.get_filing_text', return_value=FILING_TEXT) as get_text, \
+                mock.patch('services.document_processor.get_financial_context', return_value='Revenue 10 20') as get_context, \
+                mock.patch('services.document_processor.generate_insights', side_effect=flaky_analysis), \
+                mock.patch('services.document_processor.record_api_usage'):
+            self.assertFalse(process_document(document.id))
+            self.assertEqual(Processing.query.filter_by(document_id=document.id).first().status, 'failed')
+
+            self.assertTrue(process_document(document.id))
+
+            # The text, financial context and first two insights came from the failed attempt
+            self.assertEqual(get_text.call_count, 1)
+            self.assertEqual(get_context.call_count, 1)
+            self.assertEqual(requested[1], requested[0][2:])
+
+            # Regeneration reads the stored text
+            self.assertEqual(get_document_content(Document.query.get(document.id)), FILING_TEXT)
+            self.assertEqual(get_text.call_count, 1)
+
+        self.assertEqual(Insight.query.filter_by(document_id=document.id).count(), len(requested[0]))
+        self.assertEqual(completed_output(document.id, STAGE_EXTRACT), content_hash(FILING_TEXT))
+        stages = {stage.stage: (stage.status, stage.attempts) for stage in get_stages(document.id)}
+        self.assertEqual(stages['fetch'], ('completed', 1))
+        self.assertEqual(stages[f"analyze:{requested[0][0]}"], ('completed', 1))
+        self.assertEqual(stages[f"analyze:{requested[0][2]}"], ('completed', 1))
+        self.assertEqual(stages['persist'], ('completed', 1))
+
+        response = self.client.get(f'/api/processing/{document.id}')
+        self.assertIn({'stage': 'persist', 'status': 'completed'}, response.json['stages'])
+
+    def test_missing_categories_are_generated_through_the_pipeline(self):
+        document = Document(title='10-K Filing: Resume Corp', content_type='edgar', url=FILING_URL)
+        db.session.add(document)
+        db.session.commit()
+        db.session.add(Processing(document_id=document.id))
+        db.session.commit()
+
+        calls = []
+
+        def partial_analysis(content, filter_categories=None, cancel_token=None, on_insight=None, **kwargs):
+            calls.append((list(filter_categories), cancel_token))
+            # The first response (e.g. an older cache entry) lacks red_flags
+            return {category: f"<p>{category}</p>" for category in filter_categories
+                    if len(calls) > 1 or category != 'red_flags'}
+
+        with mock.patch('services.document_processor.get_filing_text', return_value=FILING_TEXT), \
+                mock.patch('services.document_processor.get_financial_context', return_value=None), \
+                mock.patch('services.document_processor.generate_insights', side_effect=partial_analysis), \
+                mock.patch('services.document_processor.record_api_usage'):
+            self.assertTrue(process_document(document.id))
+
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(calls[1][0], ['red_flags'])
+        self.assertIs(calls[1][1], calls[0][1])
+        self.assertIsNotNone(calls[1][1])
+        self.assertEqual(completed_output(document.id, 'analyze:red_flags'), '<p>red_flags</p>')
+
+
+if __name__ == '__main__':
+    unittest.main()
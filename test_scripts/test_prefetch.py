@@ -0,0 +1,89 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from flask_testing import TestCase
+
+from app import app, db
+from models import Document
+from services import edgar_cassette
+from services.cache_service import disk_cache
+from services.edgar_cassette import CassetteStore
+from services.prefetch import run_prefetch
+
+CIK = '9990003'
+SUBMISSIONS_URL = 'https://data.sec.gov/submissions/CIK0009990003.json'
+ARCHIVE = 'https://www.sec.gov/Archives/edgar/data/9990003'
+TENK_URL = f'{ARCHIVE}/000999000325000002/watch-20241231.htm'
+TENQ_URL = f'{ARCHIVE}/000999000325000005/watch-20250331.htm'
+
+SUBMISSIONS = {
+    'name': 'Watchlist Test Corp',
+    'filings': {'recent': {
+        'form': ['10-Q', '4', '10-K', '10-Q'],
+        'accessionNumber': ['0009990003-25-000005', '0009990003-25-000004', '0009990003-25-000002', '0009990003-24-000009'],
+        'filingDate': ['2025-05-01', '2025-04-01', '2025-02-20', '2024-11-01'],
+        'reportDate': ['2025-03-31', '', '2024-12-31', '2024-09-30'],
+        'primaryDocument': ['watch-20250331.htm', 'form4.xml', 'watch-20241231.htm', 'watch-20240930.htm'],
+    }},
+}
+
+
+def filing_html(sections):
+    body = ''.join(f'<p>Item {item}. {title}</p>' + f'<p>{title} discussion. </p>' * 30 for item, title in sections)
+    return f'<html><body>{body}</body></html>'.encode('utf-8')
+
+
+class PrefetchTestCase(TestCase):
+    def create_app(self):
+        app.config['TESTING'] = True
+        app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get("DATABASE_URL")
+        return app
+
+    def setUp(self):
+        db.create_all()
+        self.directory = tempfile.mkdtemp()
+        store = CassetteStore(self.directory)
+        store.save('GET', SUBMISSIONS_URL, 200, json.dumps(SUBMISSIONS).encode(), {'Content-Type': 'application/json'})
+        store.save('GET', TENK_URL, 200, filing_html([('1', 'Business'), ('1A', 'Risk Factors'), ('7', 'MD&A')]))
+        store.save('GET', TENQ_URL, 200, filing_html([('1', 'Financial Statements'), ('2', 'MD&A')]))
+
+    def tearDown(self):
+        for key in (f"http:{SUBMISSIONS_URL}", f"filing_text:{TENK_URL}", f"filing_sections:{TENK_URL}",
+                    f"filing_text:{TENQ_URL}", f"filing_sections:{TENQ_URL}"):
+            disk_cache.delete(key)
+        shutil.rmtree(self.directory, ignore_errors=True)
+        db.session.remove()
+        db.drop_all()
+
+    def test_prefetch_extracts_latest_filings_once(self):
+        with mock.patch.object(edgar_cassette, 'EDGAR_CASSETTE_MODE', 'replay'), \
+                mock.patch.object(edgar_cassette, 'EDGAR_CASSETTE_DIR', self.directory):
+            first = run_prefetch(watchlist=[CIK], analyze=False)
+            second = run_prefetch(watchlist=[CIK], analyze=False)
+
+        self.assertEqual(first['extracted'], 2)
+        self.assertEqual(second['current'], 2)
+        sections = disk_cache.get(f"filing_sections:{TENK_URL}")
+        self.assertEqual([section['item'] for section in sections], ['1', '1A', '7'])
+
+    def test_process_10k_reuses_prefetched_analysis(self):
+        document = Document(url=TENK_URL, content_type='edgar', cik=CIK, prefetched=True, processed=True)
+        db.session.add(document)
+        db.session.commit()
+
+        with mock.patch('routes.edgar_routes.get_latest_10k_filing',
+                        return_value={'form_type': '10-K', 'accession_number': '0009990003-25-000001',
+                                      'filing_date': '2025-02-14', 'url': TENK_URL}):
+            response = self.client.get(f'/edgar/process/{CIK}?company_name=Watchlist+Test+Corp')
+
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(response.location.endswith(f'/insights/{document.id}'))
+        self.assertEqual(Document.query.count(), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+import os
+import unittest
+from unittest import mock
+
+from flask_testing import TestCase
+
+from app import app, db
+from models import Document, DocumentText
+from services import job_queue, text_store
+from services.document_processor import get_document_content, run_extract_stage
+from services.pipeline import completed_output, record_stage, STAGE_FETCH, STAGE_EXTRACT
+
+FILING_URL = 'https://www.sec.gov/Archives/edgar/data/9990011/000999001124000003/store-20231231.htm'
+FILING_TEXT = 'Item 7. Management’s Discussion\nStore Corp sold 12% more valves. ' * 200
+
+
+class TextStoreTestCase(TestCase):
+    def create_app(self):
+        app.config['TESTING'] = True
+        app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get("DATABASE_URL")
+        return app
+
+    def setUp(self):
+        job_queue.stop_job_workers()
+        db.create_all()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+
+    def add_document(self, url=None):
+        document = Document(title='10-K Filing: Store Corp', content_type='edgar', cik='9990011', url=url)
+        db.session.add(document)
+        db.session.commit()
+        return document
+
+    def test_text_is_stored_once_and_compressed(self):
+        document = self.add_document(FILING_URL)
+
+        digest = text_store.save_document_text(document.id, FILING_TEXT)
+        self.assertEqual(text_store.save_document_text(document.id, FILING_TEXT), digest)
+
+        stored = DocumentText.query.filter_by(document_id=document.id).all()
+        self.assertEqual(len(stored), 1)
+        self.assertEqual(stored[0].codec, 'zstd')
+        self.assertLess(len(stored[0].data), len(FILING_TEXT) // 10)
+        self.assertEqual(text_store.load_document_text(document.id, digest), FILING_TEXT)
+        self.assertIsNone(text_store.load_document_text(document.id, text_store.content_hash('other text')))
+
+        with mock.patch.object(text_store, 'ZSTANDARD_AVAILABLE', False):
+            codec, data = text_store.compress_text(FILING_TEXT)
+        self.assertEqual(codec, 'zlib')
+        self.assertEqual(text_store.decompress_text(codec, data), FILING_TEXT)
+
+    def test_regeneration_never_resolves_a_newer_filing(self):
+        # Processed before the text store existed
+        legacy = self.add_document(FILING_URL)
+        # Filing URL known only from the fetch stage
+        fetched = self.add_document()
+        record_stage(fetched.id, STAGE_FETCH, 'completed', output=FILING_URL)
+        unknown = self.add_document()
+
+        with mock.patch('services.document_processor.get_filing_text', return_value=FILING_TEXT) as get_text, \
+                mock.patch('services.edgar_service.get_latest_10k') as get_latest:
+            for document in (legacy, legacy, fetched, fetched):
+                self.assertEqual(get_document_content(document), FILING_TEXT)
+            self.assertIsNone(get_document_content(unknown))
+
+        get_latest.assert_not_called()
+        # Each document was extracted once, then read from the store
+        self.assertEqual(get_text.call_count, 2)
+        self.assertEqual(DocumentText.query.count(), 2)
+
+    def test_missing_text_is_extracted_again(self):
+        document = self.add_document(FILING_URL)
+        # The extract stage completed, but its stored text is gone
+        record_stage(document.id, STAGE_EXTRACT, 'completed', output=text_store.content_hash('lost text'))
+
+        with mock.patch('services.document_processor.get_filing_text', return_value=FILING_TEXT) as get_text:
+            self.assertEqual(run_extract_stage(document, FILING_URL, processing=None), FILING_TEXT)
+
+        get_text.assert_called_once_with(FILING_URL)
+        self.assertEqual(completed_output(document.id, STAGE_EXTRACT), text_store.content_hash(FILING_TEXT))
+
+if __name__ == '__main__':
+    unittest.main()
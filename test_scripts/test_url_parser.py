@@ -0,0 +1,185 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import requests
+from diskcache import Cache
+
+from services import edgar_cassette, edgar_client, http_cache, url_parser
+from services.pdf_parser import extract_pdf_content
+
+SAMPLE_PDF = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'uploads', 'sample_annual_report.pdf')
+
+COMPANY_PAGE = b'''<html><body><h1>Investors</h1>
+<a href="/files/report-2024.pdf">2024 Annual Report</a>
+</body></html>'''
+
+
+def make_response(url, body, content_type, status_code=200, headers=None):
+    response = requests.Response()
+    response.status_code = status_code
+    response.headers['Content-Type'] = content_type
+    response.headers.update(headers or {})
+    response._content = body
+    response._content_consumed = True
+    response.url = url
+    response.encoding = 'utf-8'
+    return response
+
+
+class UrlParserTestCase(unittest.TestCase):
+    def setUp(self):
+        url_parser._page_cache.clear()
+        self.cache_dir = tempfile.mkdtemp()
+        self.cache = Cache(self.cache_dir)
+        self.page_cache = Cache(os.path.join(self.cache_dir, 'pages'))
+        for patcher in (mock.patch.object(url_parser, 'disk_cache', self.cache),
+                        mock.patch.object(http_cache, 'page_cache', self.page_cache),
+                        mock.patch('services.pdf_discovery.head_sizes', side_effect=lambda urls, *args: [None] * len(urls))):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.responses = {
+            'https://example.com/investors': make_response('https://example.com/investors', COMPANY_PAGE, 'text/html'),
+            'https://example.com/files/report-2024.pdf': make_response(
+                'https://example.com/files/report-2024.pdf', b'%PDF-1.7 report', 'application/octet-stream'),
+        }
+
+    def tearDown(self):
+        self.cache.close()
+        self.page_cache.close()
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    def fake_get(self, url, **kwargs):
+        return self.responses[url]
+
+    def test_each_url_is_downloaded_once(self):
+        with mock.patch('services.url_parser.requests.get', side_effect=self.fake_get) as get, \
+                mock.patch('services.pdf_parser.extract_pdf_content', return_value='Annual report text') as extract_pdf:
+            url_parser.validate_url('https://example.com/investors')
+            content = url_parser.extract_url_content('https://example.com/investors')
+
+        self.assertEqual(content, 'Annual report text')
+        # Validation, extraction and PDF-link discovery share the page; the PDF is
+        # recognized by its leading bytes despite the generic content type
+        self.assertEqual([call.args[0] for call in get.call_args_list], [
+            'https://example.com/investors',
+            'https://example.com/files/report-2024.pdf',
+        ])
+        extract_pdf.assert_called_once()
+
+    def test_streamed_pdf_download(self):
+        url = 'https://example.com/sample.pdf'
+        with open(SAMPLE_PDF, 'rb') as f:
+            self.responses[url] = make_response(url, f.read(), 'application/pdf')
+
+        # Small memory limit, so the PDF spills to disk and is parsed through mmap
+        with mock.patch('services.url_parser.requests.get', side_effect=self.fake_get), \
+                mock.patch.object(url_parser, 'URL_PDF_MEMORY_BYTES', 1024):
+            self.assertEqual(url_parser.extract_url_content(url), extract_pdf_content(SAMPLE_PDF))
+
+            # Same content again: the hash matches, so the PDF is not parsed a second time
+            with mock.patch('services.pdf_parser.extract_pdf_content') as extract_pdf:
+                url_parser.extract_url_content(url)
+            extract_pdf.assert_not_called()
+
+            with self.assertRaisesRegex(ValueError, 'too large'):
+                url_parser.download_pdf(url, max_bytes=1000)
+
+        self.responses[url] = make_response(url, COMPANY_PAGE, 'text/html')
+        with mock.patch('services.url_parser.requests.get', side_effect=self.fake_get):
+            with self.assertRaisesRegex(ValueError, 'Expected a PDF'):
+                url_parser.download_pdf(url)
+
+    def test_pdf_without_pdf_suffix_is_streamed(self):
+        labelled = 'https://cdn.example.com/download?id=42'
+        unlabelled = 'https://cdn.example.com/files/annual-report'
+        self.responses[labelled] = make_response(labelled, b'%PDF-1.7 ' + b'x' * 5000, 'application/pdf')
+        self.responses[unlabelled] = make_response(unlabelled, b'%PDF-1.4 ' + b'y' * 5000, 'text/html')
+
+        with mock.patch('services.url_parser.requests.get', side_effect=self.fake_get) as get, \
+                mock.patch('services.pdf_parser.extract_pdf_content', return_value='Annual report text'):
+            self.assertEqual(url_parser.extract_url_content(labelled), 'Annual report text')
+            self.assertEqual(url_parser.extract_url_content(unlabelled), 'Annual report text')
+
+            # Both downloads went through download_pdf and its size limit
+            with mock.patch.object(url_parser, 'URL_PDF_MAX_BYTES', 1000):
+                with self.assertRaisesRegex(Exception, 'too large'):
+                    url_parser.extract_url_content(labelled)
+
+        self.assertTrue(all(call.kwargs.get('stream') for call in get.call_args_list))
+        # Neither PDF body was kept by the page caches
+        self.assertEqual(len(self.page_cache), 0)
+        self.assertEqual(len(url_parser._page_cache), 0)
+
+    def test_sec_pages_record_and_replay(self):
+        page_url = 'https://www.sec.gov/Archives/edgar/data/9990042/000999004225000001/notes.htm'
+        pdf_url = 'https://www.sec.gov/Archives/edgar/data/9990042/000999004225000001/exhibit-report'
+        paragraph = 'Revenue of Cassette Corp grew 12% as valve shipments to utilities increased. '
+        page = f'<html><body><h1>Notes to the financial statements</h1><p>{paragraph * 20}</p></body></html>'
+        with open(SAMPLE_PDF, 'rb') as f:
+            pdf = f.read()
+        served = {page_url: (page.encode('utf-8'), 'text/html'), pdf_url: (pdf, 'application/pdf')}
+        session = mock.Mock()
+        session.request.side_effect = lambda method, url, **kwargs: make_response(url, *served[url])
+
+        def extract_both():
+            url_parser._page_cache.clear()
+            self.page_cache.clear()
+            self.cache.clear()
+            return url_parser.extract_url_content(page_url), url_parser.extract_url_content(pdf_url)
+
+        with mock.patch.object(edgar_cassette, 'EDGAR_CASSETTE_DIR', os.path.join(self.cache_dir, 'cassette')), \
+                mock.patch.object(edgar_client, 'get_session', return_value=session):
+            with mock.patch.object(edgar_cassette, 'EDGAR_CASSETTE_MODE', 'record'):
+                recorded = extract_both()
+            self.assertTrue(all(call.kwargs.get('stream') for call in session.request.call_args_list))
+
+            session.request.reset_mock()
+            with mock.patch.object(edgar_cassette, 'EDGAR_CASSETTE_MODE', 'replay'):
+                replayed = extract_both()
+            session.request.assert_not_called()
+
+        self.assertIn('valve shipments', recorded[0])
+        self.assertEqual(recorded[1], extract_pdf_content(SAMPLE_PDF))
+        self.assertEqual(replayed, recorded)
+
+    def test_repeated_ingestion_revalidates(self):
+        url = 'https://example.com/news/q4-results'
+        release = make_response(url, b'<html><body><p>Fourth quarter results</p></body></html>', 'text/html',
+                                headers={'ETag': '"q4"', 'Cache-Control': 'no-cache'})
+        requests_seen = []
+
+        def server(request_url, headers=None, **kwargs):
+            requests_seen.append((request_url, dict(headers or {})))
+            if (headers or {}).get('If-None-Match') == '"q4"':
+                return make_response(request_url, b'', 'text/html', status_code=304)
+            return release
+
+        with mock.patch('services.url_parser.requests.get', side_effect=server), \
+                mock.patch('services.url_parser.trafilatura.extract', return_value='Fourth quarter results ' * 10) as extract:
+            first = url_parser.extract_url_content(url + '?utm_source=newsletter#top')
+            url_parser._page_cache.clear()
+            second = url_parser.extract_url_content(url)
+
+        self.assertEqual(second, first)
+        # Each URL is requested as given, but both spellings share one cache entry: the
+        # second ingestion is a conditional request answered with 304, and the stored
+        # text is reused
+        self.assertEqual([request_url for request_url, _ in requests_seen],
+                         [url + '?utm_source=newsletter#top', url])
+        self.assertEqual(requests_seen[1][1].get('If-None-Match'), '"q4"')
+        extract.assert_called_once()
+
+    def test_inaccessible_url_raises(self):
+        error = requests.Response()
+        error.status_code = 404
+        self.responses['https://example.com/missing'] = error
+        with mock.patch('services.url_parser.requests.get', side_effect=self.fake_get):
+            with self.assertRaises(ValueError):
+                url_parser.fetch_page('https://example.com/missing')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import json
+import os
+import unittest
+
+from services.xbrl_facts import (
+    compare_fact_tables, compute_ratios, compute_trends, format_fact_sheet, parse_company_facts
+)
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+
+def load_fixture(name):
+    with open(os.path.join(FIXTURES, name)) as f:
+        return json.load(f)
+
+
+class XbrlFactsTestCase(unittest.TestCase):
+    def setUp(self):
+        # Recorded companyfacts response, trimmed to the concepts used
+        self.table = parse_company_facts(load_fixture('companyfacts_CIK0000320193.json'))
+
+    def test_annual_facts(self):
+        """Annual 10-K facts are kept per fiscal year end, quarterly facts are dropped"""
+        self.assertEqual(self.table.cik, '320193')
+        self.assertEqual(self.table.periods, ['2021-09-25', '2022-09-24', '2023-09-30', '2024-09-28'])
+        self.assertEqual(self.table.get('revenue', '2024-09-28'), 391035e6)
+        # The pre-ASC 606 revenue concept fills the earliest year
+        self.assertEqual(self.table.get('revenue', '2021-09-25'), 365817e6)
+        # The restated value filed later wins
+        self.assertEqual(self.table.get('net_income', '2022-09-24'), 99803e6)
+        self.assertEqual(self.table.get('stockholders_equity', '2023-09-30'), 62146e6)
+        self.assertIsNone(self.table.get('net_income', '2021-09-25'))
+
+    def test_ratios_and_trends(self):
+        """Ratios and trends are computed locally from the facts"""
+        ratios = compute_ratios(self.table)
+        self.assertAlmostEqual(ratios['gross_margin'][-1], 180683 / 391035)
+        self.assertAlmostEqual(ratios['free_cash_flow'][-1], (118254 - 9447) * 1e6)
+        self.assertAlmostEqual(ratios['revenue_growth'][1], 394328 / 365817 - 1)
+        self.assertIsNone(ratios['current_ratio'][0])
+
+        trends = compute_trends(self.table)
+        self.assertEqual(trends['revenue_cagr']['from'], '2021-09-25')
+        self.assertGreater(trends['gross_margin_change']['value'], 0)
+
+    def test_fact_sheet_and_comparison(self):
+        """The fact sheet is a compact table and companies compare without an LLM"""
+        sheet = format_fact_sheet(self.table)
+        self.assertIn('Revenue | 365,817 | 394,328 | 383,285 | 391,035', sheet)
+        self.assertIn('Gross margin % |  | 43.3 | 44.1 | 46.2', sheet)
+        self.assertLess(len(sheet), 3000)
+
+        comparison = compare_fact_tables([self.table, self.table])
+        self.assertEqual(len(comparison['columns']), 2)
+        revenue_row = comparison['rows'][0]
+        self.assertEqual(revenue_row['values'], ['391,035', '391,035'])
+
+    def test_model_round_trip(self):
+        """Facts are stored column-wise and restored unchanged"""
+        from models import CompanyFacts
+        record = CompanyFacts(cik=self.table.cik)
+        record.update_from_table(self.table)
+        restored = record.to_table()
+        self.assertEqual(restored.periods, self.table.periods)
+        self.assertEqual(restored.series('revenue'), self.table.series('revenue'))
+        self.assertEqual(len(record.values), 8 * len(self.table.metrics) * len(self.table.periods))
+
+
+if __name__ == '__main__':
+    unittest.main()
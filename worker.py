@@ -0,0 +1,48 @@
+"""
+Standalone worker process for queued document processing
+
+Runs the job workers of services.job_queue without serving web requests, so PDF
+parsing, EDGAR downloads and AI analysis happen outside the gunicorn process and
+web and worker capacity can be scaled separately. Start it next to the web app with:
+    python worker.py [--workers N]
+
+and set JOB_WORKERS=0 for the web app so it only queues jobs. On SIGTERM or Ctrl+C
+the workers stop claiming jobs and finish the ones they are running; a job cut off
+by a hard kill is picked up again once its lease expires.
+"""
+
+import signal
+import logging
+import argparse
+import threading
+
+from app import app
+from services.job_queue import JOB_WORKERS, start_job_workers, stop_job_workers
+
+logger = logging.getLogger(__name__)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run InsightLens document processing jobs')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Worker threads (default: JOB_WORKERS, at least 1)')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    count = args.workers if args.workers is not None else max(JOB_WORKERS, 1)
+
+    stop_event = threading.Event()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, lambda *_: stop_event.set())
+
+    start_job_workers(count)
+    logger.info(f"Worker process running {count} job workers against {app.config['SQLALCHEMY_DATABASE_URI'].split('@')[-1]}")
+    while not stop_event.wait(1):
+        pass
+
+    logger.info("Stopping job workers after their current jobs")
+    stop_job_workers()
+
+
+if __name__ == '__main__':
+    main()